@@ -0,0 +1,83 @@
+import os
+import re
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+logger = get_logger('archive_index')
+
+# 文章文件命名格式：{发布日期}_{标题}_{文章ID}.txt，文章ID总是位于最后一个下划线之后
+ARTICLE_FILENAME_RE = re.compile(r'_(\d+)\.txt$')
+
+def topic_id_from_filename(filename):
+    """从文章文件名中解析topic_id，不符合命名格式时返回None"""
+    match = ARTICLE_FILENAME_RE.search(filename)
+    return match.group(1) if match else None
+
+def build_article_index(articles_dir='articles'):
+    """扫描一次文章目录（包括--layout date的年/月子目录），建立topic_id到文件路径的索引
+    Returns:
+        dict: {topic_id: 文件路径}，目录不存在时返回空字典
+    """
+    index = {}
+    if not os.path.isdir(articles_dir):
+        return index
+    pending = [articles_dir]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if not entry.name.startswith('.'):
+                        pending.append(entry.path)
+                    continue
+                topic_id = topic_id_from_filename(entry.name)
+                if topic_id:
+                    index[topic_id] = entry.path
+    return index
+
+def read_topic_ids(list_file='all_list.txt'):
+    """读取列表文件（每行以topic_id开头）中的所有文章ID"""
+    with open(list_file, 'r', encoding='utf-8') as f:
+        return [line.split()[0].strip() for line in f if line.strip()]
+
+def find_missing(topic_ids, index, known_failed_ids=()):
+    """按topic_id精确匹配，返回索引中不存在且不在已知失败列表中的文章ID"""
+    known_failed_ids = set(known_failed_ids)
+    return [topic_id for topic_id in topic_ids
+            if topic_id not in index and topic_id not in known_failed_ids]
+
+def verify_archive(list_file='all_list.txt', articles_dir='articles', output_file=None, journal=None):
+    """检查列表文件中的文章是否都已保存
+    缺失的文章记入处理日志（single_article.py下次运行时在重试阶段重新下载），指定output_file时同时写入文本文件
+    Returns:
+        list: 缺失的文章ID
+    """
+    topic_ids = read_topic_ids(list_file)
+    index = build_article_index(articles_dir)
+    missing = find_missing(topic_ids, index)
+    logger.info("列表中共%s篇文章，已保存%s篇，缺失%s篇", len(topic_ids), len(topic_ids) - len(missing), len(missing))
+    if journal is not None:
+        for topic_id in missing:
+            journal.failed({'id': topic_id, 'reason': '文件未能成功保存到articles目录'}, 'missing')
+        if missing:
+            logger.info("缺失的文章已记入处理日志 %s", journal.path)
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(missing))
+        logger.info("缺失的文章ID已保存到 %s", output_file)
+    return missing
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='检查已下载文章的完整性')
+    parser.add_argument('--list', default='all_list.txt', help='文章列表文件')
+    parser.add_argument('--dir', default='articles', help='文章保存目录')
+    parser.add_argument('--journal', default='logs/journal.jsonl', help='记录缺失文章的处理日志')
+    parser.add_argument('--output', help='同时把缺失文章ID写入文本文件')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    from journal import RunJournal
+    journal = RunJournal(args.journal)
+    try:
+        verify_archive(args.list, args.dir, args.output, journal)
+    finally:
+        journal.close()
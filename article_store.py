@@ -0,0 +1,185 @@
+import os
+import atexit
+import hashlib
+import threading
+from log_utils import get_logger
+
+logger = get_logger('article_store')
+
+# 目录布局：
+#   flat: 所有文章保存在输出目录下（默认，与旧版本一致）
+#   date: 按发布年月分目录保存，如articles/2024/06/20240613_标题_123.txt，单个目录的文件数保持在几千以内
+LAYOUT_FLAT = 'flat'
+LAYOUT_DATE = 'date'
+LAYOUTS = (LAYOUT_FLAT, LAYOUT_DATE)
+
+MANIFEST_FILE = 'manifest.tsv'
+
+class ArticleStore:
+    """txt文章的输出目录
+    文章先写入同目录下的临时文件再重命名，进程中断时不会留下写了一半的文章文件；
+    已创建的目录记录在内存中，不必每篇文章都检查目录是否存在。
+    启用manifest时在输出目录下维护manifest.tsv（topic_id、相对路径、字节数、sha256），
+    渲染结果与上次保存的完全相同时跳过写入；清单按批追加，同一topic_id以最后一行为准。
+    """
+
+    def __init__(self, output_dir='articles', layout=LAYOUT_FLAT, manifest=False, batch_size=500):
+        if layout not in LAYOUTS:
+            raise ValueError(f"不支持的目录布局：{layout}")
+        self.output_dir = output_dir
+        self.layout = layout
+        self.batch_size = batch_size
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE) if manifest else None
+        self.entries = {}
+        self.written = 0
+        self.unchanged = 0
+        self._pending = []
+        self._manifest_lines = 0
+        self._created_dirs = set()
+        self._lock = threading.Lock()
+        if self.manifest_path:
+            self._load_manifest()
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 4 or not fields[2].isdigit():
+                    # 写入清单时进程中断可能留下不完整的最后一行，对应的文章下次会重新写入
+                    continue
+                topic_id, path, size, digest = fields
+                self.entries[topic_id] = (path, int(size), digest)
+                self._manifest_lines += 1
+        if self._manifest_lines > 2 * len(self.entries) + 1000:
+            self._rewrite_manifest()
+
+    def _rewrite_manifest(self):
+        """只保留每篇文章的最后一条记录，重写清单（先写临时文件再重命名）"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for topic_id, (path, size, digest) in self.entries.items():
+                f.write(f"{topic_id}\t{path}\t{size}\t{digest}\n")
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_lines = len(self.entries)
+
+    def relative_path(self, filename):
+        """文章文件相对于输出目录的路径，date布局按文件名开头的发布日期（yyyymmdd）分目录"""
+        if self.layout == LAYOUT_DATE and len(filename) >= 8 and filename[:8].isdigit():
+            return os.path.join(filename[:4], filename[4:6], filename)
+        return filename
+
+    def _ensure_dir(self, directory):
+        if directory in self._created_dirs:
+            return
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+            logger.info("创建输出目录: %s", directory)
+        self._created_dirs.add(directory)
+
+    def write(self, topic_id, filename, text):
+        """保存一篇文章，内容与清单中记录的相同且文件仍存在时不重写
+        Returns:
+            str: 文件路径
+        """
+        topic_id = str(topic_id)
+        relative_path = self.relative_path(filename)
+        file_path = os.path.join(self.output_dir, relative_path)
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest() if self.manifest_path else None
+        previous = self.entries.get(topic_id)
+        if previous is not None and previous[0] == relative_path and previous[2] == digest:
+            try:
+                if os.path.getsize(file_path) == previous[1]:
+                    with self._lock:
+                        self.unchanged += 1
+                    return file_path
+            except OSError:
+                pass
+
+        self._ensure_dir(os.path.dirname(file_path))
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+
+        if previous is not None and previous[0] != relative_path:
+            # 标题修改后文件名变化，删除旧文件，避免同一篇文章保存两份
+            try:
+                os.remove(os.path.join(self.output_dir, previous[0]))
+            except OSError:
+                pass
+        with self._lock:
+            self.written += 1
+            if self.manifest_path:
+                self.entries[topic_id] = (relative_path, len(data), digest)
+                self._pending.append(f"{topic_id}\t{relative_path}\t{len(data)}\t{digest}\n")
+                if len(self._pending) >= self.batch_size:
+                    self._flush_locked()
+        return file_path
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._ensure_dir(self.output_dir)
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.writelines(self._pending)
+        self._manifest_lines += len(self._pending)
+        self._pending = []
+
+    def flush(self):
+        """把未写入的清单记录追加到manifest.tsv"""
+        if not self.manifest_path:
+            return
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+        if self.unchanged:
+            logger.info("%s：写入%s篇，内容未变化跳过%s篇", self.output_dir, self.written, self.unchanged)
+
+# 每个输出目录一个ArticleStore，由extract_and_save_article按output_dir获取
+_stores = {}
+_stores_lock = threading.Lock()
+_default_options = {'layout': LAYOUT_FLAT, 'manifest': False}
+
+def configure_article_stores(layout=LAYOUT_FLAT, manifest=False):
+    """设置之后创建的输出目录使用的布局和清单选项"""
+    _default_options.update(layout=layout, manifest=manifest)
+
+def get_article_store(output_dir='articles'):
+    """返回输出目录对应的ArticleStore，不存在时按默认选项创建"""
+    with _stores_lock:
+        store = _stores.get(output_dir)
+        if store is None:
+            store = _stores[output_dir] = ArticleStore(output_dir, **_default_options)
+        return store
+
+def close_article_stores():
+    """写入所有输出目录未写入的清单记录（进程退出时自动调用）"""
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        try:
+            store.close()
+        except OSError as e:
+            logger.error("写入文章清单失败：%s", e)
+
+atexit.register(close_article_stores)
+
+def add_store_arguments(parser):
+    """为命令行解析器添加txt输出目录参数"""
+    parser.add_argument('--layout', choices=LAYOUTS, default=LAYOUT_FLAT,
+                        help='txt文章的目录布局：flat（全部在输出目录下）或date（按发布年月分目录）')
+    parser.add_argument('--manifest', action='store_true',
+                        help='在输出目录维护manifest.tsv（路径、大小、sha256），内容未变化的文章不重写')
+
+def setup_store_from_args(args):
+    """根据命令行参数设置extract_and_save_article使用的目录布局和清单"""
+    layout = getattr(args, 'layout', LAYOUT_FLAT)
+    manifest = getattr(args, 'manifest', False)
+    configure_article_stores(layout, manifest)
+    if layout != LAYOUT_FLAT or manifest:
+        logger.info("txt文章目录布局：%s%s", layout, "，维护manifest.tsv" if manifest else "")
@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from mock_server import MockGroup
+from log_utils import get_logger, LOGGER_NAME
+
+logger = get_logger('benchmark')
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_SIZES = (1000, 10000)
+
+# 吞吐量下降或峰值内存增加超过该比例时视为性能回退
+DEFAULT_TOLERANCE = 0.25
+# 峰值内存很小时的波动不算回退（KB）
+MEMORY_SLACK_KB = 64
+
+class SyntheticTopics:
+    """基于example.json模板（通过MockGroup）生成合成文章
+    先生成pool_size篇不同的文章，再循环复用（浅拷贝并改写topic_id），生成10万篇文章也只需几秒。
+    Args:
+        comments: 每篇文章的评论数（每4条评论中有1条带回复）
+        title_length: 大于0时生成该长度的标题（含文件名中的非法字符），用于测试超长标题
+        pool_size: 不同文章的数量
+    """
+
+    def __init__(self, comments=3, title_length=0, pool_size=500, seed=0):
+        group = MockGroup(size=pool_size, seed=seed, comments=comments, max_comments=comments)
+        self.pool = []
+        for i in range(pool_size):
+            topic = group.topic(i)
+            topic['show_comments'] = group.comment_thread(i, comments)
+            topic['comments_count'] = comments
+            if title_length > 0:
+                title = (f"超长标题{i}：<测试>/\\|?*" * (title_length // 12 + 1))[:title_length]
+                body = topic['talk']['text'].split('\n', 1)[1]
+                topic['talk']['text'] = f"{title}\n{body}"
+                topic['title'] = f"{title}\n..."
+            self.pool.append(topic)
+
+    def topics(self, n):
+        """返回n篇文章的列表，topic_id各不相同"""
+        result = []
+        for i in range(n):
+            topic = dict(self.pool[i % len(self.pool)])
+            topic['topic_id'] = 5200000000000000 + i
+            result.append(topic)
+        return result
+
+    def pages(self, n, count=20):
+        """将n篇文章按每页count篇组织为列表接口的响应数据"""
+        topics = self.topics(n)
+        return [{'succeeded': True, 'resp_data': {'topics': topics[i:i + count]}} for i in range(0, n, count)]
+
+class PageClient:
+    """按顺序返回预先生成的列表页，用于在不联网的情况下测量get_article_list.process_url"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.position = 0
+
+    def request_json(self, url, **kwargs):
+        page = self.pages[self.position % len(self.pages)]
+        self.position += 1
+        return page
+
+@contextmanager
+def muted_logging():
+    """测量期间只输出警告和错误，避免逐篇文章的日志输出影响结果"""
+    package_logger = logging.getLogger(LOGGER_NAME)
+    level = package_logger.level
+    package_logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        package_logger.setLevel(level)
+
+@contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+def _build_cases():
+    """返回[(名称, 数据生成器, 准备函数)]
+    准备函数接收(数据生成器, 文章数, 临时目录)，返回(执行函数, 处理的文章数)，执行函数的耗时即测量结果。
+    执行函数不保留每篇文章的结果，峰值内存反映的是单次调用而不是结果的累积。
+    """
+    from main import sanitize_filename, render_article, extract_and_save_article, process_articles
+    import get_article_list
+
+    normal = SyntheticTopics()
+    long_comments = SyntheticTopics(comments=200)
+    long_titles = SyntheticTopics(title_length=1000)
+
+    def titles_case(source, n, workdir):
+        titles = [topic['title'].split('\n')[0] for topic in source.topics(n)]
+        def run():
+            for title in titles:
+                sanitize_filename(title)
+        return run, n
+
+    def time_case(source, n, workdir):
+        times = [topic['create_time'] for topic in source.topics(n)]
+        def run():
+            for value in times:
+                # 与render_article中解析发布时间的方式相同
+                datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%Y%m%d')
+        return run, n
+
+    def json_case(source, n, workdir):
+        bodies = [json.dumps(page, ensure_ascii=False).encode('utf-8') for page in source.pages(n)]
+        def run():
+            for body in bodies:
+                json.loads(body)
+        return run, n
+
+    def render_case(source, n, workdir):
+        topics = source.topics(n)
+        def run():
+            for topic in topics:
+                render_article(topic)
+        return run, n
+
+    def save_case(source, n, workdir):
+        topics = source.topics(n)
+        output_dir = tempfile.mkdtemp(dir=workdir)
+        def run():
+            for topic in topics:
+                extract_and_save_article(topic, output_dir)
+        return run, n
+
+    def process_articles_case(source, n, workdir):
+        pages = source.pages(n)
+        # process_articles总是写入当前目录下的articles，各次运行使用同一个工作目录
+        run_dir = os.path.join(workdir, 'process_articles')
+        os.makedirs(run_dir, exist_ok=True)
+
+        def run():
+            with working_directory(run_dir):
+                for page in pages:
+                    process_articles(page)
+        return run, n
+
+    def process_url_case(source, n, workdir):
+        pages = source.pages(n)
+
+        def run():
+            client = PageClient(pages)
+            for _ in pages:
+                get_article_list.process_url('https://api.zsxq.com/v2/groups/1/topics', client)
+        return run, n
+
+    return [
+        ('sanitize_filename', normal, titles_case),
+        ('sanitize_filename（长标题）', long_titles, titles_case),
+        ('create_time解析', normal, time_case),
+        ('json解析', normal, json_case),
+        ('render_article', normal, render_case),
+        ('render_article（长评论）', long_comments, render_case),
+        ('render_article（长标题）', long_titles, render_case),
+        ('extract_and_save_article', normal, save_case),
+        ('process_articles', normal, process_articles_case),
+        ('get_article_list.process_url', normal, process_url_case),
+    ]
+
+def measure(prepare, source, n, workdir, repeat=5, memory_sample=2000):
+    """测量一个用例：吞吐量按进程CPU时间（含写文件的系统调用时间）计算，取repeat次中最快的一次，
+    不受同一台机器上其他进程的影响；峰值内存在tracemalloc下对最多memory_sample篇单独运行一次
+    Returns:
+        dict: {'topics', 'seconds', 'throughput', 'peak_kb'}
+    """
+    best = None
+    for _ in range(max(1, repeat)):
+        run, count = prepare(source, n, workdir)
+        with muted_logging():
+            start = time.process_time()
+            run()
+            elapsed = time.process_time() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    run, _ = prepare(source, min(n, memory_sample), workdir)
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        with muted_logging():
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'topics': count,
+        'seconds': round(best, 4),
+        'throughput': round(count / best, 1) if best > 0 else 0.0,
+        'peak_kb': round(max(0, peak - base) / 1024, 1),
+    }
+
+def run_benchmarks(sizes=DEFAULT_SIZES, only=None, repeat=5):
+    """运行全部（或名称包含only中任一字符串的）用例
+    Returns:
+        dict: {"用例@文章数": 测量结果}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='zsxq-bench-') as workdir:
+        for name, source, prepare in _build_cases():
+            if only and not any(keyword in name for keyword in only):
+                continue
+            for n in sizes:
+                result = measure(prepare, source, n, workdir, repeat)
+                results[f"{name}@{n}"] = result
+                logger.info("%-36s %7d篇  %8.3f秒  %10.1f篇/秒  峰值内存%9.1fKB", name, n,
+                            result['seconds'], result['throughput'], result['peak_kb'])
+    return results
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """与基准比较，返回回退的用例说明列表（两边都有的用例才比较）"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if result['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(f"{key}：吞吐量{result['throughput']}篇/秒，基准{base['throughput']}篇/秒")
+        if result['peak_kb'] > base['peak_kb'] * (1 + tolerance) + MEMORY_SLACK_KB:
+            regressions.append(f"{key}：峰值内存{result['peak_kb']}KB，基准{base['peak_kb']}KB")
+    return regressions
+
+def load_baseline(path=DEFAULT_BASELINE):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('results', {})
+    except FileNotFoundError:
+        return None
+
+def save_baseline(results, path=DEFAULT_BASELINE):
+    """保存基准（先写临时文件再重命名），已有基准中本次未运行的用例保留"""
+    merged = load_baseline(path) or {}
+    merged.update(results)
+    data = {'saved_at': datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+            'results': merged}
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+if __name__ == '__main__':
+    import argparse
+    from log_utils import add_logging_arguments, setup_logging_from_args
+    parser = argparse.ArgumentParser(description='解析和渲染热点路径的性能基准测试')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='文章数，逗号分隔，如1000,10000,100000')
+    parser.add_argument('--only', action='append', help='只运行名称包含该字符串的用例，可重复指定')
+    parser.add_argument('--repeat', type=int, default=5, help='每个用例重复次数，取最快的一次')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基准文件')
+    parser.add_argument('--save-baseline', action='store_true', help='把本次结果保存为基准')
+    parser.add_argument('--require-baseline', action='store_true',
+                        help='没有基准文件或基准中没有本次运行的用例时退出码为1（CI中使用，避免没有比较却显示通过）')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='允许的吞吐量下降/峰值内存增加比例，默认0.25')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    sizes = [int(value) for value in args.sizes.split(',') if value.strip()]
+    results = run_benchmarks(sizes, args.only, args.repeat)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        logger.info("基准已保存到 %s", args.baseline)
+        sys.exit(0)
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        if args.require_baseline:
+            logger.error("没有基准文件 %s，请先在改动前使用--save-baseline保存基准", args.baseline)
+            sys.exit(1)
+        logger.info("没有基准文件 %s，可使用--save-baseline保存本次结果", args.baseline)
+        sys.exit(0)
+    missing = [key for key in results if not baseline.get(key)]
+    if missing:
+        logger.warning("基准中没有以下用例，未比较：%s", '、'.join(missing))
+    if args.require_baseline and len(missing) == len(results):
+        logger.error("没有可与基准 %s 比较的用例", args.baseline)
+        sys.exit(1)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        for line in regressions:
+            logger.error("性能回退：%s", line)
+        sys.exit(1)
+    logger.info("与基准 %s 相比没有性能回退", args.baseline)
@@ -0,0 +1,142 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from main import prepare_topic
+from single_article import fetch_single_article, save_single_article
+from retry_policy import FatalError
+from zsxq_client import get_default_client
+from log_utils import get_logger, ProgressBar
+
+logger = get_logger('bulk_download')
+
+# 写入队列结束标记
+_STOP = object()
+
+def download_articles(topic_ids, workers=4, download_failed_ids=None, save_failed_ids=None,
+                      max_in_flight=None, write_queue_size=64, client=None, on_saved=None, on_failed=None,
+                      use_cache=True):
+    """并发批量下载文章
+    网络请求由线程池并发执行，文件写入由单独的写入线程顺序完成（write-behind），
+    输出文件与失败记录与顺序下载保持一致。
+    Args:
+        topic_ids: 文章ID的可迭代对象（可以是生成器，按需读取）
+        workers: 并发请求的线程数
+        download_failed_ids: 下载失败的ID列表，每个元素为字典，包含id和reason
+        save_failed_ids: 保存失败的ID列表，每个元素为字典，包含id和reason
+        max_in_flight: 同时进行中的请求上限，默认为workers的2倍
+        write_queue_size: 等待写入的文章数量上限
+        client: ZsxqClient实例，默认使用进程内共享的客户端
+        on_saved: 可选回调函数on_saved(topic_id, file_path)，每篇文章保存成功后在写入线程中调用
+        on_failed: 可选回调函数on_failed(item, stage)，每次失败时立即调用（item为失败记录，stage为download或save）
+        use_cache: 为False时不使用缓存的详情响应，总是请求详情接口
+    Returns:
+        int: 成功保存的文章数
+    Raises:
+        FatalError: 凭证失效或服务器持续拒绝请求，已提交的文章处理完后停止
+    """
+    if download_failed_ids is None:
+        download_failed_ids = []
+    if save_failed_ids is None:
+        save_failed_ids = []
+    workers = max(1, int(workers))
+    if max_in_flight is None:
+        max_in_flight = workers * 2
+    if client is None:
+        client = get_default_client()
+
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    write_queue = queue.Queue(maxsize=write_queue_size)
+    lock = threading.Lock()
+    # 按提交顺序记录失败信息，结束后按原顺序合并，保证与顺序下载的失败列表一致
+    failures = {}
+    success_count = 0
+    fatal_errors = []
+    progress = ProgressBar(desc='并发下载')
+
+    def record_failures(index, download_failed, save_failed):
+        if not download_failed and not save_failed:
+            return
+        if on_failed is not None:
+            for stage, items in (('download', download_failed), ('save', save_failed)):
+                for item in items:
+                    try:
+                        on_failed(item, stage)
+                    except Exception as e:
+                        logger.error("记录文章 %s 失败信息时发生错误：%s", item.get('id'), e)
+        with lock:
+            entry = failures.setdefault(index, ([], []))
+            entry[0].extend(download_failed)
+            entry[1].extend(save_failed)
+
+    def fetch(index, topic_id):
+        download_failed = []
+        try:
+            topic = fetch_single_article(topic_id, download_failed, client, use_cache)
+            # 完整评论和媒体文件在下载线程中获取，写入线程只负责渲染和写文件
+            if topic is not None:
+                prepare_topic(topic, client)
+        except FatalError as e:
+            # 致命错误：停止提交新任务，已提交的任务会在重试策略中立即失败
+            fatal_errors.append(e)
+            topic = None
+        except Exception as e:
+            topic = None
+            download_failed.append({"id": topic_id, "reason": f"未预期的错误: {str(e)}"})
+        finally:
+            in_flight.release()
+        record_failures(index, download_failed, [])
+        if topic is None:
+            progress.update(failed=True)
+        if topic is not None:
+            write_queue.put((index, topic_id, topic))
+
+    def writer():
+        nonlocal success_count
+        while True:
+            item = write_queue.get()
+            if item is _STOP:
+                break
+            index, topic_id, topic = item
+            download_failed = []
+            save_failed = []
+            file_path = save_single_article(topic_id, topic, download_failed, save_failed, client=client)
+            progress.update(failed=not file_path)
+            if file_path:
+                success_count += 1
+                if on_saved is not None:
+                    try:
+                        on_saved(topic_id, file_path)
+                    except Exception as e:
+                        logger.error("记录文章 %s 保存结果时发生错误：%s", topic_id, e)
+            record_failures(index, download_failed, save_failed)
+
+    writer_thread = threading.Thread(target=writer, name='article-writer', daemon=True)
+    writer_thread.start()
+
+    total = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='article-fetch') as executor:
+            for index, topic_id in enumerate(topic_ids):
+                in_flight.acquire()
+                if fatal_errors:
+                    in_flight.release()
+                    break
+                total += 1
+                logger.debug("[%s] 提交文章 %s 下载任务...", total, topic_id)
+                executor.submit(fetch, index, topic_id)
+    finally:
+        write_queue.put(_STOP)
+        writer_thread.join()
+        progress.close()
+
+    for index in sorted(failures):
+        download_failed, save_failed = failures[index]
+        download_failed_ids.extend(download_failed)
+        save_failed_ids.extend(save_failed)
+
+    logger.info("并发下载完成：共%s篇，成功%s篇", total, success_count)
+    logger.info("%s", progress.summary())
+    if fatal_errors:
+        raise fatal_errors[0]
+    return success_count
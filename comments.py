@@ -0,0 +1,219 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from retry_policy import FatalError
+from log_utils import get_logger
+
+logger = get_logger('comments')
+
+# 在topic中标记已处理过完整评论（无论成功与否），避免同一篇文章重复请求
+FULL_COMMENTS_KEY = '_full_comments'
+
+def needs_full_comments(topic):
+    """列表/详情数据中的show_comments只是预览，评论总数超过预览条数时需要请求完整评论"""
+    if topic.get(FULL_COMMENTS_KEY):
+        return False
+    shown = len(topic.get('show_comments') or [])
+    return topic.get('comments_count', 0) > shown
+
+class CommentStore:
+    """本地保存每篇文章已获取的完整评论（comments/{末两位}/{topic_id}.json）
+    记录评论列表、已获取到的最新评论时间，以及上次获取时文章的评论数，再次运行时只请求更新的评论页。
+    """
+
+    def __init__(self, store_dir='comments'):
+        self.store_dir = store_dir
+
+    def _path(self, topic_id):
+        topic_id = str(topic_id)
+        return os.path.join(self.store_dir, topic_id[-2:], f"{topic_id}.json")
+
+    def _load_entry(self, topic_id):
+        try:
+            with open(self._path(topic_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def load(self, topic_id):
+        """返回已保存的评论列表，没有时返回空列表"""
+        return self._load_entry(topic_id).get('comments', [])
+
+    def load_state(self, topic_id):
+        """返回(已保存的评论列表, 上次获取时文章的评论数)，没有记录评论数时为None"""
+        entry = self._load_entry(topic_id)
+        return entry.get('comments', []), entry.get('checked_count')
+
+    def save(self, topic_id, comments, checked_count=None):
+        """保存评论列表（先写临时文件再重命名）
+        Args:
+            checked_count: 本次获取时文章的评论数（comments_count），评论数不变时下次不再请求
+        """
+        path = self._path(topic_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        cursor = max((c.get('create_time', '') for c in comments), default='')
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'topic_id': str(topic_id), 'cursor': cursor, 'checked_count': checked_count,
+                       'comments': comments}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+def count_comments(comments):
+    """评论总数，包括replied_comments中的回复（与文章的comments_count比较时使用）"""
+    return sum(1 + len(c.get('replied_comments') or []) for c in comments or [])
+
+def merge_comments(*comment_lists):
+    """按comment_id合并多个评论列表（后面的版本覆盖前面的），按发布时间从旧到新排列"""
+    merged = {}
+    for comments in comment_lists:
+        for comment in comments or []:
+            key = comment.get('comment_id') or (comment.get('create_time'), comment.get('text'))
+            merged[key] = comment
+    return sorted(merged.values(), key=lambda c: c.get('create_time', ''))
+
+def _fetch_pages(client, topic_id, begin_time, known_ids, count, max_pages):
+    """从begin_time开始翻页，返回(不在known_ids中的评论, 请求页数)；known_ids会被更新"""
+    fetched = []
+    pages = 0
+    while True:
+        resp_data = client.request_json(client.comments_url(topic_id, begin_time=begin_time, count=count))
+        comments = resp_data.get('resp_data', {}).get('comments') or []
+        pages += 1
+        new_comments = [c for c in comments if c.get('comment_id') not in known_ids]
+        fetched.extend(new_comments)
+        known_ids.update(c.get('comment_id') for c in new_comments)
+        # 游标时间相同的评论会在下一页重复出现，本页没有新评论或不足一页时说明已经到底
+        if not new_comments or len(comments) < count:
+            break
+        if max_pages is not None and pages >= max_pages:
+            break
+        begin_time = comments[-1].get('create_time')
+    return fetched, pages
+
+def fetch_comment_thread(client, topic_id, store=None, count=30, max_pages=None, expected=None):
+    """按发布时间从旧到新翻页获取一篇文章的全部评论（包括replied_comments中的回复）
+    已保存过的文章从最新一条已保存评论的时间开始请求，只获取更新的评论；
+    已保存的评论（包括回复）不少于expected（文章的comments_count），或expected与上次获取时相同时不发送请求。
+    增量获取后仍少于expected时，说明有新回复挂在较早的评论下，重新翻页获取全部评论以更新回复。
+    Returns:
+        list: 合并后的完整评论列表
+    """
+    stored, checked_count = store.load_state(topic_id) if store is not None else ([], None)
+    if expected is not None and stored and (count_comments(stored) >= expected or checked_count == expected):
+        return stored
+    begin_time = max((c.get('create_time', '') for c in stored), default='') or None
+    fetched, pages = _fetch_pages(client, topic_id, begin_time, {c.get('comment_id') for c in stored},
+                                  count, max_pages)
+    merged = merge_comments(stored, fetched)
+    if expected is not None and stored and count_comments(merged) < expected:
+        # 已保存的评论也重新获取（合并时新版本覆盖旧版本），以得到它们下面新增的回复
+        refetched, rescan_pages = _fetch_pages(client, topic_id, None, set(), count, max_pages)
+        pages += rescan_pages
+        fetched.extend(refetched)
+        merged = merge_comments(merged, refetched)
+    if store is not None and (fetched or checked_count != expected):
+        store.save(topic_id, merged, expected)
+    logger.debug("文章 %s 的评论：已保存%s条，新获取%s条，请求%s页", topic_id, len(stored), len(fetched), pages)
+    return merged
+
+def apply_stored_comments(topic, store):
+    """不发送请求，用本地已保存的完整评论替换topic中的预览评论（response_cache.py rerender使用）
+    Returns:
+        bool: 是否替换了评论
+    """
+    if topic.get(FULL_COMMENTS_KEY):
+        return False
+    comments = store.load(topic.get('topic_id', ''))
+    if not comments or len(comments) < len(topic.get('show_comments') or []):
+        return False
+    topic['show_comments'] = merge_comments(topic.get('show_comments'), comments)
+    topic[FULL_COMMENTS_KEY] = True
+    return True
+
+class CommentFetcher:
+    """有界的完整评论获取器
+    同时进行中的评论请求不超过max_in_flight；complete_many在内部线程池中并发获取多篇文章的评论。
+    获取失败时保留原来的预览评论，不影响文章保存。
+    """
+
+    def __init__(self, client=None, store=None, workers=4, max_in_flight=None):
+        self._client = client
+        self.store = store if store is not None else CommentStore()
+        self.workers = max(1, int(workers))
+        self._in_flight = threading.BoundedSemaphore(max_in_flight or self.workers)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.fetched_topics = 0
+        self.failed_topics = 0
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from zsxq_client import get_default_client
+            self._client = get_default_client()
+        return self._client
+
+    def complete(self, topic, client=None):
+        """需要时获取完整评论并替换topic中的show_comments
+        Returns:
+            bool: 是否获取了完整评论
+        """
+        if not needs_full_comments(topic):
+            return False
+        topic_id = topic.get('topic_id', '')
+        with self._in_flight:
+            try:
+                comments = fetch_comment_thread(client or self.client, topic_id, self.store,
+                                                expected=topic.get('comments_count'))
+            except FatalError:
+                raise
+            except Exception as e:
+                topic[FULL_COMMENTS_KEY] = True
+                with self._lock:
+                    self.failed_topics += 1
+                logger.warning("获取文章 %s 的完整评论失败，保留预览评论：%s", topic_id, e,
+                               extra={'fields': {'event': 'comments_failed', 'topic_id': str(topic_id),
+                                                 'reason': str(e)}})
+                return False
+        if len(comments) >= len(topic.get('show_comments') or []):
+            topic['show_comments'] = comments
+        topic[FULL_COMMENTS_KEY] = True
+        with self._lock:
+            self.fetched_topics += 1
+        return True
+
+    def complete_many(self, topics, client=None):
+        """在线程池中并发补全多篇文章的评论，全部完成后返回"""
+        pending = [topic for topic in topics if needs_full_comments(topic)]
+        if not pending:
+            return
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='comment-fetch')
+        futures = [self._executor.submit(self.complete, topic, client) for topic in pending]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self.fetched_topics or self.failed_topics:
+            logger.info("完整评论：获取%s篇，失败%s篇", self.fetched_topics, self.failed_topics)
+
+def add_comment_arguments(parser):
+    """为命令行解析器添加完整评论参数"""
+    parser.add_argument('--full-comments', action='store_true',
+                        help='评论数超过预览条数时，翻页获取完整评论（含回复）写入文章')
+    parser.add_argument('--comments-dir', default='comments', help='已获取评论的保存目录，用于增量更新')
+
+def setup_comments_from_args(args, workers=4):
+    """根据--full-comments参数设置extract_and_save_article使用的评论获取器"""
+    if not getattr(args, 'full_comments', False):
+        return None
+    from main import set_default_comment_fetcher
+    fetcher = CommentFetcher(store=CommentStore(args.comments_dir), workers=workers)
+    set_default_comment_fetcher(fetcher)
+    logger.info("将获取完整评论，保存到 %s", args.comments_dir)
+    return fetcher
@@ -0,0 +1,234 @@
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from retry_policy import FatalError
+from log_utils import get_logger
+
+logger = get_logger('crawler')
+
+# 列表接口类型：
+#   topics:  /groups/{id}/topics?scope=...，以最后一篇文章的create_time作为end_time游标
+#   digests: /groups/{id}/topics/digests，以毫秒时间戳作为index游标
+ENDPOINT_TOPICS = 'topics'
+ENDPOINT_DIGESTS = 'digests'
+
+# 接口中的时间均为北京时间
+ZSXQ_TZ = timezone(timedelta(hours=8))
+
+def create_time_to_index(create_time):
+    """将create_time（如2024-06-13T13:52:30.558+0800）转换为毫秒时间戳"""
+    return int(datetime.strptime(create_time, '%Y-%m-%dT%H:%M:%S.%f%z').timestamp() * 1000)
+
+def index_to_create_time(index):
+    """将毫秒时间戳转换为create_time格式，用作topics接口的end_time游标"""
+    dt = datetime.fromtimestamp(int(index) / 1000, ZSXQ_TZ)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0800'
+
+def index_to_cursor(endpoint, index):
+    """将毫秒时间戳转换为对应接口的起始游标"""
+    if endpoint == ENDPOINT_DIGESTS:
+        return int(index)
+    return index_to_create_time(index)
+
+def page_url(client, endpoint, group_id=None, scope='all', count=None, cursor=None):
+    """根据接口类型和游标生成列表页URL"""
+    if endpoint == ENDPOINT_DIGESTS:
+        return client.digests_url(group_id, index=cursor or 0, count=count or 30)
+    return client.topics_url(group_id, scope=scope, count=count or 20, end_time=cursor)
+
+def next_cursor(endpoint, resp_data, topics):
+    """从本页数据中读取下一页的游标，没有更多数据时返回None"""
+    if not topics:
+        return None
+    if endpoint == ENDPOINT_DIGESTS:
+        index = resp_data.get('resp_data', {}).get('index')
+        if index:
+            return index
+        return create_time_to_index(topics[-1]['create_time'])
+    return topics[-1].get('create_time')
+
+def fetch_page(client, url):
+    """请求一个列表页，返回(resp_data, topics)
+    重试、退避和熔断由客户端的统一重试策略处理，最终失败时抛出最后一次的异常。
+    """
+    logger.debug("请求列表页: %s", url)
+    try:
+        resp_data = client.request_json(url)
+    except Exception as e:
+        logger.warning("请求列表页失败：%s", e)
+        raise
+    if 'topics' not in resp_data.get('resp_data', {}):
+        raise ValueError(f"响应数据结构不符合预期：{str(resp_data)[:200]}")
+    topics = resp_data['resp_data']['topics']
+    logger.info("获取列表页：%s篇文章", len(topics),
+                extra={'fields': {'event': 'page_fetched', 'url': url, 'topics': len(topics)}})
+    return resp_data, topics
+
+def iter_pages(client, group_id=None, scope='all', endpoint=ENDPOINT_TOPICS, count=None,
+               start_cursor=None, max_pages=None, stop=None):
+    """自动翻页，逐页返回(url, resp_data, topics)
+    在调用方处理第N页时，后台线程已开始请求第N+1页。
+    Args:
+        client: ZsxqClient实例
+        group_id: 星球ID，默认使用配置中的groupId
+        scope: topics接口的scope参数（all、digests等）
+        endpoint: 列表接口类型，topics或digests
+        count: 每页数量
+        start_cursor: 起始游标，默认从最新文章开始
+        max_pages: 最多请求的页数
+        stop: 可选函数，接收本页topics，返回True时不再请求下一页
+    """
+    def fetch(cursor):
+        url = page_url(client, endpoint, group_id, scope, count, cursor)
+        resp_data, topics = fetch_page(client, url)
+        return url, resp_data, topics
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='list-prefetch') as executor:
+        cursor = start_cursor
+        future = executor.submit(fetch, cursor)
+        page_count = 0
+        while future is not None:
+            url, resp_data, topics = future.result()
+            page_count += 1
+            cursor_next = next_cursor(endpoint, resp_data, topics)
+            future = None
+            more_pages = cursor_next is not None and cursor_next != cursor
+            if max_pages is not None and page_count >= max_pages:
+                more_pages = False
+            if stop is not None and stop(topics):
+                more_pages = False
+            if more_pages:
+                # 先提交下一页的请求，再把本页交给调用方处理
+                future = executor.submit(fetch, cursor_next)
+                cursor = cursor_next
+            yield url, resp_data, topics
+
+def iter_topics(client, **kwargs):
+    """逐篇返回列表页中的文章，参数同iter_pages
+    相邻两页可能因游标时间相同而重复，只与上一页比较去重，内存占用与星球大小无关。
+    """
+    previous_ids = set()
+    for url, resp_data, topics in iter_pages(client, **kwargs):
+        current_ids = set()
+        for topic in topics:
+            topic_id = topic.get('topic_id')
+            current_ids.add(topic_id)
+            if topic_id in previous_ids:
+                continue
+            yield topic
+        previous_ids = current_ids
+
+def group_time_range(client, group_id=None, scope='all', endpoint=ENDPOINT_TOPICS):
+    """返回星球文章的时间范围(oldest, newest)（毫秒时间戳）
+    最新时间取列表第一页的第一篇文章，最早时间取星球的创建时间。没有文章时返回None。
+    """
+    _, topics = fetch_page(client, page_url(client, endpoint, group_id, scope, count=1))
+    if not topics:
+        return None
+    newest = create_time_to_index(topics[0]['create_time'])
+    resp_data = client.request_json(client.group_info_url(group_id))
+    create_time = resp_data.get('resp_data', {}).get('group', {}).get('create_time')
+    if not create_time:
+        raise ValueError("星球信息中没有创建时间")
+    return min(create_time_to_index(create_time), newest), newest
+
+def split_windows(oldest, newest, windows):
+    """将时间范围等分为windows个时间窗口，从新到旧返回(lower, upper)（毫秒时间戳，不含lower、含upper）
+    第一个窗口没有上限（从最新文章开始），最后一个窗口没有下限（直到列表结束），
+    时间范围估计得不准确时也不会遗漏文章。
+    """
+    windows = max(1, int(windows))
+    span = max(0, newest - oldest)
+    bounds = [newest - span * k // windows for k in range(windows + 1)]
+    # 时间范围很小时去掉重复的边界
+    bounds = [bound for k, bound in enumerate(bounds) if k == 0 or bound != bounds[k - 1]]
+    result = []
+    for k in range(len(bounds) - 1):
+        upper = None if k == 0 else bounds[k]
+        lower = None if k == len(bounds) - 2 else bounds[k + 1]
+        result.append((lower, upper))
+    return result or [(None, None)]
+
+def fetch_window(client, lower=None, upper=None, **kwargs):
+    """沿游标链获取一个时间窗口内（create_time大于lower、不大于upper）的全部文章，按列表顺序返回
+    其他参数同iter_pages。
+    """
+    endpoint = kwargs.get('endpoint', ENDPOINT_TOPICS)
+
+    def below_window(topics):
+        return lower is not None and bool(topics) and create_time_to_index(topics[-1]['create_time']) <= lower
+
+    start_cursor = index_to_cursor(endpoint, upper) if upper is not None else None
+    topics = []
+    for topic in iter_topics(client, start_cursor=start_cursor, stop=below_window, **kwargs):
+        if lower is not None and create_time_to_index(topic['create_time']) <= lower:
+            continue
+        topics.append(topic)
+    return topics
+
+def iter_topics_partitioned(client, workers=4, windows=None, time_range=None, **kwargs):
+    """按时间窗口并发翻页，逐篇返回文章，顺序与iter_topics一致（从新到旧）
+    将星球的时间范围分成多个窗口，每个窗口的游标链在线程池中并发请求，按窗口顺序拼接结果。
+    窗口边界按时间等分，发帖密度不均时各窗口页数不同，因此窗口数默认为workers的4倍以平衡负载；
+    同时进行和已完成待输出的窗口不超过2×workers个，内存占用与此成正比。
+    无法获取时间范围时退回到顺序翻页。
+    Args:
+        client: ZsxqClient实例
+        workers: 并发请求的窗口数
+        windows: 时间窗口数，默认为workers×4
+        time_range: 可选的(oldest, newest)毫秒时间戳，默认通过group_time_range获取
+        其他参数同iter_pages（group_id、scope、endpoint、count），不支持start_cursor和stop
+    """
+    workers = max(1, int(workers))
+    if time_range is None:
+        try:
+            time_range = group_time_range(client, kwargs.get('group_id'), kwargs.get('scope', 'all'),
+                                          kwargs.get('endpoint', ENDPOINT_TOPICS))
+        except FatalError:
+            raise
+        except Exception as e:
+            logger.warning("无法获取星球的时间范围，改为顺序翻页：%s", e)
+            yield from iter_topics(client, **kwargs)
+            return
+        if time_range is None:
+            return
+    window_list = split_windows(time_range[0], time_range[1], windows or workers * 4)
+    logger.info("按时间窗口并发翻页：%s个窗口，%s个线程", len(window_list), workers)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='list-window')
+    futures = deque()
+    remaining = iter(window_list)
+    try:
+        while True:
+            # 按顺序提交窗口，保持进行中和待输出的窗口数有界
+            while len(futures) < workers * 2:
+                window = next(remaining, None)
+                if window is None:
+                    break
+                futures.append(executor.submit(fetch_window, client, *window, **kwargs))
+            if not futures:
+                break
+            yield from futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+
+def stream_topic_list(topics, list_file='all_list.txt', failures=None):
+    """将文章逐条写入列表文件（格式同all_list.txt），并逐个返回topic_id
+    Args:
+        topics: 文章数据的可迭代对象
+        list_file: 输出的列表文件
+        failures: 可选列表，记录缺少topic_id或title的文章
+    """
+    with open(list_file, 'w', encoding='utf-8') as f:
+        for topic in topics:
+            topic_id = topic.get('topic_id', '')
+            title = topic.get('title', '').split('\n')[0] if topic.get('title') else ''
+            if not (topic_id and title):
+                if failures is not None:
+                    failures.append({'topic': topic, 'reason': '缺少topic_id或title'})
+                continue
+            f.write(f"{topic_id} {title}\n")
+            f.flush()
+            yield str(topic_id)
@@ -0,0 +1,103 @@
+import threading
+from rate_limiter import AdaptiveRateLimiter
+from metrics import get_metrics
+from log_utils import get_logger
+
+logger = get_logger('credentials')
+
+class Credential:
+    """一组登录凭证（zsxq_access_token和zsxqsessionid），带有单独的限流器和健康状态"""
+
+    def __init__(self, name, access_token, session_id, rate_limiter):
+        self.name = name
+        self.access_token = access_token
+        self.session_id = session_id
+        self.rate_limiter = rate_limiter
+        self.cookie = f"zsxq_access_token={access_token}; zsxqsessionid={session_id}"
+        self.quarantined = False
+        self.reason = None
+        self.requests = 0
+
+def parse_auth_config(auth, rate_limit_config=None):
+    """解析config.json中的auth配置，返回Credential列表
+    auth可以是单个凭证（字典），也可以是凭证列表；列表中的每项可用name命名，并用rateLimit覆盖全局限流配置。
+    """
+    entries = auth if isinstance(auth, list) else [auth]
+    credentials = []
+    for i, entry in enumerate(entries, 1):
+        if not entry or not entry.get('zsxq_access_token'):
+            continue
+        name = entry.get('name') or (f"auth{i}" if len(entries) > 1 else 'default')
+        limiter = AdaptiveRateLimiter.from_config(entry.get('rateLimit') or rate_limit_config)
+        credentials.append(Credential(name, entry['zsxq_access_token'], entry.get('zsxqsessionid', ''), limiter))
+    return credentials
+
+class CredentialPool:
+    """凭证池：请求分散到所有可用的凭证上，每个凭证使用自己的限流器
+    每次请求选择限流器可以最早放行的凭证（相同时选择请求数最少的），总吞吐量约为各凭证速率之和。
+    凭证被服务器拒绝（登录失效）时隔离，之后的请求只使用其余凭证。线程安全。
+    """
+
+    def __init__(self, credentials):
+        if not credentials:
+            raise ValueError("config.json的auth中没有可用的凭证")
+        self.credentials = list(credentials)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def healthy(self):
+        return [credential for credential in self.credentials if not credential.quarantined]
+
+    def acquire(self):
+        """选择一个凭证并从它的限流器获取令牌（必要时阻塞等待）
+        Returns:
+            tuple: (Credential, 等待秒数)，没有可用凭证时返回(None, 0.0)
+        """
+        with self._lock:
+            candidates = self.healthy()
+            if not candidates:
+                return None, 0.0
+            credential = min(candidates, key=lambda c: (c.rate_limiter.estimated_wait(), c.requests))
+            credential.requests += 1
+        return credential, credential.rate_limiter.acquire()
+
+    def quarantine(self, credential, reason=''):
+        """隔离被服务器拒绝的凭证
+        Returns:
+            bool: 是否还有其他可用的凭证
+        """
+        with self._lock:
+            if not credential.quarantined:
+                credential.quarantined = True
+                credential.reason = reason
+                remaining = len(self.healthy())
+                get_metrics().count('credentials_quarantined', credential=credential.name)
+                logger.warning("凭证 %s 被服务器拒绝，已停用（剩余%s个可用凭证）：%s", credential.name, remaining, reason,
+                               extra={'fields': {'event': 'credential_quarantined', 'credential': credential.name,
+                                                 'remaining': remaining, 'reason': reason}})
+            return bool(self.healthy())
+
+    def merge(self, credentials):
+        """加入新的凭证（如config.json中新填写的凭证），已有的凭证（相同access_token）不重复加入
+        Returns:
+            int: 新加入的凭证数
+        """
+        with self._lock:
+            known = {credential.access_token for credential in self.credentials}
+            added = [credential for credential in credentials if credential.access_token not in known]
+            names = {credential.name for credential in self.credentials}
+            for credential in added:
+                if credential.name in names:
+                    credential.name = f"{credential.name}#{len(self.credentials) + 1}"
+                names.add(credential.name)
+                self.credentials.append(credential)
+        for credential in added:
+            logger.info("加入新的凭证 %s", credential.name)
+        return len(added)
+
+    def summary(self):
+        """各凭证的请求数和状态，用于运行结束时输出"""
+        return ', '.join(f"{credential.name}:{credential.requests}次{'（已停用）' if credential.quarantined else ''}"
+                         for credential in self.credentials)
@@ -1,69 +1,58 @@
 import os
 import json
-import requests
 import time
-import hashlib
 from datetime import datetime
+from retry_policy import FatalError
+from zsxq_client import ZsxqClient
+from crawler import iter_topics, iter_topics_partitioned, stream_topic_list
+from log_utils import get_logger, LazyJson, add_logging_arguments, setup_logging_from_args
 
-def load_config(config_file='config.json'):
-    """加载配置文件"""
-    with open(config_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+logger = get_logger('get_article_list')
 
-def process_url(url, headers, max_retries=3):
-    """处理单个URL的请求，提取topic_id和title，支持重试"""
-    for attempt in range(max_retries):
-        try:
-            print(f"\n开始请求URL: {url} (尝试 {attempt + 1}/{max_retries})")
-            response = requests.get(url, headers=headers, verify=False)
-            response.encoding = 'utf-8'
-            response.raise_for_status()
-            
-            resp_data = response.json()
-            # 检查响应数据结构
-            if 'resp_data' in resp_data and 'topics' in resp_data['resp_data']:
-                topics = resp_data['resp_data']['topics']
-                
-                results = []
-                failed_extracts = []
-                for topic in topics:
-                    topic_id = topic.get('topic_id', '')
-                    title = topic.get('title', '').split('\n')[0] if topic.get('title') else ''
-                    if topic_id and title:
-                        results.append(f"{topic_id} {title}")
-                    else:
-                        failed_extracts.append({
-                            'topic': topic,
-                            'reason': '缺少topic_id或title'
-                        })
-                
-                print(f"成功提取 {len(results)} 条记录")
-                if failed_extracts:
-                    print(f"提取失败 {len(failed_extracts)} 条记录")
-                return {
-                    'success': results,
-                    'failed': failed_extracts
-                }
-            else:
-                print(f"警告：响应数据结构不符合预期：{resp_data}")
-                if attempt < max_retries - 1:
-                    print("等待2秒后重试...")
-                    time.sleep(2)
-                    continue
-                return {
-                    'success': [],
-                    'failed': [{'url': url, 'reason': '响应数据结构不符合预期'}]
-                }
-        except Exception as e:
-            print(f"处理URL时发生错误：{e}")
-            if attempt < max_retries - 1:
-                print("等待2秒后重试...")
-                time.sleep(2)
-                continue
-            return {
-                'success': [],
-                'failed': [{'url': url, 'reason': str(e)}]
-            }
+def process_url(url, client):
+    """处理单个URL的请求，提取topic_id和title（重试由客户端的统一重试策略处理）"""
+    try:
+        logger.debug("开始请求URL: %s", url)
+        resp_data = client.request_json(url)
+    except FatalError:
+        raise
+    except Exception as e:
+        logger.warning("处理URL时发生错误：%s", e)
+        return {
+            'success': [],
+            'failed': [{'url': url, 'reason': str(e)}]
+        }
+    
+    # 检查响应数据结构
+    if 'resp_data' not in resp_data or 'topics' not in resp_data['resp_data']:
+        logger.warning("警告：响应数据结构不符合预期")
+        logger.debug("响应数据：%s", LazyJson(resp_data))
+        return {
+            'success': [],
+            'failed': [{'url': url, 'reason': '响应数据结构不符合预期'}]
+        }
+    
+    topics = resp_data['resp_data']['topics']
+    results = []
+    failed_extracts = []
+    for topic in topics:
+        topic_id = topic.get('topic_id', '')
+        title = topic.get('title', '').split('\n')[0] if topic.get('title') else ''
+        if topic_id and title:
+            results.append(f"{topic_id} {title}")
+        else:
+            failed_extracts.append({
+                'topic': topic,
+                'reason': '缺少topic_id或title'
+            })
+    
+    logger.info("成功提取 %s 条记录", len(results))
+    if failed_extracts:
+        logger.warning("提取失败 %s 条记录", len(failed_extracts))
+    return {
+        'success': results,
+        'failed': failed_extracts
+    }
 
 def main():
     # 创建日志目录
@@ -71,18 +60,13 @@ def main():
     os.makedirs(log_dir, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # 加载配置文件
-    print("加载配置文件...")
-    config = load_config()
-    
-    # 设置请求头
-    headers = config['headers'].copy()
-    headers['Cookie'] = f"zsxq_access_token={config['auth']['zsxq_access_token']}; zsxqsessionid={config['auth']['zsxqsessionid']}"
-    headers['Referer'] = config['headers'].get('Referer', 'https://wx.zsxq.com/')
-    headers['Referrer-Policy'] = config['headers'].get('Referrer-Policy', 'strict-origin-when-cross-origin')
+    # 加载配置文件并创建客户端
+    logger.info("加载配置文件...")
+    client = ZsxqClient()
     
     # 读取URL列表
-    print("读取URL列表...")
+    logger.info("读取URL列表...")
+    start_time = time.time()
     try:
         with open('articles_list.txt', 'r', encoding='utf-8') as f:
             urls = f.read().splitlines()
@@ -93,55 +77,117 @@ def main():
         failed_count = 0
         
         for i, url in enumerate(urls, 1):
-            print(f"\n处理第 {i}/{len(urls)} 个URL")
-            
-            # 更新时间戳和签名
-            timestamp = str(int(time.time()))
-            headers['x-timestamp'] = timestamp
-            signature = hashlib.sha1(timestamp.encode('utf-8')).hexdigest()
-            headers['x-signature'] = signature
+            logger.info("处理第 %s/%s 个URL", i, len(urls))
             
-            # 处理URL并获取结果
-            result = process_url(url.strip(), headers)
+            # 处理URL并获取结果（请求速率由客户端的限流器控制）
+            result = process_url(url.strip(), client)
             all_results.extend(result['success'])
             if result['failed']:
                 failed_count += 1
                 all_failures.extend(result['failed'])
             processed_count += 1
-            
-            # 每次请求后暂停2秒
-            print("暂停2秒...")
-            time.sleep(2)
-            
-            # 每处理10个URL后暂停30秒
-            if i % 10 == 0 and i < len(urls):
-                print("暂停30秒...")
-                time.sleep(30)
         
         # 保存成功结果
-        print("\n保存结果到all_list.txt...")
+        logger.info("保存结果到all_list.txt...")
         with open('all_list.txt', 'w', encoding='utf-8') as f:
             f.write('\n'.join(all_results))
         
         # 保存失败记录
         if all_failures:
             failure_log = f"{log_dir}/failures_{timestamp}.json"
-            print(f"保存失败记录到 {failure_log}")
+            logger.warning("保存失败记录到 %s", failure_log)
             with open(failure_log, 'w', encoding='utf-8') as f:
                 json.dump(all_failures, f, ensure_ascii=False, indent=2)
         
         # 输出统计信息
-        print(f"\n处理完成：")
-        print(f"总URL数: {len(urls)}")
-        print(f"成功处理URL数: {processed_count}")
-        print(f"提取失败URL数: {failed_count}")
-        print(f"成功提取记录数: {len(all_results)}")
-        print(f"失败记录数: {len(all_failures)}")
+        logger.info("处理完成：")
+        logger.info("总URL数: %s", len(urls))
+        logger.info("成功处理URL数: %s", processed_count)
+        logger.info("提取失败URL数: %s", failed_count)
+        logger.info("成功提取记录数: %s", len(all_results))
+        logger.info("失败记录数: %s", len(all_failures))
+        elapsed = time.time() - start_time
+        logger.info("耗时: %.1f秒，%.1f条/秒", elapsed, len(all_results) / elapsed if elapsed > 0 else 0.0)
         
     except FileNotFoundError:
-        print("错误：找不到articles_list.txt文件")
+        logger.error("错误：找不到articles_list.txt文件")
+    except FatalError as e:
+        logger.error("运行已终止：%s", e)
     except Exception as e:
-        print(f"发生错误：{e}")
+        logger.error("发生错误：%s", e)
+
+def crawl(endpoint='topics', scope='all', group_id=None, download=False, workers=4, list_workers=0):
+    """自动翻页获取文章列表
+    每页的下一页游标从响应中读取，无需准备articles_list.txt；每篇文章获取后立即写入all_list.txt，
+    开启download时文章ID直接交给并发下载流程，列表获取与文章下载同时进行。
+    list_workers大于0时按时间窗口并发翻页，列表顺序不变。
+    """
+    log_dir = 'logs'
+    os.makedirs(log_dir, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    logger.info("加载配置文件...")
+    client = ZsxqClient(pool_size=max(10, workers + list_workers * 2 + 1))
+    
+    all_failures = []
+    if list_workers > 0:
+        topics = iter_topics_partitioned(client, list_workers, group_id=group_id, scope=scope, endpoint=endpoint)
+    else:
+        topics = iter_topics(client, group_id=group_id, scope=scope, endpoint=endpoint)
+    topic_ids = stream_topic_list(topics, 'all_list.txt', all_failures)
+    start_time = time.time()
+    try:
+        if download:
+            from bulk_download import download_articles
+            from single_article import retry_failed_articles, save_final_failures
+            download_failed_ids = []
+            save_failed_ids = []
+            success_count = download_articles(topic_ids, workers, download_failed_ids, save_failed_ids,
+                                              client=client)
+            failed_ids = download_failed_ids + save_failed_ids
+            if failed_ids:
+                logger.info("开始重试失败的文章，共%s篇...", len(failed_ids))
+                save_final_failures(retry_failed_articles(failed_ids, client))
+            logger.info("成功下载文章数: %s", success_count)
+        else:
+            total = sum(1 for _ in topic_ids)
+            elapsed = time.time() - start_time
+            logger.info("成功提取记录数: %s，%.1f条/秒", total, total / elapsed if elapsed > 0 else 0.0)
+    except FatalError as e:
+        logger.error("运行已终止：%s", e)
+        all_failures.append({'reason': str(e)})
+    except Exception as e:
+        logger.error("获取文章列表时发生错误：%s", e)
+        all_failures.append({'reason': str(e)})
+    finally:
+        logger.info("耗时: %.1f秒，列表已保存到all_list.txt", time.time() - start_time)
+    
+    if all_failures:
+        failure_log = f"{log_dir}/failures_{timestamp}.json"
+        logger.warning("保存失败记录到 %s", failure_log)
+        with open(failure_log, 'w', encoding='utf-8') as f:
+            json.dump(all_failures, f, ensure_ascii=False, indent=2)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    import argparse
+    from outputs import add_output_arguments, setup_outputs_from_args
+    parser = argparse.ArgumentParser(description='获取文章列表，生成all_list.txt')
+    parser.add_argument('--crawl', action='store_true', help='自动翻页获取文章列表，无需准备articles_list.txt')
+    parser.add_argument('--endpoint', choices=['topics', 'digests'], default='topics',
+                        help='列表接口：topics（end_time游标）或digests（index游标）')
+    parser.add_argument('--scope', default='all', help='topics接口的scope参数，如all、digests')
+    parser.add_argument('--group', help='星球ID，默认使用config.json中的groupId')
+    parser.add_argument('--download', action='store_true', help='边获取列表边下载文章')
+    parser.add_argument('--workers', type=int, default=4, help='下载文章的并发线程数')
+    parser.add_argument('--list-workers', type=int, default=0,
+                        help='按时间窗口并发翻页的线程数，默认0（顺序翻页），用于文章很多的星球的首次抓取')
+    add_logging_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    outputs = setup_outputs_from_args(args, args.workers)
+    if args.crawl:
+        crawl(args.endpoint, args.scope, args.group, args.download, args.workers, args.list_workers)
+    else:
+        main()
+    outputs.close()
@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+from retry_policy import PERMANENT
+from log_utils import get_logger
+
+logger = get_logger('journal')
+
+DEFAULT_JOURNAL = 'logs/journal.jsonl'
+
+# 每篇文章的处理结果，以最后一条记录为准
+STATUS_SAVED = 'saved'
+STATUS_FAILED = 'failed'
+
+# 失败发生的阶段
+STAGE_DOWNLOAD = 'download'
+STAGE_SAVE = 'save'
+STAGE_MISSING = 'missing'
+
+class RunJournal:
+    """只追加的处理结果日志（JSON Lines），代替failed_down.txt、download_failed_ids.txt等分散的失败文件
+    每篇文章保存或失败时立即追加一条记录并flush，进程被杀死也不会丢失；默认每条记录都fsync，断电也不会丢失。
+    fsync_interval大于0时改为每隔fsync_interval秒（以及关闭时）fsync一次，减少磁盘同步次数，
+    代价是断电时可能丢失最后一段时间的记录（这些文章下次会重新下载）。
+    重新运行时读取已有记录：已保存的文章跳过，失败的文章只在重试阶段重新请求。可在多个线程中使用。
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL, fsync_interval=0.0):
+        self.path = path
+        self.fsync_interval = float(fsync_interval)
+        self.latest = {}
+        self._load()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        skipped = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程在写入一行的过程中被杀死，只会损坏最后一行
+                    skipped += 1
+                    continue
+                if record.get('id'):
+                    self.latest[str(record['id'])] = record
+        if skipped:
+            logger.warning("日志 %s 中有%s行不完整，已忽略", self.path, skipped)
+
+    def record(self, topic_id, status, **fields):
+        """追加一条记录，写入后立即flush并按fsync_interval fsync"""
+        record = {'ts': datetime.now().isoformat(timespec='seconds'), 'id': str(topic_id), 'status': status}
+        record.update({key: value for key, value in fields.items() if value is not None})
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self.latest[record['id']] = record
+            self._file.write(line)
+            self._file.flush()
+            now = time.monotonic()
+            if now - self._last_sync >= self.fsync_interval:
+                os.fsync(self._file.fileno())
+                self._last_sync = now
+
+    def saved(self, topic_id, path=None):
+        self.record(topic_id, STATUS_SAVED, path=path)
+
+    def failed(self, item, stage=STAGE_DOWNLOAD, final=None):
+        """记录失败，item为失败列表中的字典（id、reason，可选kind）"""
+        self.record(item['id'], STATUS_FAILED, stage=stage, reason=item.get('reason'), kind=item.get('kind'),
+                    final=final)
+
+    def status(self, topic_id):
+        record = self.latest.get(str(topic_id))
+        return record['status'] if record else None
+
+    def pending(self, topic_ids):
+        """返回还没有任何记录的文章ID（保持原顺序）"""
+        return [topic_id for topic_id in topic_ids if str(topic_id) not in self.latest]
+
+    def failures(self, include_permanent=False):
+        """返回最后一条记录为失败的文章（失败列表格式），默认不包括永久错误"""
+        items = []
+        for record in self.latest.values():
+            if record['status'] != STATUS_FAILED:
+                continue
+            if record.get('kind') == PERMANENT and not include_permanent:
+                continue
+            items.append({'id': record['id'], 'reason': record.get('reason', ''), 'kind': record.get('kind'),
+                          'stage': record.get('stage')})
+        return items
+
+    def counts(self):
+        saved = sum(1 for record in self.latest.values() if record['status'] == STATUS_SAVED)
+        return saved, len(self.latest) - saved
+
+    def sync(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def compact(self):
+        """只保留每篇文章的最后一条记录，重写日志（先写临时文件再重命名）"""
+        with self._lock:
+            self._file.flush()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for record in self.latest.values():
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+def rotate(path=DEFAULT_JOURNAL):
+    """重新开始：把已有日志改名为{path}.{时间}，返回新文件名，没有日志时返回None"""
+    if not os.path.exists(path):
+        return None
+    rotated = f"{path}.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    os.replace(path, rotated)
+    return rotated
+
+# 旧版本的失败文件格式
+_LEGACY_ID_REASON_RE = re.compile(r'^(\d+)\s*[:：]\s*(.*)$')
+_LEGACY_BLOCK_RE = re.compile(r'文章ID:\s*(\d+)\s*\n(?:标题:.*\n)?失败原因:\s*(.*)')
+
+def import_legacy(journal, paths=('failed_down.txt', 'download_failed_ids.txt', 'save_failed_ids.txt',
+                                  'missing_articles.txt')):
+    """把旧版本生成的失败文件导入日志（作为待重试的失败记录），已有记录的文章不导入
+    Returns:
+        int: 导入的文章数
+    """
+    imported = 0
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        items = [{'id': m.group(1), 'reason': m.group(2).strip()} for m in _LEGACY_BLOCK_RE.finditer(text)]
+        if not items:
+            for line in text.splitlines():
+                match = _LEGACY_ID_REASON_RE.match(line.strip())
+                if match:
+                    items.append({'id': match.group(1), 'reason': match.group(2).strip()})
+                elif line.strip().isdigit():
+                    items.append({'id': line.strip(), 'reason': '文件未能成功保存到articles目录'})
+        stage = STAGE_MISSING if 'missing' in path else STAGE_SAVE if 'save_failed' in path else STAGE_DOWNLOAD
+        for item in items:
+            if journal.status(item['id']) is None:
+                journal.failed(item, stage)
+                imported += 1
+        logger.info("从 %s 读取%s条失败记录", path, len(items))
+    return imported
+
+def add_journal_arguments(parser):
+    """为命令行解析器添加处理日志参数"""
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL, help='处理结果日志，重新运行时从中断处继续')
+    parser.add_argument('--fresh', action='store_true', help='忽略已有的处理日志（改名保留），从头开始')
+    parser.add_argument('--retry-permanent', action='store_true',
+                        help='重试阶段也重新请求永久错误（如文章不存在）的文章')
+    parser.add_argument('--journal-fsync-interval', type=float, default=0.0, metavar='SECONDS',
+                        help='每隔多少秒fsync一次处理日志，默认0（每条记录都fsync）；'
+                             '大于0时减少磁盘同步，但断电时可能丢失最后这段时间的记录')
+
+def open_journal_from_args(args):
+    """根据命令行参数打开处理日志"""
+    if getattr(args, 'fresh', False):
+        rotated = rotate(args.journal)
+        if rotated:
+            logger.info("已有的处理日志已改名为 %s", rotated)
+    return RunJournal(args.journal, getattr(args, 'journal_fsync_interval', 0.0))
+
+if __name__ == '__main__':
+    import argparse
+    from log_utils import add_logging_arguments, setup_logging_from_args
+    parser = argparse.ArgumentParser(description='查看和维护处理结果日志')
+    parser.add_argument('command', choices=['report', 'compact', 'import-legacy'],
+                        help='report: 列出失败的文章；compact: 每篇文章只保留最后一条记录；'
+                             'import-legacy: 导入旧版本的failed_down.txt等失败文件')
+    parser.add_argument('--journal', default=DEFAULT_JOURNAL, help='处理结果日志')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    journal = RunJournal(args.journal)
+    try:
+        if args.command == 'report':
+            saved, failed = journal.counts()
+            print(f"已保存{saved}篇，失败{failed}篇")
+            for item in journal.failures(include_permanent=True):
+                kind = '（永久错误，默认不重试）' if item['kind'] == PERMANENT else ''
+                print(f"{item['id']}\t{item['stage'] or ''}\t{item['reason']}{kind}")
+        elif args.command == 'compact':
+            journal.compact()
+            print(f"已压缩，共{len(journal.latest)}篇文章")
+        else:
+            print(f"导入{import_legacy(journal)}篇")
+    finally:
+        journal.close()
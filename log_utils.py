@@ -0,0 +1,154 @@
+import sys
+import json
+import time
+import logging
+import threading
+
+LOGGER_NAME = 'zsxq'
+
+def get_logger(name=None):
+    """获取项目日志记录器，name为模块名时返回zsxq.{name}"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}" if name else LOGGER_NAME)
+
+class LazyJson:
+    """延迟序列化的JSON参数
+    作为日志参数使用（logger.debug("数据: %s", LazyJson(data))），
+    只有该级别的日志确实需要输出时才会调用json.dumps。
+    """
+
+    def __init__(self, obj, indent=2, limit=None):
+        self.obj = obj
+        self.indent = indent
+        self.limit = limit
+
+    def __str__(self):
+        text = json.dumps(self.obj, ensure_ascii=False, indent=self.indent)
+        if self.limit and len(text) > self.limit:
+            text = text[:self.limit] + f"...（共{len(text)}字符）"
+        return text
+
+class LazyText:
+    """延迟截断的长文本参数，用于输出响应内容等可能很大的字符串"""
+
+    def __init__(self, text, limit=500):
+        self.text = text
+        self.limit = limit
+
+    def __str__(self):
+        text = str(self.text)
+        if len(text) > self.limit:
+            return text[:self.limit] + f"...（共{len(text)}字符）"
+        return text
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行JSON，便于日志采集系统解析
+    通过extra={'fields': {...}}附加的结构化字段会合并到输出中。
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class ProgressBar:
+    """安静模式下在stderr显示的单行进度条，非安静模式下不输出"""
+
+    def __init__(self, total=None, desc='', stream=None, min_interval=0.2):
+        self.total = total
+        self.desc = desc
+        self.count = 0
+        self.failed = 0
+        self.stream = stream or sys.stderr
+        self.min_interval = min_interval
+        self._start = time.monotonic()
+        self._last_draw = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, n=1, failed=False):
+        with self._lock:
+            self.count += n
+            if failed:
+                self.failed += n
+            if _progress_enabled:
+                now = time.monotonic()
+                if now - self._last_draw >= self.min_interval:
+                    self._last_draw = now
+                    self._draw(now)
+
+    def _draw(self, now):
+        elapsed = now - self._start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        total = f"/{self.total}" if self.total else ''
+        self.stream.write(f"\r{self.desc} {self.count}{total} 失败{self.failed} {rate:.1f}篇/秒")
+        self.stream.flush()
+
+    def summary(self):
+        """返回处理数量、耗时和吞吐量的摘要文本，用于运行结束时输出"""
+        elapsed = time.monotonic() - self._start
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        return f"{self.desc}共{self.count}篇，失败{self.failed}篇，耗时{elapsed:.1f}秒，{rate:.1f}篇/秒"
+
+    def close(self):
+        with self._lock:
+            if _progress_enabled:
+                self._draw(time.monotonic())
+                self.stream.write('\n')
+                self.stream.flush()
+
+_progress_enabled = False
+
+def setup_logging(level='INFO', quiet=False, json_file=None):
+    """配置日志输出
+    Args:
+        level: 控制台日志级别（DEBUG、INFO、WARNING、ERROR）
+        quiet: 安静模式，控制台只输出警告和错误，并显示进度条
+        json_file: 可选，将日志以JSON Lines格式写入该文件（级别同level）
+    """
+    global _progress_enabled
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers.clear()
+    logger.propagate = False
+    level = logging.getLevelName(level.upper()) if isinstance(level, str) else level
+    logger.setLevel(level)
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    console.setLevel(max(level, logging.WARNING) if quiet else level)
+    logger.addHandler(console)
+
+    if json_file:
+        file_handler = logging.FileHandler(json_file, encoding='utf-8')
+        file_handler.setFormatter(JsonLinesFormatter())
+        file_handler.setLevel(level)
+        logger.addHandler(file_handler)
+
+    _progress_enabled = bool(quiet)
+    return logger
+
+def add_logging_arguments(parser):
+    """为命令行解析器添加日志相关参数"""
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help='日志级别，DEBUG时输出完整的文章和响应数据')
+    parser.add_argument('--quiet', action='store_true', help='安静模式：只输出警告和错误，并显示进度条')
+    parser.add_argument('--log-json', metavar='FILE', help='同时以JSON Lines格式将日志写入该文件')
+
+def setup_logging_from_args(args):
+    return setup_logging(args.log_level, args.quiet, args.log_json)
+
+# 未调用setup_logging时（例如作为模块导入使用）保持与print相同的输出效果
+_default_logger = logging.getLogger(LOGGER_NAME)
+if not _default_logger.handlers:
+    _default_handler = logging.StreamHandler(sys.stdout)
+    _default_handler.setFormatter(logging.Formatter('%(message)s'))
+    _default_logger.addHandler(_default_handler)
+    _default_logger.setLevel(logging.INFO)
+    _default_logger.propagate = False
@@ -1,14 +1,15 @@
-import os
 import json
 from datetime import datetime
 import requests
-import time
-import hashlib
+from retry_policy import FatalError
+from media import render_media
+from comments import FULL_COMMENTS_KEY
+from article_store import get_article_store
+from metrics import get_metrics
+from zsxq_client import get_default_client
+from log_utils import get_logger, LazyJson, ProgressBar, add_logging_arguments, setup_logging_from_args
 
-def load_config(config_file='config.json'):
-    """加载配置文件"""
-    with open(config_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+logger = get_logger('main')
 
 def sanitize_filename(title):
     # 移除文件名中的非法字符和控制字符
@@ -28,20 +29,82 @@ def sanitize_filename(title):
     # 限制文件名长度，预留扩展名空间
     return filename[:80]
 
-def extract_and_save_article(topic, output_dir='articles'):
-    print("\n开始处理文章...")
-    print(f"文章数据: {json.dumps(topic, ensure_ascii=False, indent=2)}")
-    
-    # 确保输出目录存在
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"创建输出目录: {output_dir}")
+# 默认输出后端：为None时每篇文章保存为articles目录下的txt文件，
+# 通过set_default_archive设置PackedArchive后改为追加写入压缩归档
+_default_archive = None
+
+def set_default_archive(archive):
+    """设置extract_and_save_article默认使用的归档（PackedArchive），传入None恢复txt文件输出"""
+    global _default_archive
+    _default_archive = archive
+
+def get_default_archive():
+    return _default_archive
+
+# 全文索引：通过set_default_search_index设置SearchIndex后，每篇保存的文章同时写入索引
+_default_search_index = None
+
+def set_default_search_index(index):
+    """设置extract_and_save_article保存文章后写入的全文索引（SearchIndex），传入None不写索引"""
+    global _default_search_index
+    _default_search_index = index
+
+# 列式元数据：通过set_default_metadata_store设置MetadataStore后，每篇保存的文章同时记录阅读数、点赞数等元数据
+_default_metadata_store = None
+
+def set_default_metadata_store(store):
+    """设置extract_and_save_article保存文章后写入的列式元数据存储（MetadataStore），传入None不记录"""
+    global _default_metadata_store
+    _default_metadata_store = store
+
+# 完整评论：通过set_default_comment_fetcher设置CommentFetcher后，
+# 评论数超过预览条数的文章在渲染前获取完整评论
+_default_comment_fetcher = None
+
+def set_default_comment_fetcher(fetcher):
+    """设置extract_and_save_article渲染前使用的评论获取器（CommentFetcher），传入None只保存预览评论"""
+    global _default_comment_fetcher
+    _default_comment_fetcher = fetcher
+
+def get_default_comment_fetcher():
+    return _default_comment_fetcher
+
+# 媒体文件：通过set_default_media_downloader设置MediaDownloader后，渲染前下载图片和附件，文章中写入本地路径
+_default_media_downloader = None
+
+def set_default_media_downloader(downloader):
+    """设置extract_and_save_article渲染前使用的媒体下载器（MediaDownloader），传入None不下载"""
+    global _default_media_downloader
+    _default_media_downloader = downloader
+
+def needs_topic_preparation():
+    """是否设置了渲染前需要联网补全文章的步骤（完整评论、媒体文件）"""
+    return _default_comment_fetcher is not None or _default_media_downloader is not None
+
+def prepare_topic(topic, client=None):
+    """渲染前补全文章：获取完整评论、下载图片和附件（未启用时不做任何事）"""
+    prepare_topics([topic], client)
+
+def prepare_topics(topics, client=None):
+    """并发补全多篇文章，全部完成后返回；已补全过的文章不会重复请求"""
+    if _default_comment_fetcher is not None:
+        _default_comment_fetcher.complete_many(topics, client)
+    if _default_media_downloader is not None:
+        _default_media_downloader.localize_many(topics, client)
+
+def render_article(topic):
+    """将文章数据渲染为文本
+    Returns:
+        tuple: (文件名, 文章文本)
+    """
+    logger.debug("开始处理文章...")
+    logger.debug("文章数据: %s", LazyJson(topic))
     
     # 提取文章信息
     topic_id = topic.get('topic_id', '')
     talk = topic.get('talk', {})
     if not talk:
-        print(f"警告: 文章 {topic_id} 没有talk字段，将使用整个topic内容")
+        logger.warning("警告: 文章 %s 没有talk字段，将使用整个topic内容", topic_id)
         title = topic.get('title', '').split('\n')[0]
         content = json.dumps(topic, ensure_ascii=False, indent=2)
     else:
@@ -54,12 +117,8 @@ def extract_and_save_article(topic, output_dir='articles'):
     comments_count = topic.get('comments_count', 0)
     comments = topic.get('show_comments', [])
     
-    print(f"提取的文章信息:")
-    print(f"- 主题ID: {topic_id}")
-    print(f"- 标题: {title}")
-    print(f"- 作者: {author}")
-    print(f"- 发布时间: {publish_time}")
-    print(f"- 评论数: {comments_count}")
+    logger.debug("提取的文章信息: 主题ID=%s 标题=%s 作者=%s 发布时间=%s 评论数=%s",
+                 topic_id, title, author, publish_time, comments_count)
     
     # 创建文件名
     safe_title = sanitize_filename(title)
@@ -67,8 +126,6 @@ def extract_and_save_article(topic, output_dir='articles'):
     # 处理ISO 8601格式的时间字符串
     publish_date = datetime.fromisoformat(publish_time.replace('Z', '+00:00')).strftime('%Y%m%d')
     filename = f"{publish_date}_{safe_title}_{topic_id}.txt"
-    file_path = os.path.join(output_dir, filename)
-    print(f"将保存到文件: {file_path}")
     
     # 组织文章信息
     article_text = f"主题ID：{topic_id}\n"
@@ -77,8 +134,10 @@ def extract_and_save_article(topic, output_dir='articles'):
     article_text += f"作者：{author}\n"
     article_text += f"评论数：{comments_count}\n"
     article_text += f"\n正文内容：\n{content}\n"
+    article_text += render_media(topic)
     
-    # 添加评论信息
+    # 添加评论信息；回复只在获取了完整评论（--full-comments）时写入，默认输出与预览评论一致
+    full_comments = topic.get(FULL_COMMENTS_KEY)
     if comments:
         article_text += "\n评论列表：\n"
         for i, comment in enumerate(comments, 1):
@@ -86,165 +145,219 @@ def extract_and_save_article(topic, output_dir='articles'):
             article_text += f"评论者：{comment.get('owner', {}).get('name', 'Unknown')}\n"
             article_text += f"评论时间：{comment.get('create_time', '')}\n"
             article_text += f"评论内容：{comment.get('text', '')}\n"
+            if not full_comments:
+                continue
+            for reply in comment.get('replied_comments') or []:
+                replier = reply.get('owner', {}).get('name', 'Unknown')
+                article_text += f"  回复（{replier}，{reply.get('create_time', '')}）：{reply.get('text', '')}\n"
+    
+    return filename, article_text
+
+def extract_and_save_article(topic, output_dir='articles', archive=None, client=None):
+    """渲染文章并保存
+    Args:
+        topic: 文章数据
+        output_dir: txt文件的保存目录（目录布局和清单由article_store.configure_article_stores设置）
+        archive: 可选的PackedArchive，默认使用set_default_archive设置的归档；
+            设置归档时文章追加写入归档而不是单独的txt文件
+        client: 渲染前获取完整评论、下载媒体文件使用的ZsxqClient实例，默认使用进程内共享的客户端
+    Returns:
+        str: 保存位置（txt文件路径，或"归档目录#topic_id"）
+    """
+    if archive is None:
+        archive = _default_archive
+    prepare_topic(topic, client)
+    metrics = get_metrics()
+    with metrics.timer('render'):
+        filename, article_text = render_article(topic)
     
-    # 保存到文件
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(article_text)
+    if archive is not None:
+        with metrics.timer('disk_write'):
+            location = archive.append(topic.get('topic_id', ''), filename, article_text,
+                                      create_time=topic.get('create_time', ''))
+        logger.debug("文章已追加到归档: %s", location)
+        metrics.count('articles_saved')
+        _update_search_index(topic, article_text, location)
+        _record_metadata(topic)
+        return location
     
-    print(f"文章已成功保存到: {file_path}")
+    # 先写临时文件再重命名，内容未变化时不重写
+    with metrics.timer('disk_write'):
+        file_path = get_article_store(output_dir).write(topic.get('topic_id', ''), filename, article_text)
+    
+    logger.debug("文章已成功保存到: %s", file_path)
+    metrics.count('articles_saved')
+    _update_search_index(topic, article_text, file_path)
+    _record_metadata(topic)
     return file_path
 
-def process_articles(resp_data):
-    """处理resp_data.topics中的文章列表并保存为单独的txt文件"""
-    print("\n开始处理文章列表...")
+def _update_search_index(topic, article_text, location):
+    """文章已保存后写入全文索引，索引失败只记录警告，不影响保存结果"""
+    if _default_search_index is None:
+        return
     try:
-        print(f"响应数据结构: {json.dumps(list(resp_data.keys()), ensure_ascii=False)}")
-    except (AttributeError, TypeError) as e:
-        print(f"错误: 无法获取响应数据结构: {e}")
+        with get_metrics().timer('index'):
+            _default_search_index.add_article(topic, article_text, location)
+    except Exception as e:
+        logger.warning("文章 %s 写入全文索引失败：%s", topic.get('topic_id', ''), e)
+
+def _record_metadata(topic):
+    """文章已保存后记录列式元数据，失败只记录警告，不影响保存结果"""
+    if _default_metadata_store is None:
         return
-    
+    try:
+        _default_metadata_store.add_topic(topic)
+    except Exception as e:
+        logger.warning("文章 %s 记录元数据失败：%s", topic.get('topic_id', ''), e)
+
+def topic_needs_detail(topic):
+    """判断列表页中的文章数据是否足以生成文章文件
+    缺少ID、发布时间、正文或作者，或者是列表中只有摘要的长文章时，需要再请求/info接口获取完整数据。
+    """
+    if not topic.get('topic_id') or not topic.get('create_time'):
+        return True
+    if topic.get('type', 'talk') != 'talk':
+        return False
+    talk = topic.get('talk') or {}
+    if not talk.get('text') or not talk.get('owner'):
+        return True
+    # 长文章在列表中只返回摘要
+    if talk.get('article') or talk.get('text_truncated'):
+        return True
+    return False
+
+def process_articles(resp_data, progress=None, client=None):
+    """处理resp_data.topics中的文章列表并保存为单独的txt文件
+    Args:
+        resp_data: 列表接口的响应数据
+        progress: 可选的ProgressBar，安静模式下显示进度
+        client: 补全文章使用的ZsxqClient实例，默认使用进程内共享的客户端
+    """
+    logger.debug("开始处理文章列表...")
     if not isinstance(resp_data, dict):
-        print(f"错误: resp_data不是字典类型，实际类型为: {type(resp_data)}")
+        logger.error("错误: resp_data不是字典类型，实际类型为: %s", type(resp_data))
         return
+    logger.debug("响应数据结构: %s", LazyJson(list(resp_data.keys()), indent=None))
     
     # 从resp_data['resp_data']中获取topics数组
     topics = resp_data.get('resp_data', {}).get('topics', [])
     if not topics:
-        print("错误: 在resp_data.resp_data.topics中未找到文章")
-        print(f"完整响应数据: {json.dumps(resp_data, ensure_ascii=False, indent=2)}")
+        logger.error("错误: 在resp_data.resp_data.topics中未找到文章")
+        logger.debug("完整响应数据: %s", LazyJson(resp_data))
         return
     
-    print(f"找到 {len(topics)} 篇文章待处理")
+    logger.info("找到 %d 篇文章待处理", len(topics))
     failed_articles = []
     for i, topic in enumerate(topics, 1):
-        print(f"\n处理第 {i}/{len(topics)} 篇文章")
+        logger.debug("处理第 %d/%d 篇文章", i, len(topics))
         try:
-            file_path = extract_and_save_article(topic)
+            file_path = extract_and_save_article(topic, client=client)
+            if progress is not None:
+                progress.update(failed=not file_path)
             if file_path:
-                print(f"已成功保存文章：{file_path}")
+                logger.info("已成功保存文章：%s", file_path)
             else:
                 article_id = topic.get('topic_id', 'unknown')
                 failed_articles.append({'id': article_id, 'reason': '保存失败'})
-                print("文章处理失败，跳过")
+                logger.warning("文章处理失败，跳过")
         except Exception as e:
+            if progress is not None:
+                progress.update(failed=True)
             article_id = topic.get('topic_id', 'unknown')
             failed_articles.append({'id': article_id, 'reason': str(e)})
-            print(f"处理文章时发生错误：{e}")
+            logger.error("处理文章 %s 时发生错误：%s", article_id, e)
     
     if failed_articles:
-        print("\n发现以下文章保存失败:")
+        logger.warning("发现以下文章保存失败:")
         with open('failed_articles.txt', 'w', encoding='utf-8') as f:
             for article in failed_articles:
                 f.write(f"文章ID: {article['id']}, 失败原因: {article['reason']}\n")
-                print(f"文章ID: {article['id']}, 失败原因: {article['reason']}")
+                logger.warning("文章ID: %s, 失败原因: %s", article['id'], article['reason'])
 
-def process_url(url, headers):
+def process_url(url, client, progress=None):
     """处理单个URL的请求"""
-    print(f"\n处理URL: {url}")
+    logger.info("处理URL: %s", url)
     try:
-        response = requests.get(url, headers=headers, verify=False)
-        response.encoding = 'utf-8'
-        response.raise_for_status()
-        
-        print(f"API响应状态码: {response.status_code}")
-        resp_data = response.json()
+        # 重试、退避和熔断由客户端的统一重试策略处理
+        resp_data = client.request_json(url)
         
         # 处理文章数据
-        process_articles(resp_data)
+        process_articles(resp_data, progress, client)
         return True
+    except FatalError:
+        raise
     except requests.exceptions.RequestException as e:
-        print(f"请求失败：{e}")
+        logger.error("请求失败：%s", e)
     except json.JSONDecodeError as e:
-        print(f"JSON解析失败：{e}")
-        print(f"响应内容：{response.text}")
+        logger.error("JSON解析失败：%s", e)
     except Exception as e:
-        print(f"处理URL时发生错误：{e}")
+        logger.error("处理URL时发生错误：%s", e)
     return False
 
-# 示例使用
-if __name__ == '__main__':
-    # 加载配置文件
-    print("开始加载配置文件...")
-    config = load_config()
-    print("配置文件加载成功")
+def crawl_articles(client, scope='all', group_id=None, progress=None):
+    """自动翻页请求文章列表并保存每一页中的文章，无需准备list.txt"""
+    from crawler import iter_pages
+    for url, resp_data, topics in iter_pages(client, group_id=group_id, scope=scope):
+        logger.info("处理URL: %s", url)
+        process_articles(resp_data, progress, client)
+
+def cli():
+    """命令行入口：下载文章列表页中的文章（list.txt或--crawl自动翻页）"""
+    import argparse
+    from outputs import add_output_arguments, setup_outputs_from_args
+    parser = argparse.ArgumentParser(description='下载文章列表页中的文章')
+    parser.add_argument('--crawl', action='store_true', help='自动翻页获取文章，无需准备list.txt')
+    parser.add_argument('--scope', default='all', help='列表的scope参数，如all、digests')
+    parser.add_argument('--group', help='星球ID，默认使用config.json中的groupId')
+    add_logging_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    outputs = setup_outputs_from_args(args)
     
-    # 设置请求头
-    headers = config['headers'].copy()
-    headers['Cookie'] = f"zsxq_access_token={config['auth']['zsxq_access_token']}; zsxqsessionid={config['auth']['zsxqsessionid']}"
-    headers['Referer'] = config['headers'].get('Referer', 'https://wx.zsxq.com/')
-    headers['Referrer-Policy'] = config['headers'].get('Referrer-Policy', 'strict-origin-when-cross-origin')
+    # 加载配置文件并创建客户端；完整评论和媒体下载使用同一个客户端（同一个限流器、重试预算和熔断器）
+    logger.info("开始加载配置文件...")
+    client = get_default_client()
+    logger.info("配置文件加载成功")
+    progress = ProgressBar(desc='保存文章')
     
-    # 读取URL列表文件
-    print("\n开始读取URL列表...")
-    try:
-        with open('list.txt', 'r', encoding='utf-8') as f:
-            urls = f.read().splitlines()
+    if args.crawl:
+        try:
+            crawl_articles(client, args.scope, args.group, progress)
+            logger.info("所有文章处理完成")
+        except FatalError as e:
+            logger.error("运行已终止：%s", e)
+        except Exception as e:
+            logger.error("自动翻页时发生错误：%s", e)
+    else:
+        # 读取URL列表文件
+        logger.info("开始读取URL列表...")
+        try:
+            with open('list.txt', 'r', encoding='utf-8') as f:
+                urls = f.read().splitlines()
         
-        print(f"共读取到 {len(urls)} 个URL")
+            logger.info("共读取到 %d 个URL", len(urls))
         
-        # 处理每个URL
-        for i, url in enumerate(urls, 1):
-            # 更新时间戳和签名
-            timestamp = str(int(time.time()))
-            headers['x-timestamp'] = timestamp
-            signature = hashlib.sha1(timestamp.encode('utf-8')).hexdigest()
-            headers['x-signature'] = signature
-            
-            # 处理URL
-            success = process_url(url.strip(), headers)
-            
-            # 每处理10个URL后暂停30秒
-            if i % 10 == 0 and i < len(urls):
-                print(f"\n已处理{i}个URL，暂停30秒...")
-                time.sleep(30)
-                print("继续处理...")
+            # 处理每个URL
+            for i, url in enumerate(urls, 1):
+                # 处理URL（请求速率由客户端的限流器控制）
+                success = process_url(url.strip(), client, progress)
         
-        print("\n所有URL处理完成")
-    except FileNotFoundError:
-        print("错误：找不到list.txt文件")
-    except Exception as e:
-        print(f"处理URL列表时发生错误：{e}")
+            logger.info("所有URL处理完成")
+        except FileNotFoundError:
+            logger.error("错误：找不到list.txt文件")
+        except FatalError as e:
+            logger.error("运行已终止：%s", e)
+        except UnicodeEncodeError as e:
+            logger.error("编码错误：%s，请检查Cookie等请求头信息是否包含非法字符", e)
+        except Exception as e:
+            logger.error("处理URL列表时发生错误：%s", e)
+    progress.close()
+    logger.info("%s", progress.summary())
+    outputs.close()
 
-    
-    print(f"\n请求URL: {url}")
-    
-    # 设置请求头
-    headers = config['headers'].copy()  # 创建headers的副本以避免修改原始配置
-    headers['Cookie'] = f"zsxq_access_token={config['auth']['zsxq_access_token']}; zsxqsessionid={config['auth']['zsxqsessionid']}"
-    # 设置referrer和referrerPolicy
-    headers['Referer'] = config['headers'].get('Referer', 'https://wx.zsxq.com/')
-    headers['Referrer-Policy'] = config['headers'].get('Referrer-Policy', 'strict-origin-when-cross-origin')
-    
-    # 更新时间戳和签名
-    timestamp = str(int(time.time()))
-    headers['x-timestamp'] = timestamp
-    
-    # 生成签名
-    string_to_sign = timestamp
-    signature = hashlib.sha1(string_to_sign.encode('utf-8')).hexdigest()
-    headers['x-signature'] = signature
-    
-    print("\n发送API请求...")
-    try:
-        # 发送GET请求
-        response = requests.get(url, headers=headers, verify=False)
-        response.encoding = 'utf-8'  # 设置响应编码
-        response.raise_for_status()  # 检查响应状态
-        
-        print(f"API响应状态码: {response.status_code}")
-        resp_data = response.json()
-        print("\nAPI响应数据：")
-        print(json.dumps(resp_data, ensure_ascii=False, indent=2))
-        
-        # 处理文章数据
-        process_articles(resp_data)
-        print("\n所有文章处理完成")
-    except requests.exceptions.RequestException as e:
-        print(f"请求失败：{e}")
-    except json.JSONDecodeError as e:
-        print(f"JSON解析失败：{e}")
-        print(f"响应内容：{response.text}")
-    except UnicodeEncodeError as e:
-        print(f"编码错误：{e}，请检查Cookie等请求头信息是否包含非法字符")
-    except Exception as e:
-        print(f"发生未预期的错误：{e}")
\ No newline at end of file
+# 示例使用
+if __name__ == '__main__':
+    # 作为脚本运行时本模块是__main__，而各输出组件设置在main模块的默认值中；在main模块中运行，默认值只需设置一次
+    from main import cli
+    cli()
@@ -0,0 +1,436 @@
+import os
+import sqlite3
+import time
+import hashlib
+import mimetypes
+import threading
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from retry_policy import (RetryPolicy, FatalError, classify_error, FATAL, PERMANENT,
+                          RETRYABLE_HTTP_STATUS)
+from metrics import get_metrics, endpoint_name
+from log_utils import get_logger
+
+logger = get_logger('media')
+
+# 渲染前写入topic的本地媒体列表：[{'kind', 'name', 'path'}]，render_article据此输出本地路径
+MEDIA_KEY = '_media'
+
+KIND_IMAGE = 'image'
+KIND_FILE = 'file'
+KIND_AVATAR = 'avatar'
+KIND_BACKGROUND = 'background'
+
+# 图片地址中的签名参数，每次请求接口都会变化，不参与去重
+_SIGNATURE_PARAMS = {'e', 'token', 's'}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS urls (
+    url_key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    path TEXT NOT NULL,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT
+);
+'''
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def classify_media_error(error):
+    """图片服务器的错误分类：签名地址过期返回的401/403等4xx只影响这一个文件，
+    不按接口的凭证失效处理，媒体下载不会终止整个运行
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        if status is not None and 400 <= status < 500 and status not in RETRYABLE_HTTP_STATUS:
+            return PERMANENT
+    kind = classify_error(error)
+    return PERMANENT if kind == FATAL else kind
+
+def url_key(url):
+    """去掉签名参数后的地址，同一张图片在不同时间返回的地址得到相同的key"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _SIGNATURE_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+
+def _image_url(image):
+    for size in ('original', 'large', 'thumbnail'):
+        url = (image.get(size) or {}).get('url')
+        if url:
+            return url
+    return None
+
+def extract_media(topic, include_avatars=False):
+    """提取文章中的图片、附件（以及可选的头像、星球背景图）
+    Returns:
+        list: 每个元素为字典，包含kind、key（去重用）、name、ext，
+            图片和头像带url，附件带file_id（下载地址需要请求接口获取）
+    """
+    talk = topic.get('talk') or {}
+    refs = []
+
+    def add_images(images):
+        for image in images or []:
+            url = _image_url(image)
+            if url:
+                refs.append({'kind': KIND_IMAGE, 'key': url_key(url), 'url': url,
+                             'name': str(image.get('image_id', '')), 'ext': image.get('type')})
+
+    add_images(talk.get('images'))
+    for comment in topic.get('show_comments') or []:
+        add_images(comment.get('images'))
+    for item in talk.get('files') or []:
+        if item.get('file_id'):
+            name = item.get('name', '')
+            refs.append({'kind': KIND_FILE, 'key': f"file:{item['file_id']}", 'file_id': item['file_id'],
+                         'name': name, 'ext': os.path.splitext(name)[1].lstrip('.') or None})
+    if include_avatars:
+        owners = [talk.get('owner') or {}]
+        owners.extend((c.get('owner') or {}) for c in topic.get('show_comments') or [])
+        for owner in owners:
+            if owner.get('avatar_url'):
+                refs.append({'kind': KIND_AVATAR, 'key': url_key(owner['avatar_url']), 'url': owner['avatar_url'],
+                             'name': owner.get('name', ''), 'ext': None})
+        url = (topic.get('group') or {}).get('background_url')
+        if url:
+            refs.append({'kind': KIND_BACKGROUND, 'key': url_key(url), 'url': url, 'name': '', 'ext': None})
+    # 同一篇文章中重复出现的地址（同一作者的多条评论）只保留一次
+    unique = {}
+    for ref in refs:
+        unique.setdefault(ref['key'], ref)
+    return list(unique.values())
+
+class MediaStore:
+    """按内容哈希保存媒体文件（media/{sha256前两位}/{sha256}.{扩展名}）
+    urls表记录去掉签名参数的地址对应的文件，blobs表记录每个不同内容的文件：
+    相同地址只下载一次，不同地址但内容相同的文件（共用的头像、重复上传的图片）只保存一份。
+    未下载完的文件保存在media/.partial目录，同名的.validator文件记录服务器返回的ETag或Last-Modified，
+    下次用If-Range从断点继续下载，服务器上的文件已变化时重新下载。可在多个线程中使用。
+    """
+
+    def __init__(self, media_dir='media'):
+        self.media_dir = media_dir
+        self.partial_dir = os.path.join(media_dir, '.partial')
+        os.makedirs(self.partial_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(media_dir, 'media.db'), check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def lookup(self, key):
+        """返回地址对应的本地文件路径，未下载或文件已被删除时返回None"""
+        with self._lock:
+            row = self._conn.execute('SELECT path FROM urls WHERE url_key = ?', (key,)).fetchone()
+        if row is None or not os.path.exists(row[0]):
+            return None
+        return row[0]
+
+    def partial_path(self, key):
+        return os.path.join(self.partial_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.part')
+
+    def load_validator(self, part_path):
+        """临时文件对应的ETag或Last-Modified，没有记录时返回None"""
+        try:
+            with open(part_path + '.validator', 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def save_validator(self, part_path, validator):
+        path = part_path + '.validator'
+        if validator:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(validator)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def discard_partial(self, part_path):
+        """删除临时文件和对应的校验记录"""
+        for path in (part_path, part_path + '.validator'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def commit_file(self, key, part_path, sha256, ext=None):
+        """下载完成的文件按内容哈希入库：内容已存在时删除临时文件，复用已有文件
+        Returns:
+            str: 本地文件路径
+        """
+        suffix = f".{ext}" if ext else ''
+        with self._lock:
+            row = self._conn.execute('SELECT path FROM blobs WHERE sha256 = ?', (sha256,)).fetchone()
+            if row is not None and os.path.exists(row[0]):
+                path = row[0]
+                os.remove(part_path)
+            else:
+                path = os.path.join(self.media_dir, sha256[:2], sha256 + suffix)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                size = os.path.getsize(part_path)
+                os.replace(part_path, path)
+                self._conn.execute('INSERT OR REPLACE INTO blobs (sha256, path, size, created_at) VALUES (?, ?, ?, ?)',
+                                   (sha256, path, size, _now()))
+            self._conn.execute('INSERT OR REPLACE INTO urls (url_key, sha256, path, updated_at) VALUES (?, ?, ?, ?)',
+                               (key, sha256, path, _now()))
+            self._conn.commit()
+        self.save_validator(part_path, None)
+        return path
+
+    def stats(self):
+        with self._lock:
+            urls = self._conn.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+            blobs, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        return {'urls': urls, 'files': blobs, 'bytes': size}
+
+def _validator(response):
+    """可用于If-Range的校验值：强ETag，其次Last-Modified（弱ETag不能用于If-Range）"""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+def apply_stored_media(topic, store, include_avatars=False):
+    """不发送请求，在topic中写入已下载的媒体文件的本地路径（response_cache.py rerender使用）
+    没有下载过的文件路径为None；文章中没有任何已下载的文件时不做修改。
+    Returns:
+        bool: 是否写入了本地路径
+    """
+    if MEDIA_KEY in topic:
+        return False
+    media = [{'kind': ref['kind'], 'name': ref['name'], 'path': store.lookup(ref['key'])}
+             for ref in extract_media(topic, include_avatars)]
+    if not any(item['path'] for item in media):
+        return False
+    topic[MEDIA_KEY] = media
+    return True
+
+class MediaDownloader:
+    """并发下载文章中的图片和附件
+    下载在内部线程池中进行，按块流式写入临时文件（不把整个文件读入内存），中断后用Range请求续传；
+    同一地址同时被多篇文章引用时只下载一次。每次请求按统一的重试策略重试，
+    下载失败的文件在文章中保留原始地址，不影响文章保存。
+    """
+
+    def __init__(self, store=None, workers=4, include_avatars=False, chunk_size=64 * 1024, timeout=60,
+                 client=None, retry_policy=None):
+        self.store = store if store is not None else MediaStore()
+        self.workers = max(1, int(workers))
+        self.include_avatars = include_avatars
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._client = client
+        self.retry_policy = retry_policy
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='media-download')
+        self._pending = {}
+        # 本次运行中已失败的地址，其他文章再引用时不再重复下载
+        self._failed = {}
+        self._lock = threading.Lock()
+        self.downloaded = 0
+        self.reused = 0
+        self.failed = 0
+        self.bytes = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            from zsxq_client import get_default_client
+            self._client = get_default_client()
+        return self._client
+
+    def _policy(self, client):
+        # 媒体文件在图片服务器上，使用单独的错误分类、重试预算和熔断器，不影响接口请求；
+        # 图片服务器持续出错时只暂停媒体下载，不终止运行
+        if self.retry_policy is None:
+            self.retry_policy = RetryPolicy.from_config(client.config.get('retry'), classify=classify_media_error)
+            self.retry_policy.breaker.max_trips = None
+        return self.retry_policy
+
+    def _stream(self, key, url):
+        """下载一个文件到临时文件，已有部分内容时续传
+        续传请求带If-Range（上次响应的ETag或Last-Modified）：服务器上的文件已变化时返回完整内容，
+        不会把旧文件的前半部分和新文件的后半部分拼在一起
+        Returns:
+            tuple: (临时文件路径, sha256, Content-Type)
+        """
+        part_path = self.store.partial_path(key)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        validator = self.store.load_validator(part_path) if offset else None
+        if offset and validator is None:
+            # 没有记录校验值，无法确认临时文件与服务器上的文件相同，从头下载
+            self.store.discard_partial(part_path)
+            offset = 0
+        headers = {'Range': f"bytes={offset}-", 'If-Range': validator} if offset else {}
+        start = time.perf_counter()
+        received = 0
+        status = None
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                status = response.status_code
+                if status == 416:
+                    # 临时文件已经不小于服务器上的文件，删除后重新下载
+                    self.store.discard_partial(part_path)
+                    raise requests.exceptions.ChunkedEncodingError("续传位置无效，重新下载")
+                if offset and status != 206:
+                    # 服务器不支持续传，或文件已变化（If-Range不匹配），从头下载
+                    offset = 0
+                response.raise_for_status()
+                current = _validator(response)
+                if offset and current is not None and current != validator:
+                    # 服务器忽略了If-Range但文件已变化
+                    self.store.discard_partial(part_path)
+                    raise requests.exceptions.ChunkedEncodingError("文件在续传期间已变化，重新下载")
+                if not offset:
+                    self.store.save_validator(part_path, current)
+                hasher = hashlib.sha256()
+                if offset:
+                    with open(part_path, 'rb') as f:
+                        for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                            hasher.update(chunk)
+                expected = response.headers.get('Content-Length')
+                with open(part_path, 'ab' if offset else 'wb') as f:
+                    for chunk in response.iter_content(self.chunk_size):
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        received += len(chunk)
+                if expected is not None and received < int(expected):
+                    raise requests.exceptions.ChunkedEncodingError(f"下载不完整：{received}/{expected}字节")
+                return part_path, hasher.hexdigest(), response.headers.get('Content-Type')
+        finally:
+            with self._lock:
+                self.bytes += received
+            get_metrics().observe_request(endpoint_name(url), time.perf_counter() - start, received, status,
+                                          stage='media')
+
+    def _download(self, ref, client):
+        key = ref['key']
+        path = self.store.lookup(key)
+        if path is not None:
+            with self._lock:
+                self.reused += 1
+            return path
+        policy = self._policy(client)
+        url = ref.get('url')
+        if url is None:
+            resp_data = client.request_json(client.file_download_url(ref['file_id']))
+            url = resp_data.get('resp_data', {}).get('download_url')
+            if not url:
+                raise ValueError(f"附件 {ref['name']} 没有下载地址")
+        part_path, sha256, content_type = policy.call(lambda: self._stream(key, url), url)
+        ext = ref.get('ext')
+        if not ext and content_type:
+            guessed = mimetypes.guess_extension(content_type.split(';')[0].strip())
+            ext = guessed.lstrip('.') if guessed else None
+        path = self.store.commit_file(key, part_path, sha256, ext)
+        with self._lock:
+            self.downloaded += 1
+        logger.debug("已下载 %s -> %s", ref['name'] or url, path)
+        return path
+
+    def _submit(self, ref, client):
+        """提交下载任务，同一地址正在下载时返回同一个Future"""
+        with self._lock:
+            future = self._pending.get(ref['key']) or self._failed.get(ref['key'])
+            if future is None:
+                future = self._executor.submit(self._download, ref, client)
+                self._pending[ref['key']] = future
+                future.add_done_callback(lambda f, key=ref['key']: self._forget(key))
+            return future
+
+    def _forget(self, key):
+        with self._lock:
+            future = self._pending.pop(key, None)
+            if future is not None and future.exception() is not None:
+                self._failed[key] = future
+
+    def localize_many(self, topics, client=None):
+        """并发下载多篇文章的媒体文件，完成后在每篇文章中写入本地路径列表（topic['_media']）"""
+        client = client or self.client
+        jobs = []
+        for topic in topics:
+            if MEDIA_KEY in topic:
+                continue
+            refs = extract_media(topic, self.include_avatars)
+            jobs.append((topic, [(ref, self._submit(ref, client)) for ref in refs]))
+        for topic, futures in jobs:
+            media = []
+            for ref, future in futures:
+                try:
+                    path = future.result()
+                except FatalError:
+                    # 只有请求附件下载地址的接口（凭证失效）会抛出FatalError，图片服务器的错误见classify_media_error
+                    raise
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    logger.warning("文章 %s 的%s %s 下载失败：%s", topic.get('topic_id', ''), ref['kind'],
+                                   ref['name'] or ref.get('url'), e,
+                                   extra={'fields': {'event': 'media_failed', 'topic_id': str(topic.get('topic_id', '')),
+                                                     'kind': ref['kind'], 'reason': str(e)}})
+                    path = None
+                media.append({'kind': ref['kind'], 'name': ref['name'], 'path': path})
+            topic[MEDIA_KEY] = media
+
+    def localize(self, topic, client=None):
+        self.localize_many([topic], client)
+
+    def close(self):
+        self._executor.shutdown()
+        self.session.close()
+        stats = self.store.stats()
+        logger.info("媒体文件：下载%s个（%.1fMB），复用%s个，失败%s个；共%s个地址，%s个文件",
+                    self.downloaded, self.bytes / 1024 / 1024, self.reused, self.failed, stats['urls'], stats['files'])
+        self.store.close()
+
+def render_media(topic):
+    """渲染文章的图片、附件以及--media-avatars下载的头像和星球背景图（本地路径），
+    没有媒体或未启用--media时返回空字符串
+    """
+    media = topic.get(MEDIA_KEY) or []
+    if not media:
+        return ''
+    text = "\n图片和附件：\n"
+    for item in media:
+        if item['kind'] == KIND_IMAGE:
+            label = '图片'
+        elif item['kind'] == KIND_FILE:
+            label = f"附件 {item['name']}"
+        elif item['kind'] == KIND_AVATAR:
+            label = f"头像 {item['name']}"
+        else:
+            label = '星球背景图'
+        text += f"{label}：{item['path'] or '下载失败'}\n"
+    return text
+
+def add_media_arguments(parser):
+    """为命令行解析器添加媒体下载参数"""
+    parser.add_argument('--media', action='store_true', help='下载文章中的图片和附件，文章中写入本地路径')
+    parser.add_argument('--media-dir', default='media', help='媒体文件保存目录')
+    parser.add_argument('--media-avatars', action='store_true', help='同时下载作者、评论者头像和星球背景图，文章中写入本地路径')
+
+def setup_media_from_args(args, workers=4):
+    """根据--media参数设置extract_and_save_article使用的媒体下载器"""
+    if not getattr(args, 'media', False):
+        return None
+    from main import set_default_media_downloader
+    downloader = MediaDownloader(MediaStore(args.media_dir), workers=workers,
+                                 include_avatars=args.media_avatars)
+    set_default_media_downloader(downloader)
+    logger.info("将下载图片和附件到 %s", args.media_dir)
+    return downloader
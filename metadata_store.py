@@ -0,0 +1,418 @@
+import os
+import sys
+import json
+import time
+import array
+import atexit
+import threading
+from datetime import datetime, timezone, timedelta
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+try:
+    import numpy
+except ImportError:  # numpy为可选依赖（pip install numpy），只有安装后统计才按列向量化计算；未安装时用array模块读取，逐行计算
+    numpy = None
+
+logger = get_logger('metadata_store')
+
+# 列式元数据目录：每列一个定长小端整数文件（{列名}.bin），meta.json记录已提交的行数和作者字典
+#   topic_id、create_time（Unix秒）为int64，其余为int32；author为作者字典中的序号
+COLUMNS = (
+    ('topic_id', 'q'),
+    ('create_time', 'q'),
+    ('author', 'i'),
+    ('reading_count', 'i'),
+    ('readers_count', 'i'),
+    ('likes_count', 'i'),
+    ('comments_count', 'i'),
+    ('rewards_count', 'i'),
+)
+COUNT_FIELDS = ('reading_count', 'readers_count', 'likes_count', 'comments_count', 'rewards_count')
+NUMPY_DTYPES = {'q': '<i8', 'i': '<i4'}
+META_FILE = 'meta.json'
+# 原位置更新的日志：写列文件前先记录本批次要更新的行，崩溃后下次打开时重放
+UPDATES_FILE = 'updates.journal'
+
+# 按发布日期分组时使用北京时间，与文件名中的发布日期一致
+ZSXQ_TZ = timezone(timedelta(hours=8))
+GROUP_BY = ('day', 'month', 'year', 'author')
+
+def _to_epoch(create_time):
+    try:
+        return int(datetime.fromisoformat(create_time.replace('Z', '+00:00')).timestamp())
+    except (AttributeError, ValueError):
+        return 0
+
+def _to_int(value):
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def topic_author(topic):
+    """文章作者名，与render_article的取法一致"""
+    talk = topic.get('talk') or {}
+    owner = talk.get('owner', {}) if talk else topic.get('owner', {})
+    return (owner or {}).get('name', 'Unknown')
+
+def _column_path(directory, name):
+    return os.path.join(directory, f"{name}.bin")
+
+def _read_column(path, typecode, rows):
+    """读取一列的前rows个值：有numpy时返回ndarray，否则返回array.array"""
+    if numpy is not None:
+        return numpy.fromfile(path, dtype=NUMPY_DTYPES[typecode], count=rows)
+    values = array.array(typecode)
+    with open(path, 'rb') as f:
+        values.fromfile(f, rows)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+def _to_bytes(values):
+    if sys.byteorder == 'big':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+class MetadataStore:
+    """文章元数据（阅读数、点赞数、评论数、发布时间、作者等）的列式存储，支持增量追加
+    每行固定宽度，已有的文章在原位置更新，新文章追加到各列末尾；写入先缓存在内存中，
+    达到batch_size行或close时写盘，最后更新meta.json。中途崩溃时：
+      追加的行：meta.json之后多写的数据在下次打开时被截掉（这批新文章需要重新记录）；
+      原位置更新：写列文件前先把本批次的更新写入updates.journal，下次打开时重放，
+        不会出现一行中部分列是新值、部分列是旧值的情况。
+    线程安全。
+    """
+
+    def __init__(self, directory='metadata', batch_size=1000):
+        self.directory = directory
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = {}
+        os.makedirs(directory, exist_ok=True)
+        meta = self._load_meta()
+        self.rows = meta.get('rows', 0)
+        self.authors = meta.get('authors', [])
+        self._author_codes = {name: code for code, name in enumerate(self.authors)}
+        for name, typecode in COLUMNS:
+            path = _column_path(directory, name)
+            with open(path, 'ab') as f:
+                size = self.rows * array.array(typecode).itemsize
+                if f.tell() > size:
+                    f.truncate(size)
+        self._replay_updates()
+        # topic_id到行号的索引，用于原位置更新
+        self._row_of = {int(topic_id): row for row, topic_id in
+                        enumerate(_read_column(_column_path(directory, 'topic_id'), 'q', self.rows))}
+
+    def _load_meta(self):
+        try:
+            with open(os.path.join(self.directory, META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _replay_updates(self):
+        """重放上次崩溃时未完成的原位置更新"""
+        path = os.path.join(self.directory, UPDATES_FILE)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except FileNotFoundError:
+            return
+        # 作者字典只追加，日志中的作者列表包含更新的行用到的新作者
+        if len(journal['authors']) > len(self.authors):
+            self.authors = journal['authors']
+            self._author_codes = {name: code for code, name in enumerate(self.authors)}
+        updates = [(row_number, row) for row_number, row in journal['updates'] if row_number < self.rows]
+        self._write_updates(updates)
+        self._write_meta()
+        os.remove(path)
+        logger.info("重放了上次未完成的%s行元数据更新", len(updates))
+
+    def _write_updates(self, updates, appends=()):
+        for i, (name, typecode) in enumerate(COLUMNS):
+            itemsize = array.array(typecode).itemsize
+            with open(_column_path(self.directory, name), 'r+b') as f:
+                for row_number, row in updates:
+                    f.seek(row_number * itemsize)
+                    f.write(_to_bytes(array.array(typecode, (row[i],))))
+                if appends:
+                    f.seek(self.rows * itemsize)
+                    f.write(_to_bytes(array.array(typecode, (row[i] for row in appends))))
+                    f.truncate()
+
+    def _write_meta(self):
+        meta = {'version': 1, 'rows': self.rows, 'columns': dict(COLUMNS), 'authors': self.authors,
+                'updated_at': datetime.now().isoformat(timespec='seconds')}
+        tmp_path = os.path.join(self.directory, f"{META_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.directory, META_FILE))
+
+    def __len__(self):
+        with self._lock:
+            return self.rows + sum(1 for topic_id in self._pending if topic_id not in self._row_of)
+
+    def add_topic(self, topic):
+        """记录（或更新）一篇文章的元数据，没有topic_id的数据被忽略"""
+        topic_id = _to_int(topic.get('topic_id'))
+        if not topic_id:
+            return
+        author = topic_author(topic)
+        values = [_to_epoch(topic.get('create_time', ''))]
+        values.extend(_to_int(topic.get(field)) for field in COUNT_FIELDS)
+        with self._lock:
+            code = self._author_codes.get(author)
+            if code is None:
+                code = self._author_codes[author] = len(self.authors)
+                self.authors.append(author)
+            self._pending[topic_id] = (topic_id, values[0], code, *values[1:])
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        updates = []
+        appends = []
+        for topic_id, row in self._pending.items():
+            if topic_id in self._row_of:
+                updates.append((self._row_of[topic_id], row))
+            else:
+                self._row_of[topic_id] = self.rows + len(appends)
+                appends.append(row)
+        journal_path = os.path.join(self.directory, UPDATES_FILE)
+        if updates:
+            # 先写更新日志（完整写入后再重命名），列文件写到一半崩溃时可以重放
+            tmp_path = f"{journal_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'authors': self.authors, 'updates': updates}, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, journal_path)
+        self._write_updates(updates, appends)
+        self.rows += len(appends)
+        self._pending.clear()
+        self._write_meta()
+        if updates:
+            os.remove(journal_path)
+
+    def close(self):
+        self.flush()
+
+def load_columns(directory='metadata'):
+    """读取列式元数据
+    Returns:
+        tuple: ({列名: ndarray或array.array}, 作者名列表)
+    """
+    with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    rows = meta['rows']
+    columns = {name: _read_column(_column_path(directory, name), typecode, rows) for name, typecode in COLUMNS}
+    return columns, meta['authors']
+
+def _date_keys(create_time, by):
+    """每行的分组键：day为YYYY-MM-DD，month为YYYY-MM，year为YYYY"""
+    width = {'day': 10, 'month': 7, 'year': 4}[by]
+    if numpy is not None:
+        unit = {'day': 'D', 'month': 'M', 'year': 'Y'}[by]
+        # 直接对datetime64去重，只把去重后的键转换为字符串
+        return (create_time + 8 * 3600).astype('datetime64[s]').astype(f'datetime64[{unit}]')
+    # 同一天的文章只转换一次
+    days = {}
+    keys = []
+    for value in create_time:
+        day = (value + 8 * 3600) // 86400
+        key = days.get(day)
+        if key is None:
+            key = days[day] = datetime.fromtimestamp(value, ZSXQ_TZ).strftime('%Y-%m-%d')[:width]
+        keys.append(key)
+    return keys
+
+def aggregate(columns, authors, by='month', since=None, until=None):
+    """按日期或作者分组统计文章数和各计数字段的合计
+    Args:
+        since/until: 只统计该日期（YYYY-MM-DD，含当天）之间发布的文章
+    Returns:
+        list: [{'key', 'topics', 各计数字段的合计}]，按日期或文章数排序
+    """
+    create_time = columns['create_time']
+    lower = _to_epoch(f"{since}T00:00:00+08:00") if since else None
+    upper = _to_epoch(f"{until}T23:59:59+08:00") if until else None
+
+    if numpy is not None:
+        if lower is not None or upper is not None:
+            mask = numpy.ones(len(create_time), dtype=bool)
+            if lower is not None:
+                mask &= create_time >= lower
+            if upper is not None:
+                mask &= create_time <= upper
+            columns = {name: values[mask] for name, values in columns.items()}
+        if by == 'author':
+            keys = numpy.array(authors, dtype=object)[columns['author']]
+        else:
+            keys = _date_keys(columns['create_time'], by)
+        unique, inverse = numpy.unique(keys, return_inverse=True)
+        topics = numpy.bincount(inverse, minlength=len(unique))
+        sums = {field: numpy.bincount(inverse, weights=columns[field], minlength=len(unique)).astype('int64')
+                for field in COUNT_FIELDS}
+        results = [{'key': str(key), 'topics': int(topics[i]), **{field: int(sums[field][i]) for field in COUNT_FIELDS}}
+                   for i, key in enumerate(unique)]
+    else:
+        rows = [i for i, value in enumerate(create_time)
+                if (lower is None or value >= lower) and (upper is None or value <= upper)]
+        if by == 'author':
+            author_codes = columns['author']
+            keys = [authors[author_codes[i]] for i in rows]
+        else:
+            keys = _date_keys((create_time[i] for i in rows), by)
+        groups = {}
+        field_columns = [columns[field] for field in COUNT_FIELDS]
+        for key, i in zip(keys, rows):
+            totals = groups.get(key)
+            if totals is None:
+                totals = groups[key] = [0] * (len(COUNT_FIELDS) + 1)
+            totals[0] += 1
+            for j, values in enumerate(field_columns, 1):
+                totals[j] += values[i]
+        results = [{'key': key, 'topics': totals[0], **dict(zip(COUNT_FIELDS, totals[1:]))}
+                   for key, totals in groups.items()]
+
+    if by == 'author':
+        results.sort(key=lambda result: (-result['topics'], result['key']))
+    else:
+        results.sort(key=lambda result: result['key'])
+    return results
+
+def export_columns(directory, output):
+    """导出为Parquet（.parquet，需要pyarrow）或CSV（其他扩展名）
+    Returns:
+        int: 导出的行数
+    """
+    columns, authors = load_columns(directory)
+    rows = len(columns['topic_id'])
+    author_names = [authors[code] for code in columns['author']]
+    create_times = [datetime.fromtimestamp(int(value), ZSXQ_TZ).isoformat() for value in columns['create_time']]
+    if output.endswith('.parquet'):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("导出Parquet需要安装pyarrow（pip install pyarrow），也可以导出为.csv") from None
+        table = pyarrow.table({
+            'topic_id': pyarrow.array(list(columns['topic_id']), pyarrow.int64()),
+            'create_time': pyarrow.array([int(value) * 1000 for value in columns['create_time']],
+                                         pyarrow.timestamp('ms', tz='+08:00')),
+            'author': pyarrow.array(author_names).dictionary_encode(),
+            **{field: pyarrow.array(list(columns[field]), pyarrow.int32()) for field in COUNT_FIELDS},
+        })
+        pyarrow.parquet.write_table(table, output)
+        return rows
+    import csv
+    with open(output, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['topic_id', 'create_time', 'author', *COUNT_FIELDS])
+        for i in range(rows):
+            writer.writerow([int(columns['topic_id'][i]), create_times[i], author_names[i],
+                             *(int(columns[field][i]) for field in COUNT_FIELDS)])
+    return rows
+
+def build_from_cache(store, cache):
+    """从API响应缓存中补录元数据（同一篇文章取最新的响应），用于启用本功能之前已抓取的文章
+    Returns:
+        int: 补录的文章数
+    """
+    from response_cache import topics_from_entry
+    latest = {}
+    for entry in cache.iter_entries():
+        is_info, topics = topics_from_entry(entry)
+        for topic in topics:
+            topic_id = str(topic.get('topic_id', ''))
+            if topic_id and (topic_id not in latest or entry['fetched_at'] >= latest[topic_id][0]):
+                latest[topic_id] = (entry['fetched_at'], topic)
+    for fetched_at, topic in latest.values():
+        store.add_topic(topic)
+    store.flush()
+    return len(latest)
+
+_default_store = None
+
+def close_metadata_store():
+    """写入尚未写盘的元数据（进程退出时自动调用）"""
+    if _default_store is not None:
+        try:
+            _default_store.close()
+        except OSError as e:
+            logger.error("写入文章元数据失败：%s", e)
+
+atexit.register(close_metadata_store)
+
+def add_metadata_arguments(parser):
+    """为命令行解析器添加列式元数据参数"""
+    parser.add_argument('--metadata', metavar='DIR',
+                        help='保存文章时同时把阅读数、点赞数等元数据追加到该列式存储目录（如metadata）')
+
+def setup_metadata_from_args(args):
+    """根据--metadata参数设置extract_and_save_article的默认元数据存储"""
+    global _default_store
+    if not getattr(args, 'metadata', None):
+        return None
+    from main import set_default_metadata_store
+    _default_store = MetadataStore(args.metadata)
+    set_default_metadata_store(_default_store)
+    logger.info("文章元数据将写入列式存储: %s（已有%s篇）", args.metadata, len(_default_store))
+    return _default_store
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='文章元数据列式存储工具')
+    parser.add_argument('command', choices=['stats', 'export', 'build'],
+                        help='stats: 分组统计；export: 导出为Parquet或CSV；build: 从API响应缓存补录元数据')
+    parser.add_argument('--dir', default='metadata', help='列式存储目录')
+    parser.add_argument('--by', choices=GROUP_BY, default='month', help='stats命令的分组方式')
+    parser.add_argument('--since', help='只统计该日期之后发布的文章，格式YYYY-MM-DD')
+    parser.add_argument('--until', help='只统计该日期之前发布的文章，格式YYYY-MM-DD')
+    parser.add_argument('--limit', type=int, default=0, help='stats命令只输出前N组，默认全部')
+    parser.add_argument('--output', help='export命令的输出文件（.parquet或.csv）')
+    parser.add_argument('--config', default='config.json', help='build命令读取其中的cache配置')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    if args.command == 'build':
+        from zsxq_client import load_config
+        from response_cache import ResponseCache
+        cache_config = {}
+        if os.path.exists(args.config):
+            cache_config = load_config(args.config).get('cache') or {}
+        cache_config['enabled'] = True
+        store = MetadataStore(args.dir)
+        count = build_from_cache(store, ResponseCache.from_config(cache_config))
+        logger.info("已从缓存补录%s篇文章的元数据，共%s篇", count, len(store))
+    elif args.command == 'export':
+        if not args.output:
+            parser.error('export命令需要--output')
+        try:
+            rows = export_columns(args.dir, args.output)
+        except RuntimeError as e:
+            logger.error("%s", e)
+            sys.exit(1)
+        logger.info("已导出%s篇文章的元数据到 %s", rows, args.output)
+    else:
+        start = time.perf_counter()
+        columns, authors = load_columns(args.dir)
+        results = aggregate(columns, authors, args.by, args.since, args.until)
+        elapsed = time.perf_counter() - start
+        if args.limit:
+            results = results[:args.limit]
+        print('\t'.join(['分组', '文章数', *COUNT_FIELDS]))
+        for result in results:
+            print('\t'.join(str(result[key]) for key in ('key', 'topics', *COUNT_FIELDS)))
+        logger.info("统计%s篇文章，耗时%.1f毫秒（%s）", len(columns['topic_id']), elapsed * 1000,
+                    "numpy" if numpy is not None else "未安装numpy，逐行计算")
@@ -0,0 +1,276 @@
+import os
+import re
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+from log_utils import get_logger
+
+logger = get_logger('metrics')
+
+# 请求耗时直方图的桶上限（秒），与Prometheus客户端的默认桶一致
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 各阶段耗时（多个线程的耗时累加，可能超过运行时间）：
+#   rate_limit_wait: 限流器等待令牌   retry_backoff: 重试前的退避等待   breaker_pause: 熔断暂停
+#   http: 等待服务器响应和接收数据     json_parse: 解析JSON               render: 渲染文章文本
+#   disk_write: 写入txt文件或归档      index: 写入全文索引                media: 下载图片和附件
+STAGES = ('rate_limit_wait', 'retry_backoff', 'breaker_pause', 'http', 'json_parse', 'render',
+          'disk_write', 'index', 'media')
+
+_ID_SEGMENT = re.compile(r'^\d+$')
+_ID_PARENTS = {'groups', 'topics', 'files'}
+
+def endpoint_name(url):
+    """将请求地址归一化为接口名称，路径中的ID替换为{id}，如/v2/topics/{id}/info"""
+    parts = urlsplit(url)
+    segments = parts.path.split('/')
+    for i in range(1, len(segments)):
+        if segments[i - 1] in _ID_PARENTS or _ID_SEGMENT.match(segments[i]):
+            if segments[i] not in ('digests', ''):
+                segments[i] = '{id}'
+    path = '/'.join(segments)
+    if not path.startswith('/v2/'):
+        # 图片和附件：按域名统计，避免每个文件一个接口名称
+        return f"media:{parts.netloc}"
+    return path
+
+class Histogram:
+    """固定分桶的直方图（非线程安全，由Metrics加锁）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """按分桶估计分位数（桶内线性插值），没有数据时返回0"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if count and cumulative + count >= target:
+                return min(self.max, lower + (upper - lower) * (target - cumulative) / count)
+            cumulative += count
+            lower = upper
+        return self.max
+
+class Metrics:
+    """进程内的运行指标：各接口的请求耗时直方图、传输字节数、各阶段耗时、按错误分类的重试次数和文章数。线程安全。"""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self._start = time.monotonic()
+        self.latency = {}
+        self.bytes = {}
+        self.status = {}
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe_request(self, endpoint, seconds, size=0, status=None, stage='http'):
+        """记录一次HTTP请求：耗时、响应字节数和状态码，耗时同时计入stage阶段"""
+        with self._lock:
+            histogram = self.latency.get(endpoint)
+            if histogram is None:
+                histogram = self.latency[endpoint] = Histogram()
+            histogram.observe(seconds)
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + size
+            key = (endpoint, str(status))
+            self.status[key] = self.status.get(key, 0) + 1
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_time(self, stage, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, stage):
+        """统计代码块的耗时：with metrics.timer('disk_write'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def count(self, name, n=1, **labels):
+        """计数器加n，labels为标签（如retries的kind、error）"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def counter_value(self, name, **labels):
+        """返回计数器的值，不指定标签时返回该名称所有标签的合计"""
+        with self._lock:
+            if labels:
+                return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+            return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def summary(self):
+        """生成运行摘要（可直接序列化为JSON）"""
+        elapsed = time.monotonic() - self._start
+        saved = self.counter_value('articles_saved')
+        with self._lock:
+            endpoints = {}
+            for endpoint, histogram in sorted(self.latency.items()):
+                endpoints[endpoint] = {
+                    'requests': histogram.count,
+                    'bytes': self.bytes.get(endpoint, 0),
+                    'latency_avg': round(histogram.sum / histogram.count, 4) if histogram.count else 0.0,
+                    'latency_p50': round(histogram.quantile(0.5), 4),
+                    'latency_p90': round(histogram.quantile(0.9), 4),
+                    'latency_p99': round(histogram.quantile(0.99), 4),
+                    'latency_max': round(histogram.max, 4),
+                    'status': {status: count for (name, status), count in sorted(self.status.items())
+                               if name == endpoint},
+                }
+            counters = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                label = ','.join(f"{k}={v}" for k, v in labels)
+                counters.setdefault(name, {})[label or 'total'] = value
+            return {
+                'started_at': datetime.fromtimestamp(self.start_time).isoformat(timespec='seconds'),
+                'elapsed_seconds': round(elapsed, 3),
+                'articles_saved': saved,
+                'articles_per_second': round(saved / elapsed, 3) if elapsed > 0 else 0.0,
+                'requests': sum(item['requests'] for item in endpoints.values()),
+                'bytes': sum(item['bytes'] for item in endpoints.values()),
+                'stage_seconds': {stage: round(value, 3) for stage, value in self.stages.items()},
+                'endpoints': endpoints,
+                'counters': counters,
+            }
+
+    def prometheus_text(self):
+        """生成Prometheus文本格式（供node_exporter的textfile collector读取）"""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text):
+            lines.append(f"# HELP zsxq_{name} {help_text}")
+            lines.append(f"# TYPE zsxq_{name} {kind}")
+
+        def escape(value):
+            return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+        metric('run_elapsed_seconds', 'gauge', 'Wall time of the last run.')
+        lines.append(f"zsxq_run_elapsed_seconds {summary['elapsed_seconds']}")
+        metric('run_timestamp_seconds', 'gauge', 'Start time of the last run.')
+        lines.append(f"zsxq_run_timestamp_seconds {int(self.start_time)}")
+        metric('articles_per_second', 'gauge', 'Saved articles per second of the last run.')
+        lines.append(f"zsxq_articles_per_second {summary['articles_per_second']}")
+        metric('stage_seconds', 'gauge', 'Time spent per stage, summed over threads.')
+        for stage, value in summary['stage_seconds'].items():
+            lines.append(f'zsxq_stage_seconds{{stage="{stage}"}} {value}')
+
+        with self._lock:
+            latency = sorted(self.latency.items())
+            status = sorted(self.status.items())
+            byte_counts = dict(self.bytes)
+            counters = sorted(self.counters.items())
+        metric('request_duration_seconds', 'histogram', 'HTTP request latency per endpoint.')
+        for endpoint, histogram in latency:
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'zsxq_request_duration_seconds_bucket{{endpoint="{escape(endpoint)}",le="{bound}"}} {cumulative}')
+            lines.append(f'zsxq_request_duration_seconds_bucket{{endpoint="{escape(endpoint)}",le="+Inf"}} {histogram.count}')
+            lines.append(f'zsxq_request_duration_seconds_sum{{endpoint="{escape(endpoint)}"}} {round(histogram.sum, 6)}')
+            lines.append(f'zsxq_request_duration_seconds_count{{endpoint="{escape(endpoint)}"}} {histogram.count}')
+        metric('response_bytes_total', 'counter', 'Response bytes received per endpoint.')
+        for endpoint, size in sorted(byte_counts.items()):
+            lines.append(f'zsxq_response_bytes_total{{endpoint="{escape(endpoint)}"}} {size}')
+        metric('responses_total', 'counter', 'HTTP responses per endpoint and status code.')
+        for (endpoint, code), count in status:
+            lines.append(f'zsxq_responses_total{{endpoint="{escape(endpoint)}",status="{escape(code)}"}} {count}')
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                metric(f"{name}_total", 'counter', f"Count of {name.replace('_', ' ')}.")
+                declared.add(name)
+            label_text = ','.join(f'{k}="{escape(v)}"' for k, v in labels)
+            lines.append(f"zsxq_{name}_total{{{label_text}}} {value}" if label_text else f"zsxq_{name}_total {value}")
+        return '\n'.join(lines) + '\n'
+
+    def log_summary(self):
+        """输出耗时分布，用于判断运行变慢的原因"""
+        summary = self.summary()
+        stages = summary['stage_seconds']
+        logger.info("耗时分布（多线程累计）：限流等待%.1f秒，重试退避%.1f秒，熔断暂停%.1f秒，HTTP %.1f秒，"
+                    "JSON解析%.1f秒，渲染%.1f秒，写盘%.1f秒，索引%.1f秒，媒体%.1f秒",
+                    *(stages[stage] for stage in STAGES),
+                    extra={'fields': {'event': 'run_summary', 'elapsed': summary['elapsed_seconds'],
+                                      'stages': stages, 'requests': summary['requests']}})
+        retries = self.counter_value('retries')
+        logger.info("请求%s次，接收%.1fMB，重试%s次，保存文章%s篇（%.1f篇/秒）", summary['requests'],
+                    summary['bytes'] / 1024 / 1024, retries, summary['articles_saved'],
+                    summary['articles_per_second'])
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_summary(path, metrics=None):
+    """将运行摘要写入JSON文件（先写临时文件再重命名）"""
+    metrics = metrics or _metrics
+    _write_atomic(path, json.dumps(metrics.summary(), ensure_ascii=False, indent=2))
+
+def write_prometheus(path, metrics=None):
+    """写入Prometheus textfile（文件名应以.prom结尾），先写临时文件再重命名，避免采集到半个文件"""
+    metrics = metrics or _metrics
+    _write_atomic(path, metrics.prometheus_text())
+
+_metrics = Metrics()
+
+def get_metrics():
+    """进程内共享的指标实例"""
+    return _metrics
+
+def add_metrics_arguments(parser):
+    """为命令行解析器添加运行指标参数"""
+    parser.add_argument('--metrics-json', metavar='FILE', help='运行结束时写入运行摘要JSON（各接口耗时、字节数、各阶段耗时、重试次数）')
+    parser.add_argument('--metrics-prom', metavar='FILE',
+                        help='运行结束时写入Prometheus textfile（如/var/lib/node_exporter/zsxq.prom）')
+
+def setup_metrics_from_args(args):
+    """根据命令行参数在进程退出时输出耗时分布，并写入指标文件"""
+    json_path = getattr(args, 'metrics_json', None)
+    prom_path = getattr(args, 'metrics_prom', None)
+
+    def finish():
+        _metrics.log_summary()
+        try:
+            if json_path:
+                write_summary(json_path)
+                logger.info("运行摘要已保存到 %s", json_path)
+            if prom_path:
+                write_prometheus(prom_path)
+        except OSError as e:
+            logger.error("写入运行指标失败：%s", e)
+
+    atexit.register(finish)
@@ -0,0 +1,542 @@
+import os
+import re
+import copy
+import hashlib
+import json
+import time
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+logger = get_logger('mock_server')
+
+TZ = timezone(timedelta(hours=8))
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+GROUP_RE = re.compile(r'^/v2/groups/([^/]+)$')
+LIST_RE = re.compile(r'^/v2/groups/([^/]+)/topics$')
+DIGESTS_RE = re.compile(r'^/v2/groups/([^/]+)/topics/digests$')
+INFO_RE = re.compile(r'^/v2/topics/(\d+)/info$')
+COMMENTS_RE = re.compile(r'^/v2/topics/(\d+)/comments$')
+FILE_URL_RE = re.compile(r'^/v2/files/(\d+)/download_url$')
+MEDIA_RE = re.compile(r'^/media/(.+)$')
+
+# 没有example.json时使用的最小文章结构
+_FALLBACK_TEMPLATE = {
+    'topic_id': 0,
+    'group': {'group_id': 0, 'name': '测试星球', 'type': 'pay'},
+    'type': 'talk',
+    'talk': {'owner': {'user_id': 1, 'name': '测试作者'}, 'text': ''},
+    'show_comments': [],
+    'likes_count': 0,
+    'rewards_count': 0,
+    'comments_count': 0,
+    'reading_count': 0,
+    'readers_count': 0,
+    'digested': False,
+    'sticky': False,
+    'create_time': '',
+    'title': '',
+}
+
+def format_time(dt):
+    return dt.strftime(TIME_FORMAT)[:-3] + '+0800'
+
+def parse_time(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+def load_template():
+    """以example.json中的第一篇文章作为生成数据的模板"""
+    path = os.path.join(BASE_DIR, 'example.json')
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            topic = json.load(f)['resp_data']['topics'][0]
+        return topic
+    except (OSError, KeyError, IndexError, ValueError):
+        return copy.deepcopy(_FALLBACK_TEMPLATE)
+
+class MockGroup:
+    """按需生成的模拟星球
+    第i篇文章（i从0开始，越小越新）的内容由随机种子和i决定，不在内存中保存全部文章。
+    """
+
+    def __init__(self, group_id=48844242882218, size=1000, seed=0, interval_seconds=3600,
+                 digest_every=5, comments=3, newest=None, article_every=0, max_comments=None, media_every=0,
+                 revise_every=0, revision=0):
+        self.group_id = int(group_id)
+        self.size = size
+        self.seed = seed
+        self.interval = timedelta(seconds=interval_seconds)
+        self.digest_every = digest_every
+        self.comments = comments
+        # 每篇文章的评论总数在0到max_comments之间随机，列表和详情中只返回前comments条预览
+        self.max_comments = max_comments if max_comments is not None else comments * 3
+        # 每article_every篇中有1篇长文章，列表中只返回摘要，需要请求详情接口
+        self.article_every = article_every
+        self.newest = newest or datetime(2025, 3, 4, 8, 0, 0, tzinfo=TZ)
+        # 每media_every篇中有1篇带图片（其中有多篇共用的图片和内容重复的图片），每2×media_every篇中有1篇带附件；
+        # 图片地址指向模拟服务器的/media/路径，由create_server设置media_base
+        self.media_every = media_every
+        self.media_base = 'http://127.0.0.1:8765/media'
+        # 模拟发布后的修改：revision大于0时，每revise_every篇中有1篇的正文和点赞数随revision变化
+        self.revise_every = revise_every
+        self.revision = revision
+        self.template = load_template()
+        self.base_topic_id = 5100000000000000
+        # 运行期间新发布的文章（publish），从新到旧排列，内容复用第(序号 % size)篇文章
+        self.live_base_topic_id = 5300000000000000
+        self.live = []
+        self._live_by_id = {}
+        self._live_lock = threading.Lock()
+
+    def topic_id(self, i):
+        return self.base_topic_id + i * 7
+
+    def index_of(self, topic_id):
+        offset = int(topic_id) - self.base_topic_id
+        if offset < 0 or offset % 7 or offset // 7 >= self.size:
+            return None
+        return offset // 7
+
+    def create_time(self, i):
+        return self.newest - self.interval * i
+
+    def topic(self, i):
+        rng = random.Random(self.seed * 1000003 + i)
+        topic = copy.deepcopy(self.template)
+        title = f"第{self.size - i}章 模拟文章{i}"
+        paragraphs = rng.randint(3, 30)
+        body = '\n'.join('\t' + '模拟正文内容。' * rng.randint(5, 40) for _ in range(paragraphs))
+        create_time = self.create_time(i)
+        topic['topic_id'] = self.topic_id(i)
+        topic.setdefault('group', {})['group_id'] = self.group_id
+        topic.setdefault('talk', {})['text'] = f"{title}\n{body}"
+        topic['title'] = f"{title}\n..."
+        topic['create_time'] = format_time(create_time)
+        topic['digested'] = self.digest_every > 0 and i % self.digest_every == 0
+        comments_count = self.comment_count(i)
+        owner = topic['talk'].get('owner', {'name': '测试作者'})
+        topic['show_comments'] = [
+            {key: value for key, value in comment.items() if key != 'replied_comments'}
+            for comment in self.comment_thread(i, min(comments_count, self.comments))
+        ]
+        topic['comments_count'] = comments_count
+        topic['likes_count'] = rng.randint(0, 200)
+        topic['rewards_count'] = rng.randint(0, 5)
+        topic['reading_count'] = rng.randint(0, 50)
+        topic['readers_count'] = rng.randint(100, 2000)
+        topic['talk']['owner'] = owner
+        if self.media_every > 0:
+            self._add_media(topic, i)
+        if self.revision > 0 and self.revise_every > 0 and i % self.revise_every == 0:
+            topic['talk']['text'] += f"\n（第{self.revision}次修改）"
+            topic['likes_count'] += self.revision
+        if self.article_every > 0 and i % self.article_every == 0:
+            topic['talk']['article'] = {'title': title, 'article_id': f"mock{i}",
+                                        'article_url': f"https://articles.zsxq.com/mock{i}.html"}
+        return topic
+
+    def _media_url(self, name, i):
+        # 签名参数随文章变化，模拟同一图片每次返回不同地址
+        return f"{self.media_base}/{name}?e=1746028799&token=mock{i}"
+
+    def _add_media(self, topic, i):
+        talk = topic['talk']
+        talk['owner'] = dict(talk['owner'], avatar_url=self._media_url(f"avatar{i % 4}.jpg", i))
+        topic['group'] = dict(topic.get('group') or {}, background_url=self._media_url('background.jpg', i))
+        if i % self.media_every == 0:
+            names = [f"img{i}_{k}.jpg" for k in range(1 + i % 3)] + [f"shared{i % 3}.jpg", f"dup{i}.jpg"]
+            talk['images'] = [
+                {'image_id': 300000 + i * 10 + k, 'type': 'jpg',
+                 'thumbnail': {'url': self._media_url(name, i) + '&imageMogr2/thumbnail/750x'},
+                 'large': {'url': self._media_url(name, i)}}
+                for k, name in enumerate(names)
+            ]
+        if i % (self.media_every * 2) == 0:
+            talk['files'] = [{'file_id': 700000 + i, 'name': f"附件{i}.pdf", 'size': len(self.media_content(f"file{i}.pdf"))}]
+
+    def media_content(self, name):
+        """媒体文件内容：由文件名决定，dup{i}.jpg与img{i}_0.jpg内容相同"""
+        if name.startswith('dup'):
+            name = f"img{name[3:-4]}_0.jpg"
+        rng = random.Random(f"{self.seed}:{name}")
+        return rng.randbytes(rng.randint(20 * 1024, 300 * 1024))
+
+    def comment_count(self, i):
+        return random.Random((self.seed * 1000003 + i) * 31 + 17).randint(0, self.max_comments)
+
+    def comment_thread(self, i, count=None):
+        """第i篇文章的完整评论（按发布时间从旧到新），每4条评论中有1条带回复"""
+        if count is None:
+            count = self.comment_count(i)
+        base_id = 9000000000000000 + i * 100000
+        create_time = self.create_time(i)
+        comments = []
+        for n in range(count):
+            rng = random.Random((self.seed * 1000003 + i) * 7919 + n)
+            comment_time = create_time + timedelta(minutes=n + 1)
+            comment = {
+                'comment_id': base_id + n * 10,
+                'create_time': format_time(comment_time),
+                'owner': {'user_id': 1000 + n, 'name': f"读者{n}"},
+                'text': f"评论{n}：" + '写得好！' * rng.randint(1, 5),
+            }
+            if n % 4 == 0:
+                comment['replied_comments'] = [
+                    {
+                        'comment_id': base_id + n * 10 + r + 1,
+                        'create_time': format_time(comment_time + timedelta(seconds=r + 1)),
+                        'owner': {'user_id': 2000 + r, 'name': f"回复者{r}"},
+                        'text': f"回复{r}：同意",
+                    }
+                    for r in range(rng.randint(1, 2))
+                ]
+            comments.append(comment)
+        return comments
+
+    def list_comments(self, i, count=30, begin_time=None):
+        """评论接口：返回create_time不早于begin_time的前count条评论"""
+        thread = self.comment_thread(i)
+        if begin_time:
+            begin = parse_time(begin_time)
+            thread = [c for c in thread if parse_time(c['create_time']) >= begin]
+        return thread[:count]
+
+    def topic_detail(self, i):
+        """详情接口（info.json）中的文章结构：比列表多modify_time，不含rewards"""
+        topic = self.topic(i)
+        topic.pop('rewards', None)
+        topic['modify_time'] = topic['create_time']
+        return topic
+
+    def group_info(self):
+        """星球信息接口中的星球结构，创建时间早于最旧的文章"""
+        create_time = self.create_time(self.size - 1) - self.interval
+        return {'group_id': self.group_id, 'name': '测试星球', 'type': 'pay', 'create_time': format_time(create_time)}
+
+    def _first_index_before(self, end_time):
+        """返回create_time不晚于end_time的第一篇文章序号"""
+        delta = self.newest - end_time
+        if delta.total_seconds() <= 0:
+            return 0
+        i = int(delta / self.interval)
+        while i < self.size and self.create_time(i) > end_time:
+            i += 1
+        return i
+
+    def publish(self, create_time=None):
+        """发布一篇新文章（发布时间默认为当前时间），用于测试watch.py
+        Returns:
+            dict: 新文章
+        """
+        with self._live_lock:
+            n = len(self.live)
+            topic = self.topic(n % self.size)
+            topic['topic_id'] = self.live_base_topic_id + n
+            topic['create_time'] = format_time(create_time or datetime.now(TZ))
+            self.live.insert(0, topic)
+            self._live_by_id[topic['topic_id']] = (n % self.size, topic)
+        return topic
+
+    def live_topic_detail(self, topic_id):
+        """新发布文章的详情，不存在时返回None"""
+        entry = self._live_by_id.get(int(topic_id))
+        if entry is None:
+            return None
+        source, topic = entry
+        detail = self.topic_detail(source)
+        detail['topic_id'] = topic['topic_id']
+        detail['create_time'] = detail['modify_time'] = topic['create_time']
+        return detail
+
+    def list_topics(self, scope='all', count=20, end_time=None):
+        start = self._first_index_before(parse_time(end_time)) if end_time else 0
+        topics = []
+        if self.live:
+            end = parse_time(end_time) if end_time else None
+            with self._live_lock:
+                live = [topic for topic in self.live if end is None or parse_time(topic['create_time']) <= end]
+            topics.extend(topic for topic in live[:count]
+                          if scope != 'digests' or (self.digest_every > 0 and topic['topic_id'] % self.digest_every == 0))
+        i = start
+        while i < self.size and len(topics) < count:
+            if scope != 'digests' or (self.digest_every > 0 and i % self.digest_every == 0):
+                topics.append(self.topic(i))
+            i += 1
+        return topics
+
+    def digests(self, count=30, index=0):
+        end_time = None
+        if int(index):
+            end_time = format_time(datetime.fromtimestamp(int(index) / 1000, TZ))
+        return self.list_topics('digests', count, end_time)
+
+class FaultConfig:
+    """故障注入配置：延迟、429/5xx、succeeded为false、格式错误的JSON和媒体文件传输中断（均为概率）"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, rate_429=0.0, rate_5xx=0.0, rate_unsucceeded=0.0,
+                 rate_malformed=0.0, seed=None, rate_auth=0.0, rate_truncate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_unsucceeded = rate_unsucceeded
+        self.rate_malformed = rate_malformed
+        self.rate_auth = rate_auth
+        self.rate_truncate = rate_truncate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self):
+        """为一次请求选择延迟秒数和故障类型（None、'429'、'5xx'、'unsucceeded'、'malformed'、'auth'、'truncate'）"""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            roll = self._rng.random()
+        for fault, rate in (('429', self.rate_429), ('5xx', self.rate_5xx),
+                            ('unsucceeded', self.rate_unsucceeded), ('malformed', self.rate_malformed),
+                            ('auth', self.rate_auth), ('truncate', self.rate_truncate)):
+            if roll < rate:
+                return delay, fault
+            roll -= rate
+        return delay, None
+
+class MockStats:
+    def __init__(self):
+        self.requests = 0
+        self.faults = {}
+        self.tokens = {}
+        self._lock = threading.Lock()
+
+    def record(self, fault):
+        with self._lock:
+            self.requests += 1
+            if fault:
+                self.faults[fault] = self.faults.get(fault, 0) + 1
+
+    def record_token(self, token):
+        """记录一次使用该access_token的请求，返回该token的累计请求数"""
+        with self._lock:
+            self.tokens[token] = self.tokens.get(token, 0) + 1
+            return self.tokens[token]
+
+def cookie_value(cookie, name):
+    """从Cookie请求头中读取指定名称的值"""
+    for part in cookie.split(';'):
+        key, _, value = part.strip().partition('=')
+        if key == name:
+            return value
+    return None
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send(self, status, body, headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_media(self, data, truncate=False):
+        """返回媒体文件，支持Range续传（If-Range与ETag不一致时返回完整内容）；truncate时只发送一半内容后断开连接"""
+        start = 0
+        etag = '"%s"' % hashlib.sha1(data).hexdigest()
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+        if match and self.headers.get('If-Range') not in (None, etag):
+            match = None
+        if match:
+            start = int(match.group(1))
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(data)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if truncate:
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        delay, fault = server.faults.pick()
+        server.stats.record(fault)
+        if delay:
+            time.sleep(delay)
+        if fault in ('unsucceeded', 'malformed', 'auth') and self.path.startswith('/media/'):
+            # 图片服务器不返回JSON，只注入延迟、429/5xx和传输中断
+            fault = None
+        if fault == '429':
+            return self._send(429, {'succeeded': False, 'code': 429}, {'Retry-After': '1'})
+        if fault == '5xx':
+            return self._send(503, {'succeeded': False, 'code': 503})
+        if fault == 'unsucceeded':
+            return self._send(200, {'succeeded': False, 'code': 1059, 'info': '内部错误'})
+        if fault == 'auth':
+            return self._send(401, {'succeeded': False, 'code': 401, 'info': '登录已失效'})
+        if fault == 'malformed':
+            return self._send(200, b'{"succeeded": true, "resp_data": {"topics": [')
+        if server.token_limits and not self.path.startswith('/media/'):
+            token = cookie_value(self.headers.get('Cookie', ''), 'zsxq_access_token')
+            if server.stats.record_token(token) > server.token_limits.get(token, float('inf')):
+                return self._send(401, {'succeeded': False, 'code': 401, 'info': '登录已失效'})
+
+        parsed = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        group = server.group
+        # 任意星球ID都返回同一个模拟星球，config.json中的groupId无需修改
+        match = GROUP_RE.match(parsed.path)
+        if match:
+            return self._send(200, {'succeeded': True, 'resp_data': {'group': group.group_info()}})
+        match = LIST_RE.match(parsed.path)
+        if match:
+            topics = group.list_topics(query.get('scope', 'all'), int(query.get('count', 20)), query.get('end_time'))
+            return self._send(200, {'succeeded': True, 'resp_data': {'topics': topics}})
+        match = DIGESTS_RE.match(parsed.path)
+        if match:
+            topics = group.digests(int(query.get('count', 30)), query.get('index', 0))
+            return self._send(200, {'succeeded': True, 'resp_data': {'topics': topics}})
+        match = INFO_RE.match(parsed.path)
+        if match:
+            i = group.index_of(match.group(1))
+            topic = group.topic_detail(i) if i is not None else group.live_topic_detail(match.group(1))
+            if topic is not None:
+                return self._send(200, {'succeeded': True, 'resp_data': {'topic': topic, 'type': 'topic'}})
+            return self._send(200, {'succeeded': False, 'code': 1102})
+        match = COMMENTS_RE.match(parsed.path)
+        if match:
+            i = group.index_of(match.group(1))
+            if i is not None:
+                comments = group.list_comments(i, int(query.get('count', 30)), query.get('begin_time'))
+                return self._send(200, {'succeeded': True, 'resp_data': {'comments': comments}})
+            return self._send(200, {'succeeded': False, 'code': 1102})
+        match = FILE_URL_RE.match(parsed.path)
+        if match:
+            url = f"{group.media_base}/file{int(match.group(1)) - 700000}.pdf?e=1746028799&token=file"
+            return self._send(200, {'succeeded': True, 'resp_data': {'download_url': url}})
+        match = MEDIA_RE.match(parsed.path)
+        if match:
+            return self._send_media(group.media_content(match.group(1)), fault == 'truncate')
+        return self._send(404, {'succeeded': False, 'code': 404})
+
+def create_server(group, faults=None, host='127.0.0.1', port=8765, token_limits=None):
+    """创建模拟服务器（未启动），port为0时自动选择端口
+    token_limits: {access_token: 请求数}，该token的请求超过指定次数后返回401（模拟登录失效）
+    """
+    server = ThreadingHTTPServer((host, port), MockHandler)
+    server.daemon_threads = True
+    server.group = group
+    server.faults = faults or FaultConfig()
+    server.token_limits = token_limits or {}
+    server.stats = MockStats()
+    group.media_base = f"http://{host}:{server.server_address[1]}/media"
+    return server
+
+def start_publisher(group, interval, seed=None):
+    """在后台线程中按随机间隔（平均interval秒）发布新文章：三分之一的文章紧接着上一篇发布，
+    其余间隔按指数分布，模拟作者集中发文后长时间不发文的情况
+    """
+    rng = random.Random(seed)
+
+    def run():
+        while True:
+            time.sleep(rng.uniform(1, 5) if rng.random() < 1 / 3 else rng.expovariate(1 / (1.5 * interval)))
+            topic = group.publish()
+            logger.info("发布新文章 %s（%s）", topic['topic_id'], topic['create_time'])
+
+    thread = threading.Thread(target=run, name='mock-publisher', daemon=True)
+    thread.start()
+    return thread
+
+def start_server(group, faults=None, host='127.0.0.1', port=0):
+    """在后台线程中启动模拟服务器
+    Returns:
+        tuple: (server, base_url)，base_url可直接作为--base-url参数
+    """
+    server = create_server(group, faults, host, port)
+    thread = threading.Thread(target=server.serve_forever, name='mock-server', daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v2"
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='本地模拟知识星球API服务器，用于压测和回归测试')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--group', type=int, default=48844242882218, help='生成的文章中的星球ID')
+    parser.add_argument('--topics', type=int, default=1000, help='模拟的文章数量')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--interval', type=int, default=3600, help='相邻文章的发布间隔（秒）')
+    parser.add_argument('--digest-every', type=int, default=5, help='每N篇文章中有1篇精华')
+    parser.add_argument('--article-every', type=int, default=0,
+                        help='每N篇文章中有1篇长文章（列表数据不完整，需要请求详情接口），默认0表示没有')
+    parser.add_argument('--max-comments', type=int, default=9,
+                        help='每篇文章的评论总数上限（列表中只返回前3条预览）')
+    parser.add_argument('--media-every', type=int, default=0,
+                        help='每N篇文章中有1篇带图片（每2N篇有1篇带附件），默认0表示没有')
+    parser.add_argument('--revise-every', type=int, default=0,
+                        help='每N篇文章中有1篇在发布后被修改（正文和点赞数随--revision变化），默认0表示没有')
+    parser.add_argument('--revision', type=int, default=0, help='修改次数，改变该值模拟文章再次被修改')
+    parser.add_argument('--post-interval', type=float, default=0,
+                        help='运行期间平均每隔多少秒发布一篇新文章（间隔随机，有时连续发布），默认0表示不发布')
+    parser.add_argument('--latency-ms', type=float, default=0, help='每个请求的平均延迟（毫秒）')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='延迟的随机波动（毫秒）')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='返回429的概率')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='返回503的概率')
+    parser.add_argument('--rate-unsucceeded', type=float, default=0.0, help='返回succeeded为false的概率')
+    parser.add_argument('--rate-malformed', type=float, default=0.0, help='返回格式错误JSON的概率')
+    parser.add_argument('--rate-auth', type=float, default=0.0, help='返回401（登录失效）的概率')
+    parser.add_argument('--rate-truncate', type=float, default=0.0, help='媒体文件只发送一半内容后断开的概率')
+    parser.add_argument('--expire-token', action='append', default=[], metavar='TOKEN:N',
+                        help='使用该zsxq_access_token的请求超过N次后返回401（模拟登录失效），可重复指定')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    group = MockGroup(args.group, args.topics, args.seed, args.interval, args.digest_every,
+                      article_every=args.article_every, max_comments=args.max_comments,
+                      media_every=args.media_every, revise_every=args.revise_every, revision=args.revision)
+    faults = FaultConfig(args.latency_ms, args.jitter_ms, args.rate_429, args.rate_5xx,
+                         args.rate_unsucceeded, args.rate_malformed, args.seed, args.rate_auth,
+                         args.rate_truncate)
+    token_limits = {}
+    for value in args.expire_token:
+        token, _, limit = value.rpartition(':')
+        token_limits[token] = int(limit)
+    server = create_server(group, faults, args.host, args.port, token_limits)
+    if args.post_interval > 0:
+        start_publisher(group, args.post_interval, args.seed)
+    logger.info("模拟服务器已启动：http://%s:%s/v2（星球%s，%s篇文章）",
+                args.host, server.server_address[1], args.group, args.topics)
+    logger.info("使用方法：python single_article.py --from-list --base-url http://%s:%s/v2",
+                args.host, server.server_address[1])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info("共处理请求%s个，注入故障：%s", server.stats.requests, server.stats.faults)
+        if server.token_limits:
+            logger.info("各access_token的请求数：%s", server.stats.tokens)
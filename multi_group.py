@@ -0,0 +1,275 @@
+import os
+import copy
+import json
+import time
+import threading
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from main import topic_needs_detail, prepare_topic, get_default_archive
+from zsxq_client import ZsxqClient, load_config
+from crawler import ENDPOINT_TOPICS, page_url, next_cursor, fetch_page
+from retry_policy import FatalError
+from single_article import fetch_single_article, save_single_article
+from log_utils import get_logger, ProgressBar, add_logging_arguments, setup_logging_from_args
+
+logger = get_logger('multi_group')
+
+# 每个星球可以单独覆盖的配置项
+GROUP_CONFIG_KEYS = ('auth', 'headers', 'rateLimit', 'retry', 'cache')
+
+class GroupJob:
+    """一个星球的抓取任务
+    任务分为三种：('page', scope, cursor)请求一个列表页，('info', topic_id)请求一篇文章的详情，
+    ('save', topic_id, topic)保存列表页中数据完整的文章（包括获取完整评论、下载媒体文件）。
+    列表页任务只产生下一页任务和各篇文章的详情/保存任务，不在翻页线程中保存文章。
+    """
+
+    def __init__(self, name, client, scopes=('all',), output_dir='articles', archive=None,
+                 endpoint=ENDPOINT_TOPICS):
+        self.name = name
+        self.client = client
+        self.group_id = client.group_id
+        self.scopes = list(scopes)
+        self.output_dir = output_dir
+        self.archive = archive
+        self.endpoint = endpoint
+        self.tasks = deque(('page', scope, None) for scope in self.scopes)
+        self.in_flight = 0
+        self.aborted = None
+        self.elapsed = None
+        self.saved = 0
+        self.pages = 0
+        self.detail_requests = 0
+        self.download_failed_ids = []
+        self.save_failed_ids = []
+        # 同一篇文章可能出现在多个scope中，只处理一次；每个scope只与上一页比较去重
+        self._seen = set()
+        self._previous_ids = {}
+        self._lock = threading.Lock()
+
+    @property
+    def failed(self):
+        return len(self.download_failed_ids) + len(self.save_failed_ids)
+
+    def _claim(self, topic_id):
+        with self._lock:
+            if topic_id in self._seen:
+                return False
+            self._seen.add(topic_id)
+            return True
+
+    def _save(self, topic_id, topic, progress):
+        # 完整评论和附件下载地址使用本星球的客户端（凭证和限流器）在工作线程中获取
+        prepare_topic(topic, self.client)
+        file_path = save_single_article(topic_id, topic, self.download_failed_ids, self.save_failed_ids,
+                                        self.output_dir, self.archive, self.client)
+        if file_path:
+            with self._lock:
+                self.saved += 1
+        if progress is not None:
+            progress.update(failed=not file_path)
+
+    def run_task(self, task, progress=None):
+        """执行一个任务，返回新产生的任务列表（列表页任务排在前面，保证翻页不被详情请求和文章保存阻塞）"""
+        if task[0] == 'page':
+            return self._run_page(task[1], task[2], progress)
+        if task[0] == 'save':
+            self._save(task[1], task[2], progress)
+            return []
+        topic_id = task[1]
+        with self._lock:
+            self.detail_requests += 1
+        topic = fetch_single_article(topic_id, self.download_failed_ids, self.client)
+        if topic is not None:
+            self._save(topic_id, topic, progress)
+        elif progress is not None:
+            progress.update(failed=True)
+        return []
+
+    def _run_page(self, scope, cursor, progress):
+        url = page_url(self.client, self.endpoint, self.group_id, scope, None, cursor)
+        resp_data, topics = fetch_page(self.client, url)
+        with self._lock:
+            self.pages += 1
+        new_tasks = []
+        cursor_next = next_cursor(self.endpoint, resp_data, topics)
+        if cursor_next is not None and cursor_next != cursor:
+            new_tasks.append(('page', scope, cursor_next))
+
+        previous_ids = self._previous_ids.get(scope, set())
+        current_ids = set()
+        for topic in topics:
+            topic_id = str(topic.get('topic_id', ''))
+            if not topic_id:
+                continue
+            current_ids.add(topic_id)
+            if topic_id in previous_ids or not self._claim(topic_id):
+                continue
+            if topic_needs_detail(topic):
+                new_tasks.append(('info', topic_id))
+            else:
+                new_tasks.append(('save', topic_id, topic))
+        self._previous_ids[scope] = current_ids
+        return new_tasks
+
+class FairScheduler:
+    """在共享线程池中并发执行多个星球的任务
+    每次空闲时从“进行中任务最少”的星球取下一个任务（相同时轮流），
+    任务多或被限流变慢的星球最多占用与其他星球相同的线程数，不会让其他星球饿死；
+    只有一个星球还有任务时，它可以使用全部线程。
+    """
+
+    def __init__(self, jobs, workers=4):
+        self.jobs = list(jobs)
+        self.workers = max(1, int(workers))
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._next = 0
+        self._start_time = None
+
+    def _pick(self):
+        """选择下一个要执行的星球，没有可执行的任务时返回None（调用时需持有锁）"""
+        best = None
+        count = len(self.jobs)
+        for offset in range(count):
+            job = self.jobs[(self._next + offset) % count]
+            if job.aborted is not None or not job.tasks:
+                continue
+            if best is None or job.in_flight < best.in_flight:
+                best = job
+        if best is not None:
+            self._next = (self.jobs.index(best) + 1) % count
+        return best
+
+    def _execute(self, job, task, progress):
+        new_tasks = []
+        try:
+            new_tasks = job.run_task(task, progress)
+        except FatalError as e:
+            logger.error("[%s] 运行已终止：%s", job.name, e)
+            job.aborted = e
+        except Exception as e:
+            logger.error("[%s] 任务 %s 失败：%s", job.name, task, e)
+            if task[0] == 'page':
+                job.download_failed_ids.append({'id': f"{task[1]}@{task[2]}", 'reason': f"列表页请求失败: {e}"})
+            elif task[0] == 'save':
+                job.save_failed_ids.append({'id': task[1], 'reason': str(e)})
+        finally:
+            with self._cond:
+                pages = [t for t in new_tasks if t[0] == 'page']
+                job.tasks.extendleft(reversed(pages))
+                job.tasks.extend(t for t in new_tasks if t[0] != 'page')
+                if job.aborted is not None:
+                    job.tasks.clear()
+                job.in_flight -= 1
+                self._in_flight -= 1
+                if job.in_flight == 0 and not job.tasks:
+                    job.elapsed = time.time() - self._start_time
+                self._cond.notify_all()
+
+    def run(self, progress=None):
+        self._start_time = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='group-worker') as executor:
+            with self._cond:
+                while True:
+                    job = self._pick() if self._in_flight < self.workers else None
+                    if job is None:
+                        if self._in_flight == 0:
+                            break
+                        self._cond.wait()
+                        continue
+                    task = job.tasks.popleft()
+                    job.in_flight += 1
+                    self._in_flight += 1
+                    executor.submit(self._execute, job, task, progress)
+
+def group_specs_from_config(config):
+    """从config.json中读取要抓取的星球列表，没有groups配置时使用api.groupId"""
+    groups = config.get('groups')
+    if groups:
+        return groups
+    return [{'groupId': config.get('api', {}).get('groupId')}]
+
+def create_job(base_config, spec, workers=4):
+    """根据星球配置创建GroupJob：每个星球使用单独的客户端（单独的限流器、重试策略和熔断器）
+    Args:
+        base_config: config.json的内容
+        spec: 星球配置，包含groupId，可选name、scopes、endpoint、outputDir、archive，
+            以及覆盖全局配置的auth、headers、rateLimit、retry、cache；
+            没有设置archive时使用--archive指定的默认归档（未指定时保存为outputDir中的txt文件）
+    """
+    config = copy.deepcopy(base_config)
+    config.setdefault('api', {})['groupId'] = str(spec['groupId'])
+    for key in GROUP_CONFIG_KEYS:
+        if key in spec:
+            config[key] = spec[key]
+    client = ZsxqClient(config, pool_size=max(10, workers))
+    name = spec.get('name') or str(spec['groupId'])
+    archive = get_default_archive()
+    if spec.get('archive'):
+        from packed_archive import PackedArchive
+        archive = PackedArchive(spec['archive'])
+    output_dir = spec.get('outputDir') or os.path.join('articles', name)
+    return GroupJob(name, client, spec.get('scopes') or ['all'], output_dir, archive,
+                    spec.get('endpoint', ENDPOINT_TOPICS))
+
+def crawl_groups(specs, config=None, workers=4):
+    """并发抓取多个星球
+    Returns:
+        list: 各星球的GroupJob（包含统计数据和失败记录）
+    """
+    if config is None:
+        config = load_config()
+    jobs = [create_job(config, spec, workers) for spec in specs]
+    for job in jobs:
+        logger.info("[%s] 星球 %s，scope: %s，输出到 %s", job.name, job.group_id, ','.join(job.scopes),
+                    job.archive.archive_dir if job.archive is not None else job.output_dir)
+
+    start_time = time.time()
+    progress = ProgressBar(desc='多星球抓取')
+    FairScheduler(jobs, workers).run(progress)
+    progress.close()
+    elapsed = time.time() - start_time
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    for job in jobs:
+        status = f"已终止（{job.aborted}）" if job.aborted is not None else "完成"
+        logger.info("[%s] %s：列表页%s个，详情请求%s篇，保存%s篇，失败%s篇，耗时%.1f秒", job.name, status,
+                    job.pages, job.detail_requests, job.saved, job.failed, job.elapsed or 0.0,
+                    extra={'fields': {'event': 'group_done', 'group': job.name, 'pages': job.pages,
+                                      'saved': job.saved, 'failed': job.failed, 'elapsed': job.elapsed}})
+        failures = job.download_failed_ids + job.save_failed_ids
+        if failures:
+            os.makedirs('logs', exist_ok=True)
+            failure_log = f"logs/failures_{job.name}_{timestamp}.json"
+            with open(failure_log, 'w', encoding='utf-8') as f:
+                json.dump(failures, f, ensure_ascii=False, indent=2)
+            logger.warning("[%s] 失败记录已保存到 %s", job.name, failure_log)
+    total = sum(job.saved for job in jobs)
+    logger.info("全部星球处理完成：保存%s篇，耗时%.1f秒，%.1f篇/秒", total, elapsed,
+                total / elapsed if elapsed > 0 else 0.0)
+    return jobs
+
+if __name__ == '__main__':
+    import argparse
+    from outputs import add_output_arguments, setup_outputs_from_args
+    parser = argparse.ArgumentParser(description='在一个进程中并发抓取多个星球')
+    parser.add_argument('--config', default='config.json', help='配置文件，读取其中的groups列表')
+    parser.add_argument('--group', action='append',
+                        help='要抓取的星球ID，可重复指定（代替config.json中的groups）')
+    parser.add_argument('--scope', action='append', help='--group时使用的scope，可重复指定，默认all')
+    parser.add_argument('--workers', type=int, default=4, help='所有星球共用的线程数')
+    add_logging_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    outputs = setup_outputs_from_args(args, args.workers)
+
+    config = load_config(args.config)
+    if args.group:
+        specs = [{'groupId': group_id, 'scopes': args.scope or ['all']} for group_id in args.group]
+    else:
+        specs = group_specs_from_config(config)
+    crawl_groups(specs, config, args.workers)
+    outputs.close()
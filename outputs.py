@@ -0,0 +1,77 @@
+from metrics import add_metrics_arguments, setup_metrics_from_args
+from packed_archive import add_archive_arguments, setup_archive_from_args
+from article_store import add_store_arguments, setup_store_from_args
+from search_index import add_search_arguments, setup_search_from_args
+from metadata_store import add_metadata_arguments, setup_metadata_from_args
+from comments import add_comment_arguments, setup_comments_from_args, CommentStore
+from media import add_media_arguments, setup_media_from_args, MediaStore
+from zsxq_client import add_client_arguments, setup_client_from_args
+
+class Outputs:
+    """setup_outputs_from_args设置的输出和渲染前补全组件，未启用的为None
+    运行结束时调用close()：关闭评论获取器、媒体下载器的线程池和媒体库。
+    归档、全文索引、列式元数据每次保存文章时写盘，未写盘的数据在进程退出时由各模块写入。
+    """
+
+    def __init__(self, archive=None, search_index=None, metadata_store=None, comment_fetcher=None,
+                 media_downloader=None, comment_store=None, media_store=None):
+        self.archive = archive
+        self.search_index = search_index
+        self.metadata_store = metadata_store
+        self.comment_fetcher = comment_fetcher
+        self.media_downloader = media_downloader
+        # 离线模式（response_cache.py rerender）下只打开本地已保存的评论和媒体文件，不发送请求
+        self.comment_store = comment_store
+        self.media_store = media_store
+
+    def close(self):
+        """可以重复调用"""
+        if self.comment_fetcher is not None:
+            self.comment_fetcher.close()
+            self.comment_fetcher = None
+        if self.media_downloader is not None:
+            self.media_downloader.close()
+            self.media_downloader = None
+        if self.media_store is not None:
+            self.media_store.close()
+            self.media_store = None
+
+def add_output_arguments(parser):
+    """为命令行解析器添加所有保存文章的脚本共用的参数：
+    运行指标、压缩归档、txt目录布局、全文索引、列式元数据、完整评论、媒体文件和接口地址
+    """
+    add_metrics_arguments(parser)
+    add_archive_arguments(parser)
+    add_store_arguments(parser)
+    add_search_arguments(parser)
+    add_metadata_arguments(parser)
+    add_comment_arguments(parser)
+    add_media_arguments(parser)
+    add_client_arguments(parser)
+
+def setup_outputs_from_args(args, workers=4, offline=False):
+    """根据add_output_arguments添加的参数设置extract_and_save_article使用的输出和渲染前补全组件
+    Args:
+        workers: 评论获取器和媒体下载器的线程数
+        offline: 为True时不创建评论获取器和媒体下载器，--full-comments、--media只打开本地已保存的评论和媒体文件
+    Returns:
+        Outputs: 运行结束时调用其close()
+    """
+    setup_metrics_from_args(args)
+    outputs = Outputs(
+        archive=setup_archive_from_args(args),
+        search_index=setup_search_from_args(args),
+        metadata_store=setup_metadata_from_args(args),
+    )
+    setup_store_from_args(args)
+    workers = max(1, workers)
+    if offline:
+        if args.full_comments:
+            outputs.comment_store = CommentStore(args.comments_dir)
+        if args.media:
+            outputs.media_store = MediaStore(args.media_dir)
+    else:
+        outputs.comment_fetcher = setup_comments_from_args(args, workers)
+        outputs.media_downloader = setup_media_from_args(args, workers)
+    setup_client_from_args(args)
+    return outputs
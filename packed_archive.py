@@ -0,0 +1,186 @@
+import os
+import re
+import gzip
+import json
+import threading
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+try:
+    import zstandard
+except ImportError:  # zstandard为可选依赖，未安装时使用gzip
+    zstandard = None
+
+logger = get_logger('packed_archive')
+
+INDEX_FILE = 'index.jsonl'
+SEGMENT_RE = re.compile(r'^segment-(\d+)\.jsonl\.(gz|zst)$')
+
+def _compress(data, codec):
+    if codec == 'zst':
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+def _decompress(data, codec):
+    if codec == 'zst':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+class PackedArchive:
+    """分段压缩的文章归档
+    每篇文章为一条JSON记录，单独压缩（gzip成员或zstd帧）后追加到当前分段文件，
+    分段文件本身仍是合法的.jsonl.gz/.jsonl.zst，可以直接用zcat/zstdcat查看。
+    index.jsonl记录每篇文章所在的分段、偏移和长度，按topic_id随机读取只需一次seek。
+    同一topic_id多次写入时以最后一次为准。
+    """
+
+    def __init__(self, archive_dir='archive', segment_size=64 * 1024 * 1024, codec=None):
+        self.archive_dir = archive_dir
+        self.segment_size = segment_size
+        if codec is None:
+            codec = 'zst' if zstandard is not None else 'gz'
+        if codec == 'zst' and zstandard is None:
+            raise RuntimeError("使用zstd压缩需要安装zstandard：pip install zstandard")
+        self.codec = codec
+        self.index = {}
+        self._lock = threading.Lock()
+        os.makedirs(archive_dir, exist_ok=True)
+        self._load_index()
+        self._segment_no = self._last_segment_no() or 1
+
+    def _load_index(self):
+        index_path = os.path.join(self.archive_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 写入索引时进程中断可能留下不完整的最后一行
+                    logger.warning("跳过损坏的索引行：%s", line[:100])
+                    continue
+                self.index[entry['topic_id']] = entry
+
+    def _last_segment_no(self):
+        numbers = [int(m.group(1)) for m in map(SEGMENT_RE.match, os.listdir(self.archive_dir)) if m]
+        return max(numbers) if numbers else 0
+
+    def _segment_name(self, number):
+        return f"segment-{number:05d}.jsonl.{self.codec}"
+
+    def append(self, topic_id, filename, text, **meta):
+        """追加一篇文章
+        Returns:
+            str: 保存位置，格式为"归档目录#topic_id"
+        """
+        topic_id = str(topic_id)
+        record = {'topic_id': topic_id, 'filename': filename, 'text': text}
+        record.update(meta)
+        data = _compress((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'), self.codec)
+        with self._lock:
+            segment = self._segment_name(self._segment_no)
+            segment_path = os.path.join(self.archive_dir, segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_size:
+                self._segment_no += 1
+                segment = self._segment_name(self._segment_no)
+                segment_path = os.path.join(self.archive_dir, segment)
+            with open(segment_path, 'ab') as f:
+                offset = f.tell()
+                f.write(data)
+            entry = {'topic_id': topic_id, 'segment': segment, 'offset': offset,
+                     'length': len(data), 'filename': filename}
+            with open(os.path.join(self.archive_dir, INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self.index[topic_id] = entry
+        return f"{self.archive_dir}#{topic_id}"
+
+    def __contains__(self, topic_id):
+        return str(topic_id) in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def _read_entry(self, f, entry):
+        f.seek(entry['offset'])
+        codec = entry['segment'].rsplit('.', 1)[-1]
+        return json.loads(_decompress(f.read(entry['length']), codec))
+
+    def get(self, topic_id):
+        """按topic_id随机读取一篇文章记录，不存在时返回None"""
+        entry = self.index.get(str(topic_id))
+        if entry is None:
+            return None
+        with open(os.path.join(self.archive_dir, entry['segment']), 'rb') as f:
+            return self._read_entry(f, entry)
+
+    def iter_records(self):
+        """按写入顺序逐条返回文章记录（每篇文章只返回最后一次写入的版本）"""
+        entries = sorted(self.index.values(), key=lambda e: (e['segment'], e['offset']))
+        current_segment = None
+        f = None
+        try:
+            for entry in entries:
+                if entry['segment'] != current_segment:
+                    if f is not None:
+                        f.close()
+                    current_segment = entry['segment']
+                    f = open(os.path.join(self.archive_dir, current_segment), 'rb')
+                yield self._read_entry(f, entry)
+        finally:
+            if f is not None:
+                f.close()
+
+    def expand(self, output_dir='articles'):
+        """将归档展开为articles目录下的txt文件（与直接保存txt的布局相同）
+        Returns:
+            int: 展开的文章数
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        count = 0
+        for record in self.iter_records():
+            with open(os.path.join(output_dir, record['filename']), 'w', encoding='utf-8') as f:
+                f.write(record['text'])
+            count += 1
+        logger.info("已将%s篇文章展开到 %s", count, output_dir)
+        return count
+
+def add_archive_arguments(parser):
+    """为命令行解析器添加归档输出参数"""
+    parser.add_argument('--archive', metavar='DIR',
+                        help='将文章追加写入该目录下的压缩归档，而不是保存为单独的txt文件')
+
+def setup_archive_from_args(args):
+    """根据--archive参数设置extract_and_save_article的默认输出归档"""
+    if not getattr(args, 'archive', None):
+        return None
+    from main import set_default_archive
+    archive = PackedArchive(args.archive)
+    set_default_archive(archive)
+    logger.info("文章将写入压缩归档: %s（已有%s篇）", args.archive, len(archive))
+    return archive
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='压缩文章归档工具')
+    parser.add_argument('command', choices=['expand', 'get', 'stats'],
+                        help='expand: 展开为txt文件；get: 输出一篇文章；stats: 显示归档统计')
+    parser.add_argument('topic_id', nargs='?', help='get命令的文章ID')
+    parser.add_argument('--archive', default='archive', help='归档目录')
+    parser.add_argument('--out', default='articles', help='expand命令的输出目录')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    archive = PackedArchive(args.archive)
+    if args.command == 'expand':
+        archive.expand(args.out)
+    elif args.command == 'get':
+        record = archive.get(args.topic_id)
+        if record is None:
+            logger.error("归档中没有文章 %s", args.topic_id)
+        else:
+            print(record['text'])
+    else:
+        segments = sorted({entry['segment'] for entry in archive.index.values()})
+        size = sum(os.path.getsize(os.path.join(args.archive, name)) for name in segments)
+        logger.info("文章数: %s，分段数: %s，压缩后大小: %.1f MB", len(archive), len(segments), size / 1024 / 1024)
@@ -0,0 +1,116 @@
+import time
+import threading
+from log_utils import get_logger
+
+logger = get_logger('rate_limiter')
+
+class AdaptiveRateLimiter:
+    """自适应令牌桶限流器
+    以rate（每秒请求数）补充令牌，最多积累burst个令牌。
+    请求成功时速率加性增加（+increase），遇到429、5xx或succeeded为false时
+    速率乘性减少（×decrease_factor），即AIMD策略。线程安全。
+    """
+
+    def __init__(self, rate=1.0, burst=5, min_rate=0.05, max_rate=5.0,
+                 increase=0.05, decrease_factor=0.5, decrease_interval=2.0):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = float(increase)
+        self.decrease_factor = float(decrease_factor)
+        # 并发请求同时失败时，在该时间窗口内只降速一次
+        self.decrease_interval = float(decrease_interval)
+        self.tokens = float(self.burst)
+        self.total_wait = 0.0
+        self._last_refill = time.monotonic()
+        self._last_decrease = 0.0
+        self._pause_until = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """根据config.json中的rateLimit配置创建限流器"""
+        config = config or {}
+        return cls(
+            rate=config.get('rate', 1.0),
+            burst=config.get('burst', 5),
+            min_rate=config.get('minRate', 0.05),
+            max_rate=config.get('maxRate', 5.0),
+            increase=config.get('increase', 0.05),
+            decrease_factor=config.get('decreaseFactor', 0.5),
+        )
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def acquire(self):
+        """获取一个令牌，必要时阻塞等待
+        Returns:
+            float: 本次等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # 预留令牌：令牌可以为负数，表示需要等待的时间
+            self.tokens -= 1
+            wait = 0.0
+            if self.tokens < 0:
+                wait = -self.tokens / self.rate
+            wait = max(wait, self._pause_until - now)
+            self.total_wait += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def estimated_wait(self):
+        """现在获取令牌需要等待的秒数（不消耗令牌），用于在多个限流器之间选择"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            return max(wait, self._pause_until - now)
+
+    def on_success(self):
+        """请求成功：加性增加速率"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """服务器限流或出错：乘性降低速率，并清空已积累的令牌
+        Args:
+            retry_after: 服务器返回的Retry-After秒数，在此期间暂停发送请求
+        """
+        with self._lock:
+            now = time.monotonic()
+            if retry_after:
+                self._pause_until = max(self._pause_until, now + retry_after)
+            if now - self._last_decrease < self.decrease_interval:
+                return
+            self._last_decrease = now
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.tokens = min(self.tokens, 0.0)
+            logger.warning("检测到限流或服务器错误，请求速率降至 %.2f 次/秒", self.rate)
+
+    def observe(self, status_code=None, succeeded=True, retry_after=None):
+        """根据响应结果调整速率
+        Args:
+            status_code: HTTP状态码
+            succeeded: 响应JSON中的succeeded字段
+            retry_after: 响应头中的Retry-After秒数
+        """
+        if status_code == 429 or (status_code is not None and status_code >= 500) or succeeded is False:
+            self.on_throttle(retry_after)
+        elif status_code is None or status_code < 400:
+            self.on_success()
+
+def parse_retry_after(response):
+    """解析响应头中的Retry-After（仅支持秒数）"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
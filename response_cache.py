@@ -0,0 +1,234 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlparse
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+logger = get_logger('response_cache')
+
+class ResponseCache:
+    """API原始响应的本地压缩缓存
+    每个响应以URL的sha1为键保存为一个gzip压缩的JSON文件（cache/ab/abcdef....json.gz），
+    记录请求URL和获取时间。支持按TTL过期和按总大小淘汰（优先淘汰最久未使用的条目）。
+    缓存文件的修改时间固定为获取时间（fetched_at），访问时间记录最近一次使用，淘汰时无需解压文件：
+    按修改时间判断是否过期，按访问时间判断最久未使用。
+    """
+
+    def __init__(self, cache_dir='cache', ttl=None, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(os.path.getsize(path) for path in self._iter_paths()) if max_bytes else 0
+
+    @classmethod
+    def from_config(cls, config):
+        """根据config.json中的cache配置创建缓存，未启用时返回None"""
+        if not config or not config.get('enabled', True):
+            return None
+        return cls(
+            cache_dir=config.get('dir', 'cache'),
+            ttl=config.get('ttlSeconds'),
+            max_bytes=config.get('maxBytes'),
+        )
+
+    def _path(self, url):
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _iter_paths(self):
+        for root, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json.gz'):
+                    yield os.path.join(root, name)
+
+    def put(self, url, resp_data):
+        """保存一个响应（先写临时文件再重命名，避免留下不完整的缓存文件）"""
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fetched_at = time.time()
+        entry = {'url': url, 'fetched_at': fetched_at, 'data': resp_data}
+        data = gzip.compress(json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.utime(tmp_path, (fetched_at, fetched_at))
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        if self.max_bytes:
+            with self._lock:
+                self._total_bytes += len(data) - old_size
+                over_limit = self._total_bytes > self.max_bytes
+            if over_limit:
+                self.evict()
+
+    def _read(self, path):
+        with gzip.open(path, 'rb') as f:
+            return json.loads(f.read())
+
+    def get(self, url, ttl=None):
+        """读取未过期的缓存响应，不存在或已过期时返回None
+        Args:
+            ttl: 本次读取使用的有效期（秒），默认使用缓存的ttl，均为None时不过期
+        """
+        path = self._path(url)
+        try:
+            entry = self._read(path)
+        except (OSError, EOFError, ValueError):
+            return None
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and time.time() - entry['fetched_at'] > ttl:
+            return None
+        # 只更新访问时间，按大小淘汰时优先删除最久未使用的条目；修改时间保持为获取时间，过期判断不受读取影响
+        try:
+            os.utime(path, (time.time(), entry['fetched_at']))
+        except OSError:
+            pass
+        return entry['data']
+
+    def stats(self):
+        """返回(条目数, 总字节数)"""
+        count = 0
+        size = 0
+        for path in self._iter_paths():
+            count += 1
+            size += os.path.getsize(path)
+        return count, size
+
+    def iter_entries(self):
+        """逐个返回缓存条目（字典，包含url、fetched_at、data）"""
+        for path in self._iter_paths():
+            try:
+                yield self._read(path)
+            except (OSError, EOFError, ValueError) as e:
+                logger.warning("跳过损坏的缓存文件 %s：%s", path, e)
+
+    def evict(self):
+        """删除过期条目（按获取时间），总大小超过max_bytes时再按最久未使用删除到上限的90%
+        Returns:
+            int: 删除的条目数
+        """
+        with self._lock:
+            now = time.time()
+            entries = []
+            for path in self._iter_paths():
+                stat = os.stat(path)
+                # st_mtime为获取时间，st_atime为最近一次使用时间
+                entries.append((stat.st_atime, stat.st_mtime, stat.st_size, path))
+            entries.sort()
+            total = sum(entry[2] for entry in entries)
+            removed = 0
+            target = self.max_bytes * 0.9 if self.max_bytes else None
+            for used_at, fetched_at, size, path in entries:
+                expired = self.ttl is not None and now - fetched_at > self.ttl
+                if not expired and (target is None or total <= target):
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+            self._total_bytes = total
+        if removed:
+            logger.info("缓存淘汰了%s个条目，当前大小%.1f MB", removed, total / 1024 / 1024)
+        return removed
+
+def topics_from_entry(entry):
+    """从缓存条目中取出文章数据
+    Returns:
+        tuple: (是否为详情接口, 文章列表)
+    """
+    resp_data = (entry.get('data') or {}).get('resp_data') or {}
+    is_info = urlparse(entry.get('url', '')).path.endswith('/info')
+    if is_info:
+        topic = resp_data.get('topic')
+        return True, [topic] if topic else []
+    return False, resp_data.get('topics') or []
+
+def rerender(cache, output_dir='articles', archive=None, comment_store=None, media_store=None,
+             include_avatars=False):
+    """不发送任何请求，用缓存中的响应重新生成所有文章
+    同一篇文章有多个缓存版本时，优先使用详情接口的响应，其次使用较新的响应。
+    缓存中只有接口响应：传入comment_store、media_store时，分别写入本地已保存的完整评论（--full-comments）
+    和已下载的图片、附件路径（--media，include_avatars时包括头像和星球背景图），与联网下载时的输出一致；
+    不传时文章只有预览评论和原始图片地址。
+    Returns:
+        int: 生成的文章数
+    """
+    from main import extract_and_save_article
+    from comments import apply_stored_comments
+    from media import apply_stored_media
+
+    # 第一遍只记录每篇文章最佳版本所在的缓存条目，避免把所有响应同时读入内存
+    best = {}
+    for entry in cache.iter_entries():
+        is_info, topics = topics_from_entry(entry)
+        for topic in topics:
+            topic_id = str(topic.get('topic_id', ''))
+            if not topic_id:
+                continue
+            rank = (is_info, entry['fetched_at'])
+            if topic_id not in best or rank > best[topic_id][0]:
+                best[topic_id] = (rank, entry['url'])
+
+    urls = {}
+    for topic_id, (rank, url) in best.items():
+        urls.setdefault(url, set()).add(topic_id)
+
+    count = 0
+    for url, topic_ids in urls.items():
+        resp_data = cache.get(url, ttl=float('inf'))
+        if resp_data is None:
+            continue
+        is_info, topics = topics_from_entry({'url': url, 'data': resp_data})
+        for topic in topics:
+            if str(topic.get('topic_id', '')) not in topic_ids:
+                continue
+            try:
+                if comment_store is not None:
+                    apply_stored_comments(topic, comment_store)
+                if media_store is not None:
+                    apply_stored_media(topic, media_store, include_avatars)
+                extract_and_save_article(topic, output_dir, archive)
+                count += 1
+            except Exception as e:
+                logger.error("重新生成文章 %s 失败：%s", topic.get('topic_id'), e)
+    logger.info("已从缓存重新生成%s篇文章", count)
+    return count
+
+if __name__ == '__main__':
+    import argparse
+    from zsxq_client import load_config
+    from outputs import add_output_arguments, setup_outputs_from_args
+    parser = argparse.ArgumentParser(description='API响应缓存工具',
+                                     epilog='rerender不发送请求：--full-comments、--media只使用--comments-dir、'
+                                            '--media-dir中已保存的评论和已下载的媒体文件')
+    parser.add_argument('command', choices=['rerender', 'evict', 'stats'],
+                        help='rerender: 用缓存重新生成全部文章（不发送请求）；evict: 执行淘汰；stats: 显示统计')
+    parser.add_argument('--config', default='config.json', help='配置文件，读取其中的cache配置')
+    parser.add_argument('--out', default='articles', help='rerender的输出目录')
+    add_logging_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    outputs = setup_outputs_from_args(args, offline=True)
+
+    cache_config = {}
+    if os.path.exists(args.config):
+        cache_config = load_config(args.config).get('cache') or {}
+    cache_config['enabled'] = True
+    cache = ResponseCache.from_config(cache_config)
+    if args.command == 'rerender':
+        rerender(cache, args.out, outputs.archive, outputs.comment_store, outputs.media_store,
+                 args.media_avatars)
+    elif args.command == 'evict':
+        cache.evict()
+    else:
+        count, size = cache.stats()
+        logger.info("缓存条目: %s，大小: %.1f MB", count, size / 1024 / 1024)
+    outputs.close()
@@ -0,0 +1,291 @@
+import json
+import time
+import random
+import threading
+from collections import deque
+import requests
+from metrics import get_metrics
+from log_utils import get_logger
+
+logger = get_logger('retry_policy')
+
+# 错误分类：
+#   retryable: 网络错误、超时、429、5xx、格式错误的JSON、succeeded为false且为临时错误码，可以重试
+#   fatal:     401/403或登录失效等凭证/配置错误，重试没有意义，终止整个运行
+#   permanent: 404、文章不存在、响应结构不符合预期等，只影响这一个请求，不重试
+RETRYABLE = 'retryable'
+FATAL = 'fatal'
+PERMANENT = 'permanent'
+
+# succeeded为false时响应中的code：1059为服务器内部错误，稍后重试即可；401为登录失效
+RETRYABLE_API_CODES = {429, 500, 502, 503, 504, 1059}
+FATAL_API_CODES = {401, 403}
+FATAL_HTTP_STATUS = {401, 403}
+RETRYABLE_HTTP_STATUS = {408, 429}
+
+class ApiError(Exception):
+    """接口返回succeeded为false"""
+
+    def __init__(self, code=None, message='', url=''):
+        super().__init__(f"接口返回失败（code={code}）：{message or '无错误信息'}")
+        self.code = code
+        self.url = url
+
+class FatalError(Exception):
+    """凭证失效、配置错误或服务器持续拒绝请求，需要终止整个运行"""
+
+class ServerUnavailableError(FatalError):
+    """服务器持续不可用（熔断次数超过上限）。与凭证失效不同，服务器恢复后可以继续，常驻运行时不必退出"""
+
+def classify_error(error):
+    """将请求过程中的异常分为retryable、fatal、permanent三类"""
+    if isinstance(error, FatalError):
+        return FATAL
+    if isinstance(error, ApiError):
+        if error.code in FATAL_API_CODES:
+            return FATAL
+        if error.code in RETRYABLE_API_CODES:
+            return RETRYABLE
+        return PERMANENT
+    if isinstance(error, requests.exceptions.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        if status in FATAL_HTTP_STATUS:
+            return FATAL
+        if status in RETRYABLE_HTTP_STATUS or (status is not None and status >= 500):
+            return RETRYABLE
+        return PERMANENT
+    if isinstance(error, UnicodeEncodeError):
+        # Cookie等请求头中包含非法字符，属于配置错误
+        return FATAL
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError, json.JSONDecodeError)):
+        return RETRYABLE
+    if isinstance(error, requests.exceptions.RequestException):
+        return RETRYABLE
+    return PERMANENT
+
+class RetryBudget:
+    """全局重试预算：整个运行期间的重试次数不超过 min_retries + ratio × 请求数
+    大量请求同时失败时，重试不会成倍放大请求量和运行时间。线程安全。
+    """
+
+    def __init__(self, ratio=0.2, min_retries=20):
+        self.ratio = float(ratio)
+        self.min_retries = int(min_retries)
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self):
+        """申请一次重试，预算不足时返回False"""
+        with self._lock:
+            if self.retries >= self.min_retries + self.ratio * self.requests:
+                return False
+            self.retries += 1
+            return True
+
+class CircuitBreaker:
+    """熔断器：连续failure_threshold次可重试的失败后打开，在cooldown秒内暂停所有请求；
+    冷却结束后只放行一个探测请求（半开），成功则恢复，失败则以加倍的冷却时间再次打开。
+    最近trip_window秒内打开次数超过max_trips（服务器持续不可用），或遇到凭证失效等致命错误时，终止整个运行；
+    间隔很久的零星熔断会移出窗口，长时间运行不会因为累计次数而终止。trip_window为None时按整个运行累计。线程安全。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=8, cooldown=30.0, max_cooldown=300.0, max_trips=5, trip_window=3600.0):
+        self.failure_threshold = int(failure_threshold)
+        self.base_cooldown = float(cooldown)
+        self.cooldown = float(cooldown)
+        self.max_cooldown = float(max_cooldown)
+        self.max_trips = max_trips
+        self.trip_window = trip_window
+        self.state = self.CLOSED
+        self.failures = 0
+        # 累计打开次数（用于统计），以及窗口内各次打开的时间
+        self.trips = 0
+        self._trip_times = deque()
+        self.total_pause = 0.0
+        self._open_until = 0.0
+        self._fatal = None
+        self._cond = threading.Condition()
+
+    def before_call(self):
+        """请求前调用：熔断器打开时阻塞到冷却结束，运行已终止时抛出FatalError"""
+        with self._cond:
+            while True:
+                if self._fatal is not None:
+                    raise self._fatal
+                if self.state == self.CLOSED:
+                    return
+                now = time.monotonic()
+                if self.state == self.OPEN:
+                    if now >= self._open_until:
+                        # 本线程作为探测请求，其他线程等待探测结果
+                        self.state = self.HALF_OPEN
+                        logger.info("熔断冷却结束，发送探测请求")
+                        return
+                    wait = self._open_until - now
+                else:
+                    wait = 1.0
+                start = now
+                self._cond.wait(wait)
+                paused = time.monotonic() - start
+                self.total_pause += paused
+                get_metrics().add_time('breaker_pause', paused)
+
+    def record_success(self):
+        with self._cond:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                logger.info("探测请求成功，恢复正常请求")
+                self.state = self.CLOSED
+                self.cooldown = self.base_cooldown
+                self._cond.notify_all()
+
+    def record_failure(self):
+        with self._cond:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self._trip()
+
+    def _trip(self):
+        if self.state == self.HALF_OPEN:
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+        now = time.monotonic()
+        self.trips += 1
+        self.failures = 0
+        self._trip_times.append(now)
+        if self.trip_window is not None:
+            while self._trip_times and now - self._trip_times[0] > self.trip_window:
+                self._trip_times.popleft()
+        recent = len(self._trip_times)
+        if self.max_trips is not None and recent > self.max_trips:
+            self._fatal = ServerUnavailableError(f"服务器持续拒绝请求，熔断在{self._window_text()}内已触发{recent}次，终止运行")
+            logger.error("%s", self._fatal)
+        else:
+            self.state = self.OPEN
+            self._open_until = now + self.cooldown
+            logger.warning("连续请求失败，熔断器打开，暂停所有请求%.0f秒（%s内第%s次）", self.cooldown,
+                           self._window_text(), recent,
+                           extra={'fields': {'event': 'circuit_open', 'cooldown': self.cooldown, 'trips': self.trips,
+                                             'recent_trips': recent}})
+        self._cond.notify_all()
+
+    def _window_text(self):
+        return '本次运行' if self.trip_window is None else f"{self.trip_window:.0f}秒"
+
+    def reset(self):
+        """清除熔断次数超过上限导致的终止状态，恢复正常请求（常驻运行在服务器恢复后继续使用）
+        凭证失效等其他致命错误不会被清除。
+        """
+        with self._cond:
+            if self._fatal is not None and not isinstance(self._fatal, ServerUnavailableError):
+                return
+            self._fatal = None
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self._trip_times.clear()
+            self._cond.notify_all()
+
+    def abort(self, error):
+        """遇到致命错误：之后所有请求立即抛出该错误"""
+        with self._cond:
+            if self._fatal is None:
+                self._fatal = error if isinstance(error, FatalError) else FatalError(str(error))
+                logger.error("遇到致命错误，终止运行：%s", error)
+            self._cond.notify_all()
+
+class RetryPolicy:
+    """统一的请求重试策略
+    可重试的错误按指数退避加随机抖动（full jitter）等待后重试，最多max_attempts次，
+    每次重试消耗全局重试预算；致命错误终止整个运行，永久错误不重试。
+    单个请求最长等待约 (max_attempts - 1) × max_delay 秒；服务器持续不可用时，熔断窗口内最多暂停max_trips次后终止。
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=20.0, budget=None, breaker=None, classify=None):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = float(base_delay)
+        self.max_delay = float(max_delay)
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        # 错误分类函数，默认为接口请求的classify_error；媒体文件等其他服务器可以使用自己的分类
+        self.classify = classify or classify_error
+        self.total_sleep = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, classify=None):
+        """根据config.json中的retry配置创建重试策略"""
+        config = config or {}
+        return cls(
+            max_attempts=config.get('maxAttempts', 4),
+            base_delay=config.get('baseDelay', 1.0),
+            max_delay=config.get('maxDelay', 20.0),
+            budget=RetryBudget(config.get('budgetRatio', 0.2), config.get('minRetries', 20)),
+            breaker=CircuitBreaker(
+                failure_threshold=config.get('breakerThreshold', 8),
+                cooldown=config.get('breakerCooldown', 30.0),
+                max_cooldown=config.get('breakerMaxCooldown', 300.0),
+                max_trips=config.get('breakerMaxTrips', 5),
+                trip_window=config.get('breakerTripWindow', 3600.0),
+            ),
+            classify=classify,
+        )
+
+    def backoff(self, attempt):
+        """第attempt次失败（从1开始）后的等待秒数：在[0, min(max_delay, base_delay × 2^(attempt-1))]中随机"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, func, description=''):
+        """执行func，按错误分类重试
+        Returns:
+            func的返回值
+        Raises:
+            FatalError: 凭证失效等致命错误，或熔断次数超过上限
+            其他异常: 永久错误、重试次数或重试预算用完时抛出最后一次的异常
+        """
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            attempt += 1
+            self.breaker.before_call()
+            try:
+                result = func()
+            except Exception as e:
+                kind = self.classify(e)
+                metrics = get_metrics()
+                metrics.count('request_errors', kind=kind, error=type(e).__name__)
+                if kind == FATAL:
+                    error = e if isinstance(e, FatalError) else FatalError(f"{e}（请检查config.json中的凭证和请求头）")
+                    self.breaker.abort(error)
+                    raise error from e
+                if kind == PERMANENT:
+                    # 服务器正常响应了请求，只是这个请求本身无法成功
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.max_attempts:
+                    raise
+                if not self.budget.try_spend():
+                    logger.warning("重试预算已用完，不再重试：%s", description)
+                    raise
+                delay = self.backoff(attempt)
+                with self._lock:
+                    self.total_sleep += delay
+                metrics.count('retries', kind=kind, error=type(e).__name__)
+                metrics.add_time('retry_backoff', delay)
+                logger.info("请求失败（%s），%.1f秒后进行第%s次重试：%s", e, delay, attempt, description,
+                            extra={'fields': {'event': 'retry', 'attempt': attempt, 'delay': round(delay, 3),
+                                              'error': str(e), 'target': description}})
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return result
@@ -0,0 +1,326 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+logger = get_logger('search_index')
+
+# 中日韩文字按相邻两字切分（bigram），其他连续的字母数字作为一个词（转为小写）
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff'
+TOKEN_RE = re.compile(f'[{_CJK}]+|[^\\W_{_CJK}]+')
+CJK_RE = re.compile(f'^[{_CJK}]+$')
+
+# 各字段在bm25排序中的权重：标题 > 作者 > 正文 > 评论
+FIELDS = ('title', 'author', 'body', 'comments')
+FIELD_WEIGHTS = (5.0, 3.0, 1.0, 0.5)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    topic_id TEXT NOT NULL UNIQUE,
+    title TEXT,
+    author TEXT,
+    create_time TEXT,
+    location TEXT,
+    fingerprint TEXT,
+    stamp TEXT,
+    indexed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_docs_time ON docs (create_time);
+CREATE INDEX IF NOT EXISTS idx_docs_author ON docs (author);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(title, author, body, comments);
+'''
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def tokenize(text):
+    """将文本切分为索引词列表：中日韩文字为bigram（单字时保留单字），其他为小写单词"""
+    tokens = []
+    for run in TOKEN_RE.findall(text or ''):
+        if CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+def _fts_text(text):
+    return ' '.join(tokenize(text))
+
+def build_match_query(query, fields=None):
+    """将用户输入的查询转换为FTS5的MATCH表达式
+    空格分隔的每个词都必须出现（AND），中文词按bigram组成短语，保证原文中连续出现；
+    单个汉字按前缀匹配。fields限定只在这些字段中搜索。
+    Returns:
+        str: MATCH表达式，查询中没有可搜索的词时返回None
+    """
+    terms = []
+    for word in query.split():
+        tokens = tokenize(word)
+        if not tokens:
+            continue
+        if len(tokens) == 1 and CJK_RE.match(tokens[0]) and len(tokens[0]) == 1:
+            terms.append(f'"{tokens[0]}"*')
+        else:
+            terms.append('"' + ' '.join(tokens) + '"')
+    if not terms:
+        return None
+    expr = ' AND '.join(terms)
+    if fields:
+        expr = '{' + ' '.join(fields) + '} : (' + expr + ')'
+    return expr
+
+def fingerprint(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def parse_article_text(text):
+    """从渲染后的文章文本（render_article的格式）中解析出各字段
+    Returns:
+        dict: topic_id、title、author、create_time、body、comments
+    """
+    fields = {'topic_id': '', 'title': '', 'author': '', 'create_time': '', 'body': '', 'comments': ''}
+    header, _, rest = text.partition('\n正文内容：\n')
+    for line in header.splitlines():
+        key, sep, value = line.partition('：')
+        if not sep:
+            continue
+        if key == '主题ID':
+            fields['topic_id'] = value.strip()
+        elif key == '标题':
+            fields['title'] = value
+        elif key == '作者':
+            fields['author'] = value
+        elif key == '发布时间':
+            fields['create_time'] = value.strip()
+    body, _, comments = rest.partition('\n评论列表：\n')
+    fields['body'] = body
+    fields['comments'] = '\n'.join(line.partition('：')[2] for line in comments.splitlines()
+                                   if line.startswith(('评论者：', '评论内容：')))
+    return fields
+
+def topic_fields(topic):
+    """从文章数据中取出需要索引的字段（与render_article取值方式一致）"""
+    talk = topic.get('talk') or {}
+    owner = talk.get('owner', {}) if talk else topic.get('owner', {})
+    comments = topic.get('show_comments') or []
+    return {
+        'topic_id': str(topic.get('topic_id', '')),
+        'title': topic.get('title', '').split('\n')[0],
+        'author': owner.get('name', 'Unknown'),
+        'create_time': topic.get('create_time', ''),
+        'body': '\n'.join(talk.get('text', '').split('\n')[1:]),
+        'comments': '\n'.join(f"{c.get('owner', {}).get('name', '')}\n{c.get('text', '')}" for c in comments),
+    }
+
+class SearchIndex:
+    """基于SQLite FTS5的文章全文索引
+    中文按bigram预先切分后写入FTS5表，按标题、作者、正文、评论四个字段建立索引，
+    查询结果按bm25加权排序，可按发布日期和作者过滤。以topic_id为主键增量更新：
+    文章内容的指纹（sha1）未变化时不重新索引。可在多个线程中使用。
+    """
+
+    def __init__(self, path='search.db'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM docs').fetchone()[0]
+
+    def get_fingerprint(self, topic_id):
+        with self._lock:
+            row = self._conn.execute('SELECT fingerprint, stamp FROM docs WHERE topic_id = ?',
+                                     (str(topic_id),)).fetchone()
+        return row if row else (None, None)
+
+    def add(self, fields, location=None, text_fingerprint=None, stamp=None, commit=True):
+        """索引一篇文章，topic_id已存在且指纹相同时跳过
+        Args:
+            fields: 包含topic_id、title、author、create_time、body、comments的字典
+            location: 文章保存位置（txt文件路径或"归档目录#topic_id"）
+            text_fingerprint: 文章内容的指纹，默认根据fields计算
+            stamp: 文件的大小和修改时间，用于重建索引时跳过未修改的文件
+        Returns:
+            bool: 是否（重新）写入了索引
+        """
+        topic_id = str(fields['topic_id'])
+        if text_fingerprint is None:
+            text_fingerprint = fingerprint('\n'.join(str(fields.get(name, '')) for name in FIELDS))
+        with self._lock:
+            row = self._conn.execute('SELECT id, fingerprint FROM docs WHERE topic_id = ?', (topic_id,)).fetchone()
+            if row and row[1] == text_fingerprint:
+                if stamp or location:
+                    self._conn.execute(
+                        'UPDATE docs SET stamp = COALESCE(?, stamp), location = COALESCE(?, location) WHERE id = ?',
+                        (stamp, location, row[0]))
+                    if commit:
+                        self._conn.commit()
+                return False
+            if row:
+                self._conn.execute('DELETE FROM docs_fts WHERE rowid = ?', (row[0],))
+                self._conn.execute(
+                    'UPDATE docs SET title = ?, author = ?, create_time = ?, location = COALESCE(?, location), '
+                    'fingerprint = ?, stamp = ?, indexed_at = ? WHERE id = ?',
+                    (fields['title'], fields['author'], fields['create_time'], location, text_fingerprint,
+                     stamp, _now(), row[0]))
+                doc_id = row[0]
+            else:
+                cursor = self._conn.execute(
+                    'INSERT INTO docs (topic_id, title, author, create_time, location, fingerprint, stamp, indexed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (topic_id, fields['title'], fields['author'], fields['create_time'], location,
+                     text_fingerprint, stamp, _now()))
+                doc_id = cursor.lastrowid
+            self._conn.execute(
+                'INSERT INTO docs_fts (rowid, title, author, body, comments) VALUES (?, ?, ?, ?, ?)',
+                (doc_id,) + tuple(_fts_text(fields.get(name, '')) for name in FIELDS))
+            if commit:
+                self._conn.commit()
+        return True
+
+    def add_article(self, topic, article_text, location=None):
+        """索引一篇刚保存的文章（extract_and_save_article调用），以渲染后的文本计算指纹"""
+        return self.add(topic_fields(topic), location, fingerprint(article_text))
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def search(self, query, fields=None, author=None, since=None, until=None, limit=20):
+        """全文搜索
+        Args:
+            query: 查询词，空格分隔的多个词需同时出现
+            fields: 限定搜索的字段（title、author、body、comments），默认全部字段
+            author: 只返回该作者的文章
+            since: 只返回该日期（YYYY-MM-DD）及之后发布的文章
+            until: 只返回该日期（YYYY-MM-DD）及之前发布的文章
+        Returns:
+            list: 按相关度排序的结果，每个元素为包含topic_id、title、author、create_time、location、score的字典
+        """
+        expr = build_match_query(query, fields)
+        if expr is None:
+            return []
+        weights = ', '.join(str(w) for w in FIELD_WEIGHTS)
+        sql = (f'SELECT d.topic_id, d.title, d.author, d.create_time, d.location, bm25(docs_fts, {weights}) AS score '
+               'FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid WHERE docs_fts MATCH ?')
+        params = [expr]
+        if author:
+            sql += ' AND d.author = ?'
+            params.append(author)
+        if since:
+            sql += ' AND d.create_time >= ?'
+            params.append(since)
+        if until:
+            sql += ' AND substr(d.create_time, 1, 10) <= ?'
+            params.append(until)
+        sql += ' ORDER BY score LIMIT ?'
+        params.append(int(limit))
+        keys = ('topic_id', 'title', 'author', 'create_time', 'location', 'score')
+        with self._lock:
+            return [dict(zip(keys, row)) for row in self._conn.execute(sql, params)]
+
+    def index_directory(self, articles_dir='articles'):
+        """增量索引文章目录中的txt文件，大小和修改时间未变化的文件不读取
+        Returns:
+            int: 新索引或重新索引的文章数
+        """
+        from archive_index import build_article_index
+        count = 0
+        for topic_id, path in build_article_index(articles_dir).items():
+            stat = os.stat(path)
+            stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+            if self.get_fingerprint(topic_id)[1] == stamp:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            fields = parse_article_text(text)
+            fields['topic_id'] = topic_id
+            if self.add(fields, path, fingerprint(text), stamp, commit=False):
+                count += 1
+        self.commit()
+        logger.info("已索引%s篇新增或修改的文章，索引中共%s篇", count, len(self))
+        return count
+
+    def index_archive(self, archive):
+        """增量索引PackedArchive中的文章
+        Returns:
+            int: 新索引或重新索引的文章数
+        """
+        count = 0
+        for record in archive.iter_records():
+            fields = parse_article_text(record['text'])
+            fields['topic_id'] = record['topic_id']
+            location = f"{archive.archive_dir}#{record['topic_id']}"
+            if self.add(fields, location, fingerprint(record['text']), commit=False):
+                count += 1
+        self.commit()
+        logger.info("已索引%s篇新增或修改的文章，索引中共%s篇", count, len(self))
+        return count
+
+def add_search_arguments(parser):
+    """为命令行解析器添加全文索引参数"""
+    parser.add_argument('--index', metavar='DB', help='保存文章时同时写入该全文索引库（如search.db）')
+
+def setup_search_from_args(args):
+    """根据--index参数设置extract_and_save_article的默认全文索引"""
+    if not getattr(args, 'index', None):
+        return None
+    from main import set_default_search_index
+    index = SearchIndex(args.index)
+    set_default_search_index(index)
+    logger.info("保存的文章将写入全文索引: %s（已有%s篇）", args.index, len(index))
+    return index
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='文章全文索引工具')
+    parser.add_argument('command', choices=['build', 'query', 'stats'],
+                        help='build: 增量索引已保存的文章；query: 搜索；stats: 显示索引统计')
+    parser.add_argument('query', nargs='?', help='query命令的查询词，多个词用空格分隔')
+    parser.add_argument('--db', default='search.db', help='索引库文件')
+    parser.add_argument('--dir', default='articles', help='build命令索引的文章目录')
+    parser.add_argument('--archive', help='build命令索引的压缩归档目录（代替--dir）')
+    parser.add_argument('--field', action='append', choices=FIELDS, help='只在该字段中搜索，可重复指定')
+    parser.add_argument('--author', help='只返回该作者的文章')
+    parser.add_argument('--since', help='只返回该日期之后发布的文章，格式YYYY-MM-DD')
+    parser.add_argument('--until', help='只返回该日期之前发布的文章，格式YYYY-MM-DD')
+    parser.add_argument('--limit', type=int, default=20, help='返回的结果数')
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    index = SearchIndex(args.db)
+    if args.command == 'build':
+        if args.archive:
+            from packed_archive import PackedArchive
+            index.index_archive(PackedArchive(args.archive))
+        else:
+            index.index_directory(args.dir)
+    elif args.command == 'query':
+        if not args.query:
+            parser.error('query命令需要查询词')
+        start = time.perf_counter()
+        results = index.search(args.query, args.field, args.author, args.since, args.until, args.limit)
+        for result in results:
+            print(f"{result['create_time'][:10]}  {result['topic_id']}  {result['title']}  "
+                  f"({result['author']})  {result['location']}")
+        logger.info("找到%s条结果，耗时%.1f毫秒", len(results), (time.perf_counter() - start) * 1000)
+    else:
+        logger.info("索引文章数: %s，索引库大小: %.1f MB", len(index), os.path.getsize(args.db) / 1024 / 1024)
+    index.close()
@@ -1,18 +1,116 @@
 import os
 import json
-from datetime import datetime
 import requests
 import time
-import hashlib
 import re
-from main import load_config, extract_and_save_article
+from main import extract_and_save_article, topic_needs_detail, get_default_archive, needs_topic_preparation, prepare_topics
+from retry_policy import FatalError, classify_error, PERMANENT
+from zsxq_client import ZsxqClient, get_default_client
+from archive_index import build_article_index, find_missing, read_topic_ids
+from log_utils import get_logger, LazyJson, ProgressBar, add_logging_arguments, setup_logging_from_args
 
-def get_single_article(topic_id, download_failed_ids=None, save_failed_ids=None):
+logger = get_logger('single_article')
+
+def fetch_single_article(topic_id, download_failed_ids=None, client=None, use_cache=True):
+    """获取单篇文章的原始数据（不保存）
+    Args:
+        topic_id: 文章ID
+        download_failed_ids: 下载失败的ID列表，每个元素为字典，包含id和reason
+        client: ZsxqClient实例，默认使用进程内共享的客户端
+        use_cache: 为False时不使用缓存的详情响应（已知文章有变化时），请求到的新响应仍会写入缓存
+    Returns:
+        dict: 文章数据，失败时返回None
+    """
+    if download_failed_ids is None:
+        download_failed_ids = []
+    if client is None:
+        client = get_default_client()
+    
+    # 优先使用缓存中未过期的详情响应
+    cached = client.get_cached_topic_info(topic_id) if use_cache else None
+    if cached:
+        topic = cached.get('resp_data', {}).get('topic')
+        if topic:
+            logger.debug("使用缓存的文章 %s", topic_id)
+            return topic
+    
+    # 构建API URL
+    url = client.topic_info_url(topic_id)
+    logger.debug("请求URL: %s", url)
+    
+    logger.debug("发送API请求...")
+    try:
+        # 重试、退避和熔断由客户端的统一重试策略处理
+        resp_data = client.request_json(url)
+        logger.debug("API响应数据：%s", LazyJson(resp_data))
+        
+        # 处理文章数据
+        topic = resp_data.get('resp_data', {}).get('topic', {})
+        if topic:
+            return topic
+        error_msg = "API响应中未找到文章数据"
+        kind = PERMANENT
+    except FatalError:
+        # 凭证失效等致命错误需要终止整个运行，交给调用方处理
+        raise
+    except requests.exceptions.RequestException as e:
+        error_msg = f"API请求失败: {str(e)}"
+        kind = classify_error(e)
+    except json.JSONDecodeError as e:
+        error_msg = f"JSON解析失败: {str(e)}"
+        kind = classify_error(e)
+    except Exception as e:
+        error_msg = f"未预期的错误: {str(e)}"
+        kind = classify_error(e)
+    download_failed_ids.append({"id": topic_id, "reason": error_msg, "kind": kind})
+    logger.warning("文章 %s 下载失败：%s", topic_id, error_msg,
+                   extra={'fields': {'event': 'download_failed', 'topic_id': topic_id, 'reason': error_msg,
+                                     'kind': kind}})
+    return None
+
+def save_single_article(topic_id, topic, download_failed_ids=None, save_failed_ids=None,
+                        output_dir='articles', archive=None, client=None):
+    """将已获取的文章数据保存到articles目录
+    Args:
+        topic_id: 文章ID
+        topic: fetch_single_article返回的文章数据
+        download_failed_ids: 下载失败的ID列表（保存时出现未预期的异常也记录在此）
+        save_failed_ids: 保存失败的ID列表
+        output_dir: txt文件的保存目录
+        archive: 可选的PackedArchive，默认使用set_default_archive设置的归档
+        client: 补全文章使用的ZsxqClient实例，默认使用进程内共享的客户端
+    Returns:
+        str|bool: 保存成功时返回文件路径，失败时返回False
+    """
+    if download_failed_ids is None:
+        download_failed_ids = []
+    if save_failed_ids is None:
+        save_failed_ids = []
+    try:
+        # 使用现有的extract_and_save_article函数处理文章
+        file_path = extract_and_save_article(topic, output_dir, archive, client)
+        if file_path:
+            logger.info("已成功保存文章：%s", file_path,
+                        extra={'fields': {'event': 'article_saved', 'topic_id': topic_id, 'path': file_path}})
+            return file_path
+        error_msg = "文章内容提取或保存失败"
+        logger.error("%s", error_msg)
+        save_failed_ids.append({"id": topic_id, "reason": error_msg})
+    except FatalError:
+        raise
+    except Exception as e:
+        error_msg = f"未预期的错误: {str(e)}"
+        logger.error("%s", error_msg)
+        download_failed_ids.append({"id": topic_id, "reason": error_msg})
+    return False
+
+def get_single_article(topic_id, download_failed_ids=None, save_failed_ids=None, client=None):
     """获取单篇文章的信息
     Args:
         topic_id: 文章ID
         download_failed_ids: 下载失败的ID列表，每个元素为字典，包含id和reason
         save_failed_ids: 保存失败的ID列表，每个元素为字典，包含id和reason
+        client: ZsxqClient实例，默认使用进程内共享的客户端
     Returns:
         bool: 是否成功处理文章
     """
@@ -21,238 +119,289 @@ def get_single_article(topic_id, download_failed_ids=None, save_failed_ids=None)
         download_failed_ids = []
     if save_failed_ids is None:
         save_failed_ids = []
-    # 加载配置文件
-    print("开始加载配置文件...")
-    config = load_config()
-    print("配置文件加载成功")
-    
-    # 构建API URL
-    url = f"https://api.zsxq.com/v2/topics/{topic_id}/info"
-    print(f"\n请求URL: {url}")
-    
-    # 设置请求头
-    headers = config['headers'].copy()
-    headers['Cookie'] = f"zsxq_access_token={config['auth']['zsxq_access_token']}; zsxqsessionid={config['auth']['zsxqsessionid']}"
-    headers['Referer'] = config['headers'].get('Referer', 'https://wx.zsxq.com/')
-    headers['Referrer-Policy'] = config['headers'].get('Referrer-Policy', 'strict-origin-when-cross-origin')
-    
-    # 更新时间戳和签名
-    timestamp = str(int(time.time() * 1000))
-    headers['x-timestamp'] = timestamp
-    
-    # 生成签名
-    string_to_sign = f"{config['auth']['zsxq_access_token']}_{timestamp}"
-    signature = hashlib.sha1(string_to_sign.encode('utf-8')).hexdigest()
-    headers['x-signature'] = signature
-    
-    print("\n发送API请求...")
-    retry_count = 0
-    max_retries = 3
-    
-    while retry_count < max_retries:
-        try:
-            # 发送GET请求
-            response = requests.get(url, headers=headers, verify=False)
-            response.encoding = 'utf-8'
-            response.raise_for_status()
-            
-            print(f"API响应状态码: {response.status_code}")
-            resp_data = response.json()
-            # print("\nAPI响应数据：")
-            # print(json.dumps(resp_data, ensure_ascii=False, indent=2))
-            
-            # 处理文章数据
-            topic = resp_data.get('resp_data', {}).get('topic', {})
-            if not topic:
-                error_msg = "API响应中未找到文章数据"
-                print(f"错误: {error_msg}")
-                download_failed_ids.append({"id": topic_id, "reason": error_msg})
-                return False
-            
-            # 使用现有的extract_and_save_article函数处理文章
-            file_path = extract_and_save_article(topic)
-            if file_path:
-                print(f"已成功保存文章：{file_path}")
-                return True
-            else:
-                error_msg = "文章内容提取或保存失败"
-                print(error_msg)
-                save_failed_ids.append({"id": topic_id, "reason": error_msg})
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            error_msg = f"API请求失败: {str(e)}"
-            print(error_msg)
-            retry_count += 1
-            if retry_count < max_retries:
-                print(f"第{retry_count}次重试...")
-                time.sleep(2)
-                continue
-            download_failed_ids.append({"id": topic_id, "reason": error_msg})
-        except json.JSONDecodeError as e:
-            error_msg = f"JSON解析失败: {str(e)}"
-            print(error_msg)
-            print(f"响应内容：{response.text}")
-            retry_count += 1
-            if retry_count < max_retries:
-                print(f"第{retry_count}次重试...")
-                time.sleep(2)
-                continue
-            download_failed_ids.append({"id": topic_id, "reason": error_msg})
-        except UnicodeEncodeError as e:
-            error_msg = f"编码错误: {str(e)}，请检查Cookie等请求头信息是否包含非法字符"
-            print(error_msg)
-            download_failed_ids.append({"id": topic_id, "reason": error_msg})
-        except Exception as e:
-            error_msg = f"未预期的错误: {str(e)}"
-            print(error_msg)
-            download_failed_ids.append({"id": topic_id, "reason": error_msg})
+    topic = fetch_single_article(topic_id, download_failed_ids, client)
+    if topic is None:
         return False
+    return bool(save_single_article(topic_id, topic, download_failed_ids, save_failed_ids, client=client))
 
-def save_failed_article(article_id, title, reason):
-    """保存未成功下载的文章信息到文件"""
-    failed_info = f"\n文章ID: {article_id}\n标题: {title}\n失败原因: {reason}\n"
-    with open('failed_down.txt', 'a', encoding='utf-8') as f:
-        f.write(failed_info)
-
-def retry_failed_articles(failed_ids):
+def retry_failed_articles(failed_ids, client=None, journal=None):
     """重试下载失败的文章
+    每个请求在客户端内部已经按统一的重试策略重试过，这里只对可能恢复的失败（可重试的网络错误、
+    保存失败、文件缺失）再处理一遍，永久错误（如文章不存在）直接记为最终失败，不再重复请求。
     Args:
-        failed_ids: 失败的文章ID列表，每个元素为字典，包含id和reason
+        failed_ids: 失败的文章ID列表，每个元素为字典，包含id、reason，以及可选的kind（错误分类）
+        client: ZsxqClient实例，默认使用进程内共享的客户端
+        journal: 可选的RunJournal，重试成功的文章立即记为已保存
     Returns:
         list: 最终失败的文章ID列表
     """
     if not failed_ids:
         return []
 
-    print(f"\n开始重试下载失败的文章...")
+    logger.info("开始重试下载失败的文章...")
     final_failed_ids = []
-    max_retries = 3
+    seen = set()
 
     for failed_item in failed_ids:
         article_id = failed_item['id']
-        retry_count = 0
-        success = False
-
-        while retry_count < max_retries and not success:
-            try:
-                print(f"第{retry_count + 1}次尝试下载文章 {article_id}...")
-                if get_single_article(article_id):
-                    print(f"文章 {article_id} 重试成功")
-                    success = True
-                    break
-                else:
-                    print(f"文章 {article_id} 第{retry_count + 1}次重试失败")
-            except Exception as e:
-                print(f"文章 {article_id} 第{retry_count + 1}次重试失败: {str(e)}")
-            
-            retry_count += 1
-            if retry_count < max_retries:
-                print(f"等待5秒后进行第{retry_count + 1}次重试...")
-                time.sleep(5)
-        
-        if not success:
+        if article_id in seen:
+            continue
+        seen.add(article_id)
+        if failed_item.get('kind') == PERMANENT:
+            logger.info("文章 %s 的失败原因无法通过重试解决，跳过：%s", article_id, failed_item['reason'])
             final_failed_ids.append(failed_item)
-            print(f"文章 {article_id} 已达到最大重试次数，放弃重试")
+            continue
+        retry_failed = []
+        if get_single_article(article_id, retry_failed, retry_failed, client):
+            logger.info("文章 %s 重试成功", article_id)
+            if journal is not None:
+                journal.saved(article_id)
+        else:
+            final_failed_ids.append(dict(retry_failed[-1], stage=failed_item.get('stage')) if retry_failed else failed_item)
+            logger.warning("文章 %s 重试失败，放弃重试", article_id)
     
     return final_failed_ids
 
-def process_all_articles():
+def save_final_failures(final_failed_ids, journal=None):
+    """将重试后仍失败的文章ID和失败原因记入处理日志（python journal.py report查看）
+    Args:
+        final_failed_ids: 最终失败的文章列表
+        journal: RunJournal实例，默认追加到logs/journal.jsonl
+    """
+    if not final_failed_ids:
+        logger.info("所有失败的文章重试后均下载成功！")
+        return
+    from journal import RunJournal
+    own_journal = journal is None
+    if own_journal:
+        journal = RunJournal()
+    try:
+        for failed_item in final_failed_ids:
+            journal.failed(failed_item, failed_item.get('stage') or 'download', final=True)
+    finally:
+        if own_journal:
+            journal.close()
+    logger.warning("最终失败的文章已记入处理日志 %s，共 %s 篇（python journal.py report查看）",
+                   journal.path, len(final_failed_ids))
+    logger.warning("最终失败的文章ID：%s", [item['id'] for item in final_failed_ids])
+
+def save_list_topics(topics, download_failed_ids=None, save_failed_ids=None, progress=None, client=None,
+                     batch_size=20, on_saved=None):
+    """直接保存列表页中数据完整的文章，逐个返回需要请求/info接口补全的文章ID
+    启用了--full-comments或--media时，每batch_size篇文章先并发获取完整评论、下载媒体文件再依次保存。
+    Args:
+        topics: 列表页文章数据的可迭代对象
+        download_failed_ids: 下载失败的ID列表
+        save_failed_ids: 保存失败的ID列表
+        progress: 可选的ProgressBar，安静模式下显示进度
+        client: 补全文章使用的ZsxqClient实例
+        batch_size: 并发补全文章的批大小
+        on_saved: 可选回调函数on_saved(topic_id, file_path)，每篇文章保存成功后调用
+    """
+    preparing = needs_topic_preparation()
+    batch = []
+
+    def save_batch():
+        if preparing:
+            prepare_topics(batch, client)
+        for topic in batch:
+            file_path = save_single_article(str(topic.get('topic_id', '')), topic, download_failed_ids,
+                                            save_failed_ids, client=client)
+            if progress is not None:
+                progress.update(failed=not file_path)
+            if file_path and on_saved is not None:
+                on_saved(str(topic.get('topic_id', '')), file_path)
+        batch.clear()
+
+    for topic in topics:
+        topic_id = str(topic.get('topic_id', ''))
+        if topic_needs_detail(topic):
+            if topic_id:
+                logger.debug("文章 %s 的列表数据不完整，将请求详情接口", topic_id)
+                yield topic_id
+            continue
+        batch.append(topic)
+        if not preparing or len(batch) >= batch_size:
+            save_batch()
+    save_batch()
+
+def process_list_articles(scope='all', endpoint='topics', group_id=None, workers=4, list_workers=0):
+    """根据列表页数据批量生成文章，只对列表数据不完整的文章请求/info接口
+    list_workers大于0时按时间窗口并发翻页
+    """
+    from bulk_download import download_articles
+    from crawler import iter_topics, iter_topics_partitioned
+    
+    client = ZsxqClient(pool_size=max(10, workers + list_workers * 2 + 1))
+    download_failed_ids = []
+    save_failed_ids = []
+    detail_ids = []
+    
+    def track_detail_ids(topic_ids):
+        for topic_id in topic_ids:
+            detail_ids.append(topic_id)
+            yield topic_id
+    
+    start_time = time.time()
+    progress = ProgressBar(desc='列表生成')
+    try:
+        if list_workers > 0:
+            topics = iter_topics_partitioned(client, list_workers, group_id=group_id, scope=scope, endpoint=endpoint)
+        else:
+            topics = iter_topics(client, group_id=group_id, scope=scope, endpoint=endpoint)
+        pending = track_detail_ids(save_list_topics(topics, download_failed_ids, save_failed_ids, progress, client))
+        download_articles(pending, workers, download_failed_ids, save_failed_ids, client=client)
+        progress.close()
+    except FatalError as e:
+        logger.error("运行已终止：%s", e)
+        if download_failed_ids or save_failed_ids:
+            save_final_failures(download_failed_ids + save_failed_ids)
+        return
+    except Exception as e:
+        logger.error("获取文章列表时发生错误：%s", e)
+    
+    failed_ids = download_failed_ids + save_failed_ids
+    if failed_ids:
+        logger.info("开始重试失败的文章，共%s篇...", len(failed_ids))
+        save_final_failures(retry_failed_articles(failed_ids, client))
+    logger.info("处理完成！请求详情接口%s篇，下载失败%s篇，保存失败%s篇，耗时%.1f秒",
+                len(detail_ids), len(download_failed_ids), len(save_failed_ids), time.time() - start_time)
+    logger.info("%s", progress.summary())
+
+def process_all_articles(workers=1, journal=None, retry_permanent=False):
     """批量处理文章列表
-    处理所有文章并记录失败的情况
+    每篇文章的处理结果立即写入处理日志（RunJournal）；重新运行时跳过日志中已有结果的文章，
+    从中断处继续，最后只重试日志中记录为失败的文章。
+    Args:
+        workers: 并发下载的线程数，为1时按顺序逐篇下载
+        journal: RunJournal实例，默认打开logs/journal.jsonl
+        retry_permanent: 重试阶段是否也重新请求永久错误（如文章不存在）的文章
     """
+    from journal import RunJournal, STAGE_DOWNLOAD, STAGE_SAVE, STAGE_MISSING
+    own_journal = journal is None
+    if own_journal:
+        journal = RunJournal()
     try:
         # 读取文章列表文件
-        with open('all_list.txt', 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        total_articles = len(lines)
-        processed_count = 0
+        all_topic_ids = read_topic_ids('all_list.txt')
+        total_articles = len(all_topic_ids)
+        pending_ids = journal.pending(all_topic_ids)
         success_count = 0
         download_failed_ids = []
         save_failed_ids = []
         
-        print(f"\n开始批量处理文章，共{total_articles}篇...\n")
-        
-        # 记录所有文章ID
-        all_topic_ids = [line.split()[0].strip() for line in lines]
+        if len(pending_ids) < total_articles:
+            logger.info("根据处理日志 %s 继续：列表共%s篇，已处理%s篇，剩余%s篇", journal.path, total_articles,
+                        total_articles - len(pending_ids), len(pending_ids))
+        else:
+            logger.info("开始批量处理文章，共%s篇...", total_articles)
+        start_time = time.time()
         
-        for i, line in enumerate(lines, 1):
-            # 提取每行开头的数字作为topic_id
-            topic_id = line.split()[0].strip()
-            
-            print(f"\n[{i}/{total_articles}] 正在处理文章 {topic_id}...")
-            if get_single_article(topic_id, download_failed_ids, save_failed_ids):
-                success_count += 1
-            processed_count += 1
-            
-            # 每处理30篇文章暂停15秒
-            if processed_count % 30 == 0 and i < total_articles:
-                print(f"\n已处理{processed_count}篇文章，暂停15秒...")
-                time.sleep(15)
+        # 所有请求共用一个客户端（配置只加载一次，连接池大小不小于并发数）
+        client = ZsxqClient(pool_size=max(10, workers))
         
-        # 检查文件保存完整性
-        print("\n开始检查文件保存完整性...")
-        articles_dir = 'articles'
-        if os.path.exists(articles_dir):
-            saved_files = os.listdir(articles_dir)
-            missing_articles = []
-            missing_details = []
-            
-            for topic_id in all_topic_ids:
-                # 检查是否存在包含该topic_id的文件
-                found = False
-                for filename in saved_files:
-                    if topic_id in filename:
-                        found = True
-                        break
-                if not found:
-                    # 检查是否在已知的失败列表中
-                    is_known_failed = any(item['id'] == topic_id for item in download_failed_ids)
-                    if not is_known_failed:
-                        missing_articles.append(topic_id)
-                        # 尝试获取文章详细信息
-                        try:
-                            article_info = next((line for line in lines if line.split()[0].strip() == topic_id), None)
-                            if article_info:
-                                missing_details.append({"id": topic_id, "reason": "文件未能成功保存到articles目录"})
-                        except Exception as e:
-                            missing_details.append({"id": topic_id, "reason": f"文件未能成功保存到articles目录，获取详细信息时出错: {str(e)}"})
+        def on_saved(topic_id, file_path):
+            journal.saved(topic_id, file_path)
         
-        # 合并所有失败记录
-        all_failed_ids = []
-        all_failed_ids.extend(download_failed_ids)
-        all_failed_ids.extend(save_failed_ids)
-        if 'missing_details' in locals():
-            all_failed_ids.extend(missing_details)
+        def on_failed(item, stage):
+            journal.failed(item, stage)
         
-        # 对失败的文章进行重试
-        if all_failed_ids:
-            print(f"\n开始重试失败的文章，共{len(all_failed_ids)}篇...")
-            final_failed_ids = retry_failed_articles(all_failed_ids)
-            
-            # 保存最终失败的文章ID和失败原因
-            if final_failed_ids:
-                current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                with open('failed_down.txt', 'w', encoding='utf-8') as f:
-                    f.write(f"=== 保存时间：{current_time} ===\n\n")
-                    f.write("=== 最终失败的文章列表 ===\n\n")
-                    for failed_item in final_failed_ids:
-                        f.write(f"文章ID: {failed_item['id']}\n失败原因: {failed_item['reason']}\n\n")
-                print(f"\n最终失败的文章信息已保存到 failed_down.txt，共 {len(final_failed_ids)} 篇")
-                print("最终失败的文章ID：", [item['id'] for item in final_failed_ids])
+        try:
+            if workers > 1:
+                from bulk_download import download_articles
+                logger.info("使用并发下载模式，线程数：%s", workers)
+                success_count = download_articles(pending_ids, workers, download_failed_ids, save_failed_ids,
+                                                  client=client, on_saved=on_saved, on_failed=on_failed)
             else:
-                print("\n所有失败的文章重试后均下载成功！")
+                progress = ProgressBar(len(pending_ids), '下载文章')
+                for i, topic_id in enumerate(pending_ids, 1):
+                    logger.info("[%s/%s] 正在处理文章 %s...", i, len(pending_ids), topic_id)
+                    # 请求速率由客户端的限流器控制，无需固定暂停
+                    download_failed = []
+                    save_failed = []
+                    topic = fetch_single_article(topic_id, download_failed, client)
+                    file_path = None
+                    if topic is not None:
+                        file_path = save_single_article(topic_id, topic, download_failed, save_failed,
+                                                        client=client)
+                    if file_path:
+                        on_saved(topic_id, file_path)
+                        success_count += 1
+                    for stage, items in ((STAGE_DOWNLOAD, download_failed), (STAGE_SAVE, save_failed)):
+                        for item in items:
+                            on_failed(item, stage)
+                    download_failed_ids.extend(download_failed)
+                    save_failed_ids.extend(save_failed)
+                    progress.update(failed=not file_path)
+                progress.close()
+        except FatalError as e:
+            # 凭证失效或服务器持续拒绝请求：已处理的结果都在处理日志中，修复后重新运行会从中断处继续
+            logger.error("运行已终止：%s", e)
+            logger.error("已处理的结果已保存在 %s，修复问题后重新运行即可从中断处继续", journal.path)
+            return
         
-        print(f"\n批量处理完成！总共处理{total_articles}篇文章，成功{success_count}篇，")
-        print(f"下载失败{len(download_failed_ids)}篇，保存失败{len(save_failed_ids)}篇")
-        if 'missing_articles' in locals() and missing_articles:
-            print(f"未成功保存{len(missing_articles)}篇")
+        # 检查文件保存完整性：日志中记录为已保存、但文件已不存在的文章记为缺失，在重试阶段重新下载
+        logger.info("开始检查文件保存完整性...")
+        articles_dir = 'articles'
+        archive = get_default_archive()
+        missing_articles = []
+        if archive is not None or os.path.exists(articles_dir):
+            # 扫描一次目录建立topic_id索引（使用归档时直接使用归档索引），按ID精确匹配
+            article_index = archive.index if archive is not None else build_article_index(articles_dir)
+            saved_ids = [topic_id for topic_id in all_topic_ids if journal.status(topic_id) == 'saved']
+            missing_articles = find_missing(saved_ids, article_index)
+            for topic_id in missing_articles:
+                journal.failed({"id": topic_id, "reason": "文件未能成功保存到articles目录"}, STAGE_MISSING)
+        
+        # 只重试处理日志中记录为失败的文章（包括之前运行中失败的文章）
+        failed_items = journal.failures(include_permanent=retry_permanent)
+        if failed_items:
+            logger.info("开始重试失败的文章，共%s篇...", len(failed_items))
+            final_failed_ids = retry_failed_articles(failed_items, client, journal)
+            save_final_failures(final_failed_ids, journal)
+        
+        elapsed = time.time() - start_time
+        logger.info("批量处理完成！本次处理%s篇文章，成功%s篇，耗时%.1f秒，%.1f篇/秒",
+                    len(pending_ids), success_count, elapsed, success_count / elapsed if elapsed > 0 else 0.0)
+        logger.info("下载失败%s篇，保存失败%s篇", len(download_failed_ids), len(save_failed_ids))
+        if missing_articles:
+            logger.info("未成功保存%s篇", len(missing_articles))
+        saved, failed = journal.counts()
+        logger.info("处理日志：已保存%s篇，失败%s篇", saved, failed)
         
     except FileNotFoundError:
-        print("错误：未找到all_list.txt文件")
+        logger.error("错误：未找到all_list.txt文件")
     except Exception as e:
-        print(f"批量处理过程中发生错误：{str(e)}")
+        logger.error("批量处理过程中发生错误：%s", e)
+    finally:
+        if own_journal:
+            journal.close()
 
 if __name__ == '__main__':
-    process_all_articles()
\ No newline at end of file
+    import argparse
+    from outputs import add_output_arguments, setup_outputs_from_args
+    from journal import add_journal_arguments, open_journal_from_args
+    parser = argparse.ArgumentParser(description='批量下载all_list.txt中的文章')
+    parser.add_argument('--workers', type=int, default=1, help='并发下载的线程数，默认1（顺序下载）')
+    parser.add_argument('--from-list', action='store_true',
+                        help='自动翻页，直接用列表页数据生成文章，只对数据不完整的文章请求详情接口')
+    parser.add_argument('--scope', default='all', help='--from-list时列表的scope参数，如all、digests')
+    parser.add_argument('--group', help='星球ID，默认使用config.json中的groupId')
+    parser.add_argument('--list-workers', type=int, default=0,
+                        help='--from-list时按时间窗口并发翻页的线程数，默认0（顺序翻页）')
+    add_logging_arguments(parser)
+    add_output_arguments(parser)
+    add_journal_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    outputs = setup_outputs_from_args(args, max(1, args.workers))
+    if args.from_list:
+        process_list_articles(args.scope, group_id=args.group, workers=max(1, args.workers),
+                              list_workers=args.list_workers)
+    else:
+        journal = open_journal_from_args(args)
+        try:
+            process_all_articles(args.workers, journal, args.retry_permanent)
+        finally:
+            journal.close()
+    outputs.close()
@@ -0,0 +1,146 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+# 文章下载状态
+STATUS_PENDING = 'pending'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS topics (
+    topic_id TEXT PRIMARY KEY,
+    group_id TEXT,
+    create_time TEXT,
+    title TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    path TEXT,
+    reason TEXT,
+    fingerprint TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_topics_status ON topics (group_id, status);
+CREATE TABLE IF NOT EXISTS high_water (
+    group_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    create_time TEXT NOT NULL,
+    updated_at TEXT,
+    PRIMARY KEY (group_id, scope)
+);
+'''
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+class StateStore:
+    """基于SQLite的本地同步状态库
+    记录每篇文章的create_time、下载状态、保存路径和保存时列表数据的指纹，以及每个星球/scope已同步到的最新时间（高水位）。
+    同一篇文章出现在多个scope中时只保存一条记录，只下载一次。可在多个线程中使用。
+    """
+
+    def __init__(self, path='state.db'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def _migrate(self):
+        """为旧版本创建的状态库补充新增的列"""
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(topics)')}
+        if 'fingerprint' not in columns:
+            self._conn.execute('ALTER TABLE topics ADD COLUMN fingerprint TEXT')
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def add_topic(self, topic_id, group_id=None, create_time=None, title=None, fingerprint=None):
+        """记录一篇文章，已存在时不修改
+        Returns:
+            bool: 是否为新文章
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO topics (topic_id, group_id, create_time, title, status, fingerprint, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(topic_id), str(group_id) if group_id else None, create_time, title, STATUS_PENDING,
+                 fingerprint, _now()))
+            self._conn.commit()
+            return cursor.rowcount > 0
+
+    def get_topic(self, topic_id):
+        """返回文章记录（字典），不存在时返回None"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'SELECT topic_id, group_id, create_time, title, status, path, reason FROM topics WHERE topic_id = ?',
+                (str(topic_id),))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ('topic_id', 'group_id', 'create_time', 'title', 'status', 'path', 'reason')
+        return dict(zip(keys, row))
+
+    def mark_done(self, topic_id, path, fingerprint=None):
+        """标记为已下载，fingerprint为保存的这一版列表数据的指纹（为None时保留原值）"""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE topics SET status = ?, path = ?, reason = NULL, fingerprint = COALESCE(?, fingerprint), '
+                'updated_at = ? WHERE topic_id = ?',
+                (STATUS_DONE, path, fingerprint, _now(), str(topic_id)))
+            self._conn.commit()
+
+    def mark_failed(self, topic_id, reason):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE topics SET status = ?, reason = ?, updated_at = ? WHERE topic_id = ?',
+                (STATUS_FAILED, reason, _now(), str(topic_id)))
+            self._conn.commit()
+
+    def topic_states(self, group_id=None):
+        """返回{topic_id: (status, fingerprint)}，用于刷新时一次性比较所有文章"""
+        sql = 'SELECT topic_id, status, fingerprint FROM topics'
+        params = []
+        if group_id:
+            sql += ' WHERE group_id = ?'
+            params.append(str(group_id))
+        with self._lock:
+            return {row[0]: (row[1], row[2]) for row in self._conn.execute(sql, params)}
+
+    def set_fingerprints(self, fingerprints):
+        """批量更新文章的指纹，fingerprints为{topic_id: fingerprint}"""
+        with self._lock:
+            self._conn.executemany('UPDATE topics SET fingerprint = ? WHERE topic_id = ?',
+                                   [(value, str(topic_id)) for topic_id, value in fingerprints.items()])
+            self._conn.commit()
+
+    def pending_topic_ids(self, group_id=None):
+        """返回尚未下载成功（待下载或失败）的文章ID列表，按发布时间从新到旧排列"""
+        sql = 'SELECT topic_id FROM topics WHERE status != ?'
+        params = [STATUS_DONE]
+        if group_id:
+            sql += ' AND group_id = ?'
+            params.append(str(group_id))
+        sql += ' ORDER BY create_time DESC'
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def get_high_water(self, group_id, scope):
+        """返回该星球/scope已同步到的最新create_time，未同步过时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT create_time FROM high_water WHERE group_id = ? AND scope = ?',
+                (str(group_id), scope)).fetchone()
+        return row[0] if row else None
+
+    def set_high_water(self, group_id, scope, create_time):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO high_water (group_id, scope, create_time, updated_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (group_id, scope) DO UPDATE SET create_time = excluded.create_time, '
+                'updated_at = excluded.updated_at',
+                (str(group_id), scope, create_time, _now()))
+            self._conn.commit()
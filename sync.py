@@ -0,0 +1,201 @@
+import json
+import time
+import hashlib
+from zsxq_client import ZsxqClient
+from crawler import iter_topics, iter_topics_partitioned
+from state_store import StateStore, STATUS_DONE
+from retry_policy import FatalError
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+logger = get_logger('sync')
+
+# 计入指纹的列表字段：评论数、点赞数、打赏数、精华和置顶状态；阅读数等随浏览变化的字段不计入
+FINGERPRINT_FIELDS = ('comments_count', 'likes_count', 'rewards_count', 'digested', 'sticky')
+# 正文所在的字段（普通主题、问答、作业）
+_TEXT_FIELDS = ('talk', 'question', 'answer', 'task', 'solution')
+
+def topic_fingerprint(topic):
+    """根据列表数据计算文章指纹，评论数、点赞数、精华状态、标题或正文任何一项变化时指纹不同
+    总是用列表数据计算（长文章在列表中只有摘要，与详情数据的指纹不同），以便与下次刷新时的列表比较。
+    """
+    values = [topic.get(name) for name in FINGERPRINT_FIELDS]
+    values.append(topic.get('title') or '')
+    for name in _TEXT_FIELDS:
+        part = topic.get(name)
+        if isinstance(part, dict):
+            values.append(part.get('text') or '')
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def _topic_title(topic):
+    return topic.get('title', '').split('\n')[0] if topic.get('title') else ''
+
+def collect_new_topics(client, store, group_id, scope, quiet=False):
+    """翻页收集某个scope中的新文章，遇到不晚于高水位的文章后停止翻页
+    Args:
+        quiet: 为True时不输出开始同步和新文章数的日志（watch.py频繁轮询时使用）
+    Returns:
+        int: 新记录的文章数
+    """
+    log = logger.debug if quiet else logger.info
+    high_water = store.get_high_water(group_id, scope)
+    if high_water:
+        log("[%s] 上次同步到 %s，只获取更新的文章", scope, high_water)
+    else:
+        logger.info("[%s] 首次同步，获取全部文章", scope)
+
+    def reached_high_water(topics):
+        return bool(high_water) and bool(topics) and topics[-1].get('create_time', '') <= high_water
+
+    newest = high_water
+    new_count = 0
+    for topic in iter_topics(client, group_id=group_id, scope=scope, stop=reached_high_water):
+        create_time = topic.get('create_time', '')
+        if high_water and create_time <= high_water:
+            continue
+        if not newest or create_time > newest:
+            newest = create_time
+        if store.add_topic(topic.get('topic_id'), group_id, create_time, _topic_title(topic),
+                           topic_fingerprint(topic)):
+            new_count += 1
+
+    # 只有完整翻页成功后才推进高水位，中途失败时下次会重新获取
+    if newest:
+        store.set_high_water(group_id, scope, newest)
+    log("[%s] 新文章 %s 篇", scope, new_count)
+    return new_count
+
+def sync(scopes=('all',), group_id=None, workers=4, state_file='state.db'):
+    """增量同步：只获取高水位之后的新文章，并下载所有尚未成功下载的文章"""
+    from bulk_download import download_articles
+
+    client = ZsxqClient(pool_size=max(10, workers))
+    group_id = group_id or client.group_id
+    store = StateStore(state_file)
+    start_time = time.time()
+    try:
+        for scope in scopes:
+            try:
+                collect_new_topics(client, store, group_id, scope)
+            except FatalError:
+                raise
+            except Exception as e:
+                logger.error("[%s] 获取文章列表失败：%s", scope, e)
+
+        pending_ids = store.pending_topic_ids(group_id)
+        logger.info("待下载文章 %s 篇", len(pending_ids))
+        if not pending_ids:
+            return
+
+        download_failed_ids = []
+        save_failed_ids = []
+        success_count = download_articles(pending_ids, workers, download_failed_ids, save_failed_ids,
+                                          client=client, on_saved=store.mark_done)
+        for failed_item in download_failed_ids + save_failed_ids:
+            store.mark_failed(failed_item['id'], failed_item['reason'])
+
+        logger.info("同步完成：成功%s篇，失败%s篇，耗时%.1f秒", success_count,
+                    len(download_failed_ids) + len(save_failed_ids), time.time() - start_time)
+    except FatalError as e:
+        logger.error("运行已终止：%s；尚未下载的文章会在下次同步时继续", e)
+    finally:
+        store.close()
+
+def refresh(scopes=('all',), group_id=None, workers=4, state_file='state.db', list_workers=0):
+    """刷新已保存的文章：完整翻页扫描列表，只重新保存列表数据指纹发生变化的文章
+    列表数据完整的文章直接用列表数据重新生成，其余文章请求详情接口（不使用缓存的旧详情响应）；
+    列表中的新文章和之前失败的文章同时下载。
+    请求量约为列表页数加上变化的文章数。旧版本状态库中已下载但没有指纹的文章只记录当前指纹，不重新下载。
+    """
+    from bulk_download import download_articles
+    from single_article import save_list_topics
+
+    client = ZsxqClient(pool_size=max(10, workers + list_workers * 2 + 1))
+    group_id = group_id or client.group_id
+    store = StateStore(state_file)
+    states = store.topic_states(group_id)
+    # 需要重新保存的文章及其新指纹，保存成功后写入状态库
+    changed = {}
+    baseline = {}
+    counts = {'scanned': 0, 'new': 0}
+    start_time = time.time()
+
+    def changed_topics():
+        seen = set()
+        for scope in scopes:
+            if list_workers > 0:
+                topics = iter_topics_partitioned(client, list_workers, group_id=group_id, scope=scope)
+            else:
+                topics = iter_topics(client, group_id=group_id, scope=scope)
+            newest = None
+            for topic in topics:
+                topic_id = str(topic.get('topic_id', ''))
+                create_time = topic.get('create_time', '')
+                if not newest or create_time > newest:
+                    newest = create_time
+                if not topic_id or topic_id in seen:
+                    continue
+                seen.add(topic_id)
+                counts['scanned'] += 1
+                value = topic_fingerprint(topic)
+                state = states.get(topic_id)
+                if state is None:
+                    store.add_topic(topic_id, group_id, create_time, _topic_title(topic))
+                    counts['new'] += 1
+                elif state[0] == STATUS_DONE:
+                    if state[1] == value:
+                        continue
+                    if state[1] is None:
+                        baseline[topic_id] = value
+                        continue
+                changed[topic_id] = value
+                yield topic
+            if newest:
+                store.set_high_water(group_id, scope, newest)
+
+    def on_saved(topic_id, path):
+        store.mark_done(topic_id, path, changed.get(topic_id))
+
+    download_failed_ids = []
+    save_failed_ids = []
+    try:
+        detail_ids = save_list_topics(changed_topics(), download_failed_ids, save_failed_ids, client=client,
+                                      on_saved=on_saved)
+        # 这些文章的列表数据已经变化，缓存的详情响应是修改前的内容，必须重新请求
+        download_articles(detail_ids, workers, download_failed_ids, save_failed_ids, client=client,
+                          on_saved=on_saved, use_cache=False)
+        for failed_item in download_failed_ids + save_failed_ids:
+            store.mark_failed(failed_item['id'], failed_item['reason'])
+        if baseline:
+            store.set_fingerprints(baseline)
+            logger.info("首次记录%s篇已下载文章的指纹（视为最新，未重新下载）", len(baseline))
+        logger.info("刷新完成：扫描%s篇，重新保存%s篇（其中新文章%s篇），失败%s篇，耗时%.1f秒",
+                    counts['scanned'], len(changed), counts['new'],
+                    len(download_failed_ids) + len(save_failed_ids), time.time() - start_time)
+    except FatalError as e:
+        logger.error("运行已终止：%s；未完成的文章会在下次刷新时继续", e)
+    except Exception as e:
+        logger.error("刷新时发生错误：%s", e)
+    finally:
+        store.close()
+
+if __name__ == '__main__':
+    import argparse
+    from outputs import add_output_arguments, setup_outputs_from_args
+    parser = argparse.ArgumentParser(description='增量同步星球文章')
+    parser.add_argument('--scope', action='append', help='要同步的scope，可重复指定，默认all')
+    parser.add_argument('--group', help='星球ID，默认使用config.json中的groupId')
+    parser.add_argument('--workers', type=int, default=4, help='下载文章的并发线程数')
+    parser.add_argument('--state', default='state.db', help='状态库文件路径')
+    parser.add_argument('--refresh', action='store_true',
+                        help='完整扫描列表，重新保存评论数、点赞数、精华状态或正文有变化的文章')
+    parser.add_argument('--list-workers', type=int, default=0, help='--refresh时按时间窗口并发翻页的线程数')
+    add_logging_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    outputs = setup_outputs_from_args(args, args.workers)
+    if args.refresh:
+        refresh(args.scope or ['all'], args.group, args.workers, args.state, args.list_workers)
+    else:
+        sync(args.scope or ['all'], args.group, args.workers, args.state)
+    outputs.close()
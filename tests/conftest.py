@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+import pytest
+
+# 项目模块都在仓库根目录，直接导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+import article_store
+from mock_server import MockGroup, FaultConfig, start_server
+from zsxq_client import ZsxqClient
+
+def client_config(base_url, group_id, **overrides):
+    """连接模拟服务器的配置：限流放宽，重试退避缩短"""
+    config = {
+        'api': {'groupId': str(group_id), 'baseUrl': base_url},
+        'auth': {'zsxq_access_token': 'test-token', 'zsxqsessionid': 'test-session'},
+        'rateLimit': {'rate': 500, 'burst': 100, 'maxRate': 1000},
+        'retry': {'maxAttempts': 4, 'baseDelay': 0.01, 'maxDelay': 0.02, 'minRetries': 100},
+    }
+    config.update(overrides)
+    return config
+
+def make_client(base_url, group_id, **overrides):
+    """创建连接模拟服务器的客户端，不读取config.json"""
+    return ZsxqClient(client_config(base_url, group_id, **overrides))
+
+def write_config(directory, base_url, group_id, **overrides):
+    """在directory中写入连接模拟服务器的config.json，供从配置文件创建客户端的sync()等函数使用"""
+    with open(os.path.join(directory, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(client_config(base_url, group_id, **overrides), f, ensure_ascii=False)
+
+@pytest.fixture
+def mock_group():
+    """运行在后台线程中的模拟服务器，返回(MockGroup, base_url, FaultConfig)"""
+    group = MockGroup(size=95)
+    faults = FaultConfig(seed=1)
+    server, base_url = start_server(group, faults)
+    yield group, base_url, faults
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def isolated_outputs(monkeypatch):
+    """每个测试使用新的输出目录缓存、目录布局选项，以及未设置的默认归档、索引、元数据、评论和媒体组件"""
+    monkeypatch.setattr(article_store, '_stores', {})
+    monkeypatch.setattr(article_store, '_default_options', dict(article_store._default_options))
+    for name in ('_default_archive', '_default_search_index', '_default_metadata_store',
+                 '_default_comment_fetcher', '_default_media_downloader'):
+        monkeypatch.setattr(main, name, None)
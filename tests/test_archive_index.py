@@ -0,0 +1,33 @@
+from archive_index import topic_id_from_filename, build_article_index, find_missing, verify_archive
+
+def test_topic_id_from_filename():
+    assert topic_id_from_filename('20250304_标题_带_下划线_123456.txt') == '123456'
+    assert topic_id_from_filename('20250304_标题_123456.txt.tmp') is None
+    assert topic_id_from_filename('notes.txt') is None
+
+def test_build_article_index_scans_date_layout(tmp_path):
+    articles = tmp_path / 'articles'
+    (articles / '2025' / '03').mkdir(parents=True)
+    (articles / '.tmp').mkdir()
+    (articles / '20250101_旧文章_111.txt').write_text('a', encoding='utf-8')
+    (articles / '2025' / '03' / '20250304_新文章_222.txt').write_text('b', encoding='utf-8')
+    (articles / '.tmp' / '20250304_临时_333.txt').write_text('c', encoding='utf-8')
+    index = build_article_index(str(articles))
+    assert set(index) == {'111', '222'}
+    assert index['222'].endswith('20250304_新文章_222.txt')
+    assert build_article_index(str(tmp_path / 'missing')) == {}
+
+def test_find_missing_matches_ids_exactly():
+    index = {'1234': 'a.txt'}
+    # 旧的子串匹配会把123当作已保存
+    assert find_missing(['123', '1234', '999'], index, known_failed_ids=['999']) == ['123']
+
+def test_verify_archive_writes_missing_ids(tmp_path):
+    list_file = tmp_path / 'all_list.txt'
+    list_file.write_text('111 旧文章\n222 新文章\n', encoding='utf-8')
+    articles = tmp_path / 'articles'
+    articles.mkdir()
+    (articles / '20250101_旧文章_111.txt').write_text('a', encoding='utf-8')
+    output = tmp_path / 'missing.txt'
+    assert verify_archive(str(list_file), str(articles), str(output)) == ['222']
+    assert output.read_text(encoding='utf-8') == '222'
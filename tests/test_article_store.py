@@ -0,0 +1,63 @@
+import os
+import pytest
+from archive_index import build_article_index
+from article_store import ArticleStore, MANIFEST_FILE, LAYOUT_DATE
+
+def read_manifest(output_dir):
+    with open(os.path.join(output_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        return [line.rstrip('\n').split('\t') for line in f]
+
+def test_failed_write_keeps_previous_file(tmp_path, monkeypatch):
+    store = ArticleStore(str(tmp_path))
+    path = store.write('1', '20250304_标题_1.txt', '第一版')
+
+    def fail_replace(src, dst):
+        raise OSError('磁盘已满')
+
+    monkeypatch.setattr(os, 'replace', fail_replace)
+    with pytest.raises(OSError):
+        store.write('1', '20250304_标题_1.txt', '第二版')
+    monkeypatch.undo()
+    # 重命名失败时原文件保持完整
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == '第一版'
+    assert list(build_article_index(str(tmp_path))) == ['1']
+
+def test_manifest_skips_unchanged_and_removes_renamed(tmp_path):
+    output_dir = str(tmp_path / 'articles')
+    store = ArticleStore(output_dir, manifest=True, batch_size=2)
+    path = store.write('1', '20250304_旧标题_1.txt', '正文')
+    mtime = os.stat(path).st_mtime_ns
+    store.write('2', '20250305_文章_2.txt', '正文二')
+    assert store.write('1', '20250304_旧标题_1.txt', '正文') == path
+    assert store.unchanged == 1
+    assert os.stat(path).st_mtime_ns == mtime
+
+    new_path = store.write('1', '20250304_新标题_1.txt', '正文')
+    assert not os.path.exists(path)
+    store.close()
+    assert sorted(build_article_index(output_dir).items()) == [
+        ('1', new_path), ('2', os.path.join(output_dir, '20250305_文章_2.txt'))]
+    assert [row[:3] for row in read_manifest(output_dir)] == [
+        ['1', '20250304_旧标题_1.txt', str(len('正文'.encode('utf-8')))],
+        ['2', '20250305_文章_2.txt', str(len('正文二'.encode('utf-8')))],
+        ['1', '20250304_新标题_1.txt', str(len('正文'.encode('utf-8')))],
+    ]
+
+    # 重新打开时从清单恢复，文件被删除时重新写入
+    reopened = ArticleStore(output_dir, manifest=True)
+    assert reopened.entries['1'][0] == '20250304_新标题_1.txt'
+    reopened.write('2', '20250305_文章_2.txt', '正文二')
+    assert reopened.unchanged == 1
+    os.remove(new_path)
+    reopened.write('1', '20250304_新标题_1.txt', '正文')
+    assert reopened.written == 1
+    assert os.path.exists(new_path)
+
+def test_date_layout(tmp_path):
+    store = ArticleStore(str(tmp_path), layout=LAYOUT_DATE)
+    path = store.write('1', '20240613_标题_1.txt', '正文')
+    assert path == os.path.join(str(tmp_path), '2024', '06', '20240613_标题_1.txt')
+    assert store.relative_path('无日期_2.txt') == '无日期_2.txt'
+    with pytest.raises(ValueError):
+        ArticleStore(str(tmp_path), layout='weekly')
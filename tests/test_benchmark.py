@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+from benchmark import run_benchmarks, compare, load_baseline, save_baseline
+
+BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmark.py')
+
+def test_compare_flags_throughput_and_memory_regressions():
+    baseline = {'render@1000': {'throughput': 1000.0, 'peak_kb': 1000.0}}
+    assert compare({'render@1000': {'throughput': 800.0, 'peak_kb': 1200.0}}, baseline) == []
+    regressions = compare({'render@1000': {'throughput': 700.0, 'peak_kb': 1400.0},
+                           'render@10000': {'throughput': 1.0, 'peak_kb': 1.0}}, baseline)
+    assert len(regressions) == 2
+    assert all(item.startswith('render@1000：') for item in regressions)
+
+def test_save_baseline_keeps_other_cases(tmp_path):
+    path = str(tmp_path / 'baseline.json')
+    assert load_baseline(path) is None
+    save_baseline({'a@10': {'throughput': 1.0, 'peak_kb': 1.0}}, path)
+    save_baseline({'b@10': {'throughput': 2.0, 'peak_kb': 2.0}}, path)
+    assert sorted(load_baseline(path)) == ['a@10', 'b@10']
+
+def test_run_benchmarks_filters_cases():
+    results = run_benchmarks(sizes=(20,), only=['render'], repeat=1)
+    assert results
+    assert all('render' in key and key.endswith('@20') for key in results)
+    assert all(result['topics'] == 20 for result in results.values())
+
+def run_cli(tmp_path, *args):
+    command = [sys.executable, BENCHMARK, '--sizes', '20', '--repeat', '1', '--only', 'render_article',
+               '--baseline', str(tmp_path / 'baseline.json'), '--quiet', *args]
+    return subprocess.run(command, cwd=tmp_path, capture_output=True, timeout=120).returncode
+
+def test_require_baseline_fails_without_comparison(tmp_path):
+    assert run_cli(tmp_path, '--require-baseline') == 1
+    save_baseline({'render_article@20': {'throughput': 0.0, 'peak_kb': 1e9}}, str(tmp_path / 'baseline.json'))
+    assert run_cli(tmp_path, '--require-baseline') == 0
@@ -0,0 +1,57 @@
+import os
+import article_store
+from conftest import make_client
+from bulk_download import download_articles
+from single_article import fetch_single_article, save_single_article
+
+def read_tree(directory):
+    files = {}
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+            files[name] = f.read()
+    return files
+
+def serial_download(topic_ids, client, download_failed_ids, save_failed_ids):
+    """process_all_articles顺序下载（workers=1）的流程"""
+    for topic_id in topic_ids:
+        topic = fetch_single_article(topic_id, download_failed_ids, client)
+        if topic is not None:
+            save_single_article(topic_id, topic, download_failed_ids, save_failed_ids, client=client)
+
+def test_bulk_download_matches_serial(mock_group, tmp_path, monkeypatch):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    # 混入不存在的文章，两种模式的失败列表都应包含它们且顺序相同
+    topic_ids = [group.topic_id(i) for i in range(30)]
+    topic_ids[5:5] = ['1', '2']
+    topic_ids.append('3')
+
+    os.makedirs(tmp_path / 'serial')
+    monkeypatch.chdir(tmp_path / 'serial')
+    serial_download_failed, serial_save_failed = [], []
+    serial_download(topic_ids, client, serial_download_failed, serial_save_failed)
+
+    # 输出目录按相对路径缓存，切换工作目录后重新创建
+    article_store._stores.clear()
+    os.makedirs(tmp_path / 'bulk')
+    monkeypatch.chdir(tmp_path / 'bulk')
+    bulk_download_failed, bulk_save_failed = [], []
+    saved = download_articles(iter(topic_ids), 8, bulk_download_failed, bulk_save_failed, client=client)
+
+    assert saved == 30
+    assert read_tree(tmp_path / 'bulk' / 'articles') == read_tree(tmp_path / 'serial' / 'articles')
+    assert bulk_download_failed == serial_download_failed
+    assert [item['id'] for item in bulk_download_failed] == ['1', '2', '3']
+    assert bulk_save_failed == serial_save_failed == []
+
+def test_bulk_download_retries_server_errors(mock_group, tmp_path, monkeypatch):
+    group, base_url, faults = mock_group
+    faults.rate_5xx = 0.2
+    client = make_client(base_url, group.group_id)
+    monkeypatch.chdir(tmp_path)
+    download_failed, save_failed = [], []
+    saved = download_articles([group.topic_id(i) for i in range(20)], 4, download_failed, save_failed,
+                              client=client)
+    assert saved == 20
+    assert download_failed == save_failed == []
+    assert len(os.listdir(tmp_path / 'articles')) == 20
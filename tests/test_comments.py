@@ -0,0 +1,84 @@
+import copy
+from conftest import make_client
+from comments import CommentStore, CommentFetcher, fetch_comment_thread, count_comments, FULL_COMMENTS_KEY
+from main import render_article
+from mock_server import MockGroup
+
+class FakeCommentClient:
+    """按create_time从旧到新返回评论的假客户端，记录请求次数"""
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.requests = 0
+
+    def comments_url(self, topic_id, begin_time=None, count=30):
+        return begin_time, count
+
+    def request_json(self, url):
+        self.requests += 1
+        begin_time, count = url
+        comments = [c for c in self.thread if not begin_time or c['create_time'] >= begin_time][:count]
+        return {'resp_data': {'comments': copy.deepcopy(comments)}}
+
+def make_thread(count):
+    return [{'comment_id': i, 'create_time': f"2024-01-01T00:{i:02d}:00.000+0800", 'replied_comments': []}
+            for i in range(count)]
+
+def test_stored_thread_is_not_refetched(tmp_path):
+    client = FakeCommentClient(make_thread(45))
+    store = CommentStore(str(tmp_path))
+    assert len(fetch_comment_thread(client, 1, store, expected=45)) == 45
+    requests = client.requests
+    assert len(fetch_comment_thread(client, 1, store, expected=45)) == 45
+    assert client.requests == requests
+
+def test_new_reply_on_old_comment_is_fetched(tmp_path):
+    thread = make_thread(45)
+    client = FakeCommentClient(thread)
+    store = CommentStore(str(tmp_path))
+    fetch_comment_thread(client, 1, store, expected=count_comments(thread))
+    thread[3]['replied_comments'].append({'comment_id': 1000, 'create_time': '2024-01-02T00:00:00.000+0800'})
+    comments = fetch_comment_thread(client, 1, store, expected=count_comments(thread))
+    assert count_comments(comments) == 46
+    assert count_comments(store.load(1)) == 46
+
+def test_unreachable_count_is_checked_once(tmp_path):
+    # 有评论被删除时已保存的评论数永远达不到comments_count，评论数不变时不再重复请求
+    client = FakeCommentClient(make_thread(10))
+    store = CommentStore(str(tmp_path))
+    fetch_comment_thread(client, 1, store, expected=12)
+    requests = client.requests
+    fetch_comment_thread(client, 1, store, expected=12)
+    assert client.requests == requests
+    fetch_comment_thread(client, 1, store, expected=13)
+    assert client.requests > requests
+
+def test_fetcher_completes_threads_from_server(mock_group, tmp_path):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    topics = [group.topic(i) for i in range(20)]
+    fetcher = CommentFetcher(client, CommentStore(str(tmp_path)), workers=4)
+    try:
+        fetcher.complete_many(topics)
+    finally:
+        fetcher.close()
+    for i, topic in enumerate(topics):
+        if group.comment_count(i) > group.comments:
+            assert topic[FULL_COMMENTS_KEY] is True
+            assert topic['show_comments'] == group.comment_thread(i)
+        else:
+            assert FULL_COMMENTS_KEY not in topic
+    assert fetcher.fetched_topics == sum(1 for i in range(20) if group.comment_count(i) > group.comments)
+    assert fetcher.failed_topics == 0
+
+def test_replies_are_rendered_only_with_full_comments():
+    group = MockGroup(size=1)
+    topic = group.topic(0)
+    topic['show_comments'] = group.comment_thread(0, 1)
+    assert topic['show_comments'][0]['replied_comments']
+    filename, text = render_article(topic)
+    assert '评论内容：评论0' in text
+    assert '回复（' not in text
+    topic[FULL_COMMENTS_KEY] = True
+    filename, text = render_article(topic)
+    assert '回复（回复者0，' in text
@@ -0,0 +1,56 @@
+from conftest import make_client
+from crawler import iter_pages, iter_topics, iter_topics_partitioned, stream_topic_list, ENDPOINT_DIGESTS
+
+def test_iter_topics_visits_every_topic_once(mock_group):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    topics = list(iter_topics(client))
+    ids = [str(topic['topic_id']) for topic in topics]
+    assert len(ids) == group.size
+    assert len(set(ids)) == group.size
+    create_times = [topic['create_time'] for topic in topics]
+    assert create_times == sorted(create_times, reverse=True)
+
+def test_iter_pages_max_pages_and_stop(mock_group):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    pages = list(iter_pages(client, max_pages=2))
+    assert len(pages) == 2
+    assert sum(len(topics) for url, resp_data, topics in pages) == 40
+
+    pages = list(iter_pages(client, stop=lambda topics: True))
+    assert len(pages) == 1
+
+def test_iter_topics_retries_server_errors(mock_group):
+    group, base_url, faults = mock_group
+    faults.rate_5xx = 0.3
+    client = make_client(base_url, group.group_id)
+    ids = {str(topic['topic_id']) for topic in iter_topics(client)}
+    assert len(ids) == group.size
+
+def test_partitioned_crawl_matches_sequential(mock_group):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    sequential = {str(topic['topic_id']) for topic in iter_topics(client)}
+    partitioned = [str(topic['topic_id']) for topic in iter_topics_partitioned(client, workers=4)]
+    assert len(partitioned) == len(set(partitioned))
+    assert set(partitioned) == sequential
+
+def test_digests_endpoint_uses_index_cursor(mock_group):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    ids = [str(topic['topic_id']) for topic in iter_topics(client, endpoint=ENDPOINT_DIGESTS)]
+    assert ids
+    assert len(ids) == len(set(ids))
+
+def test_stream_topic_list_writes_each_topic_before_yielding(tmp_path):
+    list_file = tmp_path / 'all_list.txt'
+    failures = []
+    topics = [{'topic_id': 1, 'title': '标题一\n第二行'}, {'topic_id': 2}, {'topic_id': 3, 'title': '标题三'}]
+    stream = stream_topic_list(iter(topics), str(list_file), failures)
+    assert next(stream) == '1'
+    # 下载流程拿到ID时，列表文件中已经有这一行
+    assert list_file.read_text(encoding='utf-8') == '1 标题一\n'
+    assert list(stream) == ['3']
+    assert list_file.read_text(encoding='utf-8') == '1 标题一\n3 标题三\n'
+    assert [item['topic']['topic_id'] for item in failures] == [2]
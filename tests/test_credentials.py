@@ -0,0 +1,67 @@
+import threading
+import pytest
+from conftest import make_client
+from credentials import CredentialPool, parse_auth_config
+from crawler import iter_topics
+from mock_server import MockGroup, FaultConfig, create_server
+from retry_policy import FatalError
+
+FAST = {'rate': 1000, 'burst': 100, 'maxRate': 1000}
+
+def test_parse_auth_config():
+    single = parse_auth_config({'zsxq_access_token': 't', 'zsxqsessionid': 's'}, FAST)
+    assert [c.name for c in single] == ['default']
+    assert single[0].cookie == 'zsxq_access_token=t; zsxqsessionid=s'
+    pool = parse_auth_config([{'zsxq_access_token': 'a'}, {'name': '备用', 'zsxq_access_token': 'b'},
+                              {'zsxq_access_token': ''}], FAST)
+    assert [c.name for c in pool] == ['auth1', '备用']
+    with pytest.raises(ValueError):
+        CredentialPool(parse_auth_config({}))
+
+def test_requests_rotate_across_credentials():
+    pool = CredentialPool(parse_auth_config([{'zsxq_access_token': 'a'}, {'zsxq_access_token': 'b'}], FAST))
+    names = [pool.acquire()[0].name for _ in range(10)]
+    assert names.count('auth1') == names.count('auth2') == 5
+
+def test_quarantine_and_merge():
+    pool = CredentialPool(parse_auth_config([{'zsxq_access_token': 'a'}, {'zsxq_access_token': 'b'}], FAST))
+    first, second = pool.credentials
+    assert pool.quarantine(first, '登录已失效')
+    assert all(pool.acquire()[0] is second for _ in range(5))
+    assert not pool.quarantine(second, '登录已失效')
+    assert pool.acquire() == (None, 0.0)
+    # 重新读取配置文件：已有的凭证不重复加入，新凭证改名避免重名
+    assert pool.merge(parse_auth_config([{'zsxq_access_token': 'a'}, {'zsxq_access_token': 'c'}], FAST)) == 1
+    assert pool.credentials[-1].name == 'auth2#3'
+    assert pool.acquire()[0].access_token == 'c'
+
+@pytest.fixture
+def limited_server():
+    """access_token a的第11个请求起返回401的模拟服务器"""
+    group = MockGroup(size=95)
+    server = create_server(group, FaultConfig(seed=1), port=0, token_limits={'a': 10})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield group, f"http://127.0.0.1:{server.server_address[1]}/v2", server
+    server.shutdown()
+    server.server_close()
+
+def test_rejected_credential_is_quarantined_without_losing_requests(limited_server):
+    group, base_url, server = limited_server
+    auth = [{'zsxq_access_token': 'a', 'zsxqsessionid': 's'}, {'zsxq_access_token': 'b', 'zsxqsessionid': 's'}]
+    client = make_client(base_url, group.group_id, auth=auth)
+    ids = {str(topic['topic_id']) for topic in iter_topics(client)}
+    for i in range(20):
+        assert client.request_json(client.topic_info_url(group.topic_id(i)))['succeeded']
+    assert len(ids) == group.size
+    first, second = client.credentials.credentials
+    assert first.quarantined and not second.quarantined
+    assert server.stats.tokens['a'] == 11
+
+def test_all_credentials_rejected_is_fatal(limited_server):
+    group, base_url, server = limited_server
+    client = make_client(base_url, group.group_id, auth={'zsxq_access_token': 'a', 'zsxqsessionid': 's'})
+    with pytest.raises(FatalError):
+        for i in range(20):
+            client.request_json(client.topic_info_url(group.topic_id(i)))
+    assert server.stats.tokens['a'] == 11
@@ -0,0 +1,96 @@
+import json
+import os
+import journal as journal_module
+from conftest import write_config
+from journal import RunJournal, import_legacy, STATUS_SAVED, STAGE_MISSING
+from retry_policy import PERMANENT
+from single_article import process_all_articles
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+def test_latest_record_wins_after_reload(tmp_path):
+    path = str(tmp_path / 'logs' / 'journal.jsonl')
+    journal = RunJournal(path)
+    journal.failed({'id': '1', 'reason': '超时'})
+    journal.saved('1', 'articles/a_1.txt')
+    journal.failed({'id': '2', 'reason': '文章不存在', 'kind': PERMANENT})
+    journal.failed({'id': '3', 'reason': '503'}, 'save')
+    journal.close()
+    # 进程在写入过程中被杀死时只会损坏最后一行
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"id": "4", "sta')
+
+    journal = RunJournal(path)
+    try:
+        assert journal.status('1') == STATUS_SAVED
+        assert journal.pending(['1', '2', '3', '4', '5']) == ['4', '5']
+        assert journal.failures() == [{'id': '3', 'reason': '503', 'kind': None, 'stage': 'save'}]
+        assert [item['id'] for item in journal.failures(include_permanent=True)] == ['2', '3']
+        assert journal.counts() == (1, 2)
+        journal.compact()
+        assert [record['id'] for record in read_records(path)] == ['1', '2', '3']
+    finally:
+        journal.close()
+
+def test_fsync_every_record_by_default(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(journal_module.os, 'fsync', lambda fd: calls.append(fd))
+    journal = RunJournal(str(tmp_path / 'journal.jsonl'))
+    journal.saved('1')
+    journal.saved('2')
+    assert len(calls) == 2
+    journal.close()
+
+    calls.clear()
+    journal = RunJournal(str(tmp_path / 'journal.jsonl'), fsync_interval=3600)
+    journal.saved('3')
+    journal.saved('4')
+    assert calls == []
+    journal.close()
+    assert len(calls) == 1
+    assert len(read_records(str(tmp_path / 'journal.jsonl'))) == 4
+
+def test_import_legacy_failure_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'download_failed_ids.txt').write_text('111: 超时\n222：503\n', encoding='utf-8')
+    (tmp_path / 'missing_articles.txt').write_text('333\n111\n', encoding='utf-8')
+    journal = RunJournal('journal.jsonl')
+    try:
+        assert import_legacy(journal) == 3
+        assert [(item['id'], item['stage']) for item in journal.failures()] == \
+            [('111', 'download'), ('222', 'download'), ('333', STAGE_MISSING)]
+    finally:
+        journal.close()
+
+def test_rerun_resumes_and_retries_only_failures(mock_group, tmp_path, monkeypatch):
+    group, base_url, faults = mock_group
+    write_config(tmp_path, base_url, group.group_id)
+    monkeypatch.chdir(tmp_path)
+    topic_ids = [str(group.topic_id(i)) for i in range(10)]
+    unknown_id = str(group.topic_id(group.size))
+    (tmp_path / 'all_list.txt').write_text(
+        ''.join(f"{topic_id} 标题\n" for topic_id in topic_ids + [unknown_id]), encoding='utf-8')
+
+    journal = RunJournal('logs/journal.jsonl')
+    process_all_articles(workers=4, journal=journal)
+    journal.close()
+    assert len(os.listdir('articles')) == 10
+    journal = RunJournal('logs/journal.jsonl')
+    assert [item['id'] for item in journal.failures(include_permanent=True)] == [unknown_id]
+    assert journal.failures() == []
+    journal.close()
+
+    # 删除一篇已保存的文章：重新运行时不重新下载其他文章，只重试缺失的文章，不重试永久错误
+    deleted = sorted(os.listdir('articles'))[0]
+    os.remove(os.path.join('articles', deleted))
+    records = len(read_records('logs/journal.jsonl'))
+    journal = RunJournal('logs/journal.jsonl')
+    process_all_articles(workers=4, journal=journal)
+    journal.close()
+    assert os.path.exists(os.path.join('articles', deleted))
+    new_records = read_records('logs/journal.jsonl')[records:]
+    deleted_id = deleted.rsplit('_', 1)[1][:-4]
+    assert [(record['id'], record['status']) for record in new_records] == \
+        [(deleted_id, 'failed'), (deleted_id, 'saved')]
@@ -0,0 +1,62 @@
+import io
+import json
+import logging
+import pytest
+import log_utils
+from log_utils import LazyJson, LazyText, JsonLinesFormatter, ProgressBar, get_logger, setup_logging, LOGGER_NAME
+
+@pytest.fixture
+def restore_logger():
+    logger = logging.getLogger(LOGGER_NAME)
+    handlers, level = list(logger.handlers), logger.level
+    yield logger
+    for handler in logger.handlers:
+        if handler not in handlers:
+            handler.close()
+    logger.handlers[:] = handlers
+    logger.setLevel(level)
+    log_utils._progress_enabled = False
+
+def test_lazy_json_is_serialized_only_when_emitted(restore_logger, monkeypatch):
+    calls = []
+    dumps = json.dumps
+    monkeypatch.setattr(log_utils.json, 'dumps', lambda *a, **kw: calls.append(1) or dumps(*a, **kw))
+    stream = io.StringIO()
+    restore_logger.handlers[:] = [logging.StreamHandler(stream)]
+    restore_logger.setLevel(logging.INFO)
+    logger = get_logger('test')
+    logger.debug("数据: %s", LazyJson({'a': 1}))
+    assert calls == []
+    logger.info("数据: %s", LazyJson({'a': '中文'}, indent=None))
+    assert calls == [1]
+    assert stream.getvalue() == '数据: {"a": "中文"}\n'
+
+def test_lazy_truncation():
+    assert str(LazyText('x' * 10, limit=4)) == 'xxxx...（共10字符）'
+    assert str(LazyJson([1, 2], indent=None, limit=3)) == '[1,...（共6字符）'
+
+def test_json_lines_formatter_merges_fields():
+    record = logging.LogRecord('zsxq.test', logging.WARNING, __file__, 1, "文章 %s 失败", ('123',), None)
+    record.fields = {'topic_id': '123'}
+    entry = json.loads(JsonLinesFormatter().format(record))
+    assert entry['level'] == 'WARNING'
+    assert entry['message'] == '文章 123 失败'
+    assert entry['topic_id'] == '123'
+
+def test_quiet_mode_filters_console_and_enables_progress(restore_logger, tmp_path):
+    json_file = tmp_path / 'log.jsonl'
+    setup_logging('INFO', quiet=True, json_file=str(json_file))
+    console, file_handler = restore_logger.handlers
+    assert console.level == logging.WARNING
+    assert file_handler.level == logging.INFO
+    get_logger('test').info("只写入文件")
+    file_handler.flush()
+    assert json.loads(json_file.read_text(encoding='utf-8'))['message'] == '只写入文件'
+
+    stream = io.StringIO()
+    progress = ProgressBar(total=2, desc='测试', stream=stream, min_interval=0)
+    progress.update()
+    progress.update(failed=True)
+    progress.close()
+    assert '2/2 失败1' in stream.getvalue()
+    assert progress.summary().startswith('测试共2篇，失败1篇')
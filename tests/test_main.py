@@ -0,0 +1,34 @@
+import os
+from main import render_article, topic_needs_detail
+from mock_server import MockGroup
+from single_article import save_list_topics
+
+def test_topic_needs_detail():
+    group = MockGroup(size=10, article_every=3)
+    assert not topic_needs_detail(group.topic(1))
+    # 长文章在列表中只有摘要
+    assert topic_needs_detail(group.topic(3))
+    topic = group.topic(1)
+    topic['talk']['text'] = ''
+    assert topic_needs_detail(topic)
+    topic = group.topic(1)
+    del topic['create_time']
+    assert topic_needs_detail(topic)
+    assert not topic_needs_detail({'topic_id': 1, 'create_time': '2025-03-04T08:00:00.000+0800', 'type': 'q&a'})
+
+def test_list_payload_renders_like_detail():
+    group = MockGroup(size=10)
+    for i in range(5):
+        assert render_article(group.topic(i)) == render_article(group.topic_detail(i))
+
+def test_save_list_topics_yields_only_incomplete_topics(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    group = MockGroup(size=10, article_every=3)
+    download_failed_ids, save_failed_ids, saved = [], [], []
+    topics = [group.topic(i) for i in range(10)]
+    detail_ids = list(save_list_topics(topics, download_failed_ids, save_failed_ids,
+                                       on_saved=lambda topic_id, path: saved.append(topic_id)))
+    assert detail_ids == [str(group.topic_id(i)) for i in (0, 3, 6, 9)]
+    assert sorted(saved) == sorted(str(group.topic_id(i)) for i in (1, 2, 4, 5, 7, 8))
+    assert len(os.listdir('articles')) == 6
+    assert download_failed_ids == save_failed_ids == []
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import pytest
+from conftest import make_client
+from media import MediaDownloader, MediaStore, MEDIA_KEY, KIND_AVATAR, KIND_BACKGROUND, url_key, render_media
+from mock_server import MockGroup, FaultConfig, start_server
+
+@pytest.fixture
+def media_group():
+    group = MockGroup(size=12, media_every=2)
+    faults = FaultConfig(seed=2)
+    server, base_url = start_server(group, faults)
+    yield group, base_url, faults
+    server.shutdown()
+    server.server_close()
+
+def make_downloader(tmp_path, client, **kwargs):
+    return MediaDownloader(MediaStore(str(tmp_path / 'media')), client=client, **kwargs)
+
+def media_name(url):
+    return url.split('/media/', 1)[1].split('?', 1)[0]
+
+def test_localize_downloads_and_deduplicates(media_group, tmp_path):
+    group, base_url, faults = media_group
+    client = make_client(base_url, group.group_id)
+    downloader = make_downloader(tmp_path, client)
+    topics = [group.topic(i) for i in range(group.size)]
+    try:
+        downloader.localize_many(topics)
+        images = [image for topic in topics for image in topic['talk'].get('images') or []]
+        for topic in topics:
+            for item, image in zip(topic[MEDIA_KEY], topic['talk'].get('images') or []):
+                with open(item['path'], 'rb') as f:
+                    assert f.read() == group.media_content(media_name(image['large']['url']))
+            assert all(item['path'] for item in topic[MEDIA_KEY])
+        # 签名参数不同的同一地址只下载一次
+        assert downloader.downloaded == len({url_key(image['large']['url']) for image in images}) + \
+            sum(1 for topic in topics if topic['talk'].get('files'))
+        assert downloader.failed == 0
+    finally:
+        downloader.close()
+
+def test_truncated_downloads_resume(media_group, tmp_path):
+    group, base_url, faults = media_group
+    faults.rate_truncate = 0.3
+    client = make_client(base_url, group.group_id,
+                         retry={'maxAttempts': 10, 'baseDelay': 0.01, 'maxDelay': 0.02, 'minRetries': 100})
+    downloader = make_downloader(tmp_path, client, workers=1)
+    topics = [group.topic(i) for i in range(0, group.size, 2)]
+    try:
+        downloader.localize_many(topics)
+        assert downloader.failed == 0
+        for topic in topics:
+            assert all(item['path'] for item in topic[MEDIA_KEY])
+    finally:
+        downloader.close()
+    assert os.listdir(tmp_path / 'media' / '.partial') == []
+
+def write_partial(store, url, data, validator):
+    part_path = store.partial_path(url_key(url))
+    with open(part_path, 'wb') as f:
+        f.write(data)
+    store.save_validator(part_path, validator)
+    return part_path
+
+@pytest.mark.parametrize('validator', ['match', 'stale', None])
+def test_resume_is_validated_with_if_range(media_group, tmp_path, validator):
+    group, base_url, faults = media_group
+    client = make_client(base_url, group.group_id)
+    downloader = make_downloader(tmp_path, client)
+    url = group.topic(0)['talk']['images'][0]['large']['url']
+    data = group.media_content(media_name(url))
+    etag = '"%s"' % hashlib.sha1(data).hexdigest()
+    # 临时文件中的前半部分与服务器上的文件不同时，只有校验值一致才会续传
+    prefix = data[:1000] if validator == 'match' else b'x' * 1000
+    write_partial(downloader.store, url, prefix, {'match': etag, 'stale': '"stale"', None: None}[validator])
+    try:
+        part_path, sha256, content_type = downloader._stream(url_key(url), url)
+        with open(part_path, 'rb') as f:
+            assert f.read() == data
+        assert sha256 == hashlib.sha256(data).hexdigest()
+        assert downloader.bytes == (len(data) - 1000 if validator == 'match' else len(data))
+        assert downloader.store.load_validator(part_path) == etag
+    finally:
+        downloader.close()
+
+def test_avatars_and_background_are_rendered(media_group, tmp_path):
+    group, base_url, faults = media_group
+    client = make_client(base_url, group.group_id)
+    downloader = make_downloader(tmp_path, client, include_avatars=True)
+    topic = group.topic(1)
+    try:
+        downloader.localize(topic)
+    finally:
+        downloader.close()
+    kinds = [item['kind'] for item in topic[MEDIA_KEY]]
+    assert kinds == [KIND_AVATAR, KIND_BACKGROUND]
+    text = render_media(topic)
+    owner = topic['talk']['owner']['name']
+    assert f"头像 {owner}：{topic[MEDIA_KEY][0]['path']}" in text
+    assert f"星球背景图：{topic[MEDIA_KEY][1]['path']}" in text
@@ -0,0 +1,97 @@
+import os
+import pytest
+import metadata_store
+from metadata_store import MetadataStore, load_columns, aggregate, UPDATES_FILE
+
+def topic(topic_id, likes=0, author='作者', create_time='2024-05-01T10:00:00.000+0800'):
+    return {'topic_id': topic_id, 'create_time': create_time, 'likes_count': likes,
+            'talk': {'owner': {'name': author}}}
+
+def column(directory, name):
+    columns, authors = load_columns(directory)
+    return [int(value) for value in columns[name]]
+
+def test_append_and_reopen(tmp_path):
+    store = MetadataStore(str(tmp_path), batch_size=2)
+    for i in range(1, 6):
+        store.add_topic(topic(i, likes=i))
+    assert len(store) == 5
+    store.close()
+    assert column(str(tmp_path), 'topic_id') == [1, 2, 3, 4, 5]
+
+    store = MetadataStore(str(tmp_path))
+    assert len(store) == 5
+    store.add_topic(topic(6, likes=6))
+    store.close()
+    assert column(str(tmp_path), 'likes_count') == [1, 2, 3, 4, 5, 6]
+
+def test_update_in_place(tmp_path):
+    store = MetadataStore(str(tmp_path))
+    store.add_topic(topic(1, likes=1))
+    store.add_topic(topic(2, likes=2))
+    store.close()
+
+    store = MetadataStore(str(tmp_path))
+    store.add_topic(topic(1, likes=10, author='新作者'))
+    store.add_topic(topic(3, likes=3))
+    store.close()
+    assert column(str(tmp_path), 'topic_id') == [1, 2, 3]
+    assert column(str(tmp_path), 'likes_count') == [10, 2, 3]
+    columns, authors = load_columns(str(tmp_path))
+    assert authors[int(columns['author'][0])] == '新作者'
+
+def test_reopen_truncates_uncommitted_appends(tmp_path):
+    store = MetadataStore(str(tmp_path))
+    store.add_topic(topic(1))
+    store.close()
+    # 模拟写列文件后、更新meta.json前崩溃：列文件末尾多出未提交的数据
+    for name, typecode in metadata_store.COLUMNS:
+        with open(os.path.join(str(tmp_path), f"{name}.bin"), 'ab') as f:
+            f.write(b'\x07' * 20)
+
+    store = MetadataStore(str(tmp_path))
+    assert len(store) == 1
+    store.add_topic(topic(2))
+    store.close()
+    assert column(str(tmp_path), 'topic_id') == [1, 2]
+
+def test_interrupted_update_is_replayed(tmp_path, monkeypatch):
+    store = MetadataStore(str(tmp_path))
+    for i in range(1, 4):
+        store.add_topic(topic(i, likes=i))
+    store.close()
+
+    store = MetadataStore(str(tmp_path))
+    store.add_topic(topic(2, likes=20, author='新作者'))
+    written = metadata_store.COLUMNS[:3]
+
+    def crash(updates, appends=()):
+        # 只写了前三列就崩溃
+        monkeypatch.setattr(metadata_store, 'COLUMNS', written)
+        MetadataStore._write_updates(store, updates, appends)
+        raise OSError('模拟崩溃')
+
+    monkeypatch.setattr(store, '_write_updates', crash)
+    with pytest.raises(OSError):
+        store.flush()
+    monkeypatch.undo()
+    assert os.path.exists(os.path.join(str(tmp_path), UPDATES_FILE))
+
+    store = MetadataStore(str(tmp_path))
+    assert not os.path.exists(os.path.join(str(tmp_path), UPDATES_FILE))
+    assert len(store) == 3
+    assert column(str(tmp_path), 'likes_count') == [1, 20, 3]
+    columns, authors = load_columns(str(tmp_path))
+    assert authors[int(columns['author'][1])] == '新作者'
+
+def test_aggregate_by_month_and_author(tmp_path):
+    store = MetadataStore(str(tmp_path))
+    store.add_topic(topic(1, likes=1, author='甲', create_time='2024-05-01T10:00:00.000+0800'))
+    store.add_topic(topic(2, likes=2, author='乙', create_time='2024-05-31T23:30:00.000+0800'))
+    store.add_topic(topic(3, likes=4, author='甲', create_time='2024-06-01T00:30:00.000+0800'))
+    store.close()
+    columns, authors = load_columns(str(tmp_path))
+    by_month = {row['key']: (row['topics'], row['likes_count']) for row in aggregate(columns, authors, 'month')}
+    assert by_month == {'2024-05': (2, 3), '2024-06': (1, 4)}
+    by_author = {row['key']: row['topics'] for row in aggregate(columns, authors, 'author')}
+    assert by_author == {'甲': 2, '乙': 1}
@@ -0,0 +1,56 @@
+import json
+import metrics
+from conftest import make_client
+from crawler import iter_topics
+from metrics import Metrics, Histogram, endpoint_name, write_summary, write_prometheus
+
+def test_endpoint_name_replaces_ids():
+    assert endpoint_name('https://api.zsxq.com/v2/topics/123/info') == '/v2/topics/{id}/info'
+    assert endpoint_name('https://api.zsxq.com/v2/groups/88/topics?scope=all') == '/v2/groups/{id}/topics'
+    assert endpoint_name('https://api.zsxq.com/v2/groups/88/topics/digests?index=0') == '/v2/groups/{id}/topics/digests'
+    assert endpoint_name('https://images.zsxq.com/abc.jpg?e=1') == 'media:images.zsxq.com'
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    assert histogram.quantile(0.5) == 0.0
+    for value in (0.05, 0.05, 0.5, 2.0):
+        histogram.observe(value)
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(1.0) == 2.0
+
+def test_summary_and_prometheus_files(tmp_path):
+    m = Metrics()
+    m.observe_request('/v2/topics/{id}/info', 0.2, size=100, status=200)
+    m.observe_request('/v2/topics/{id}/info', 0.4, size=50, status=503)
+    m.count('retries', kind='retryable', error='http_503')
+    m.count('articles_saved', 3)
+    with m.timer('render'):
+        pass
+    write_summary(str(tmp_path / 'out' / 'summary.json'), m)
+    summary = json.loads((tmp_path / 'out' / 'summary.json').read_text(encoding='utf-8'))
+    endpoint = summary['endpoints']['/v2/topics/{id}/info']
+    assert endpoint['requests'] == 2
+    assert endpoint['bytes'] == 150
+    assert endpoint['status'] == {'200': 1, '503': 1}
+    assert summary['articles_saved'] == 3
+    assert summary['counters']['retries'] == {'error=http_503,kind=retryable': 1}
+    assert summary['stage_seconds']['http'] == 0.6
+
+    write_prometheus(str(tmp_path / 'zsxq.prom'), m)
+    text = (tmp_path / 'zsxq.prom').read_text(encoding='utf-8')
+    assert 'zsxq_request_duration_seconds_bucket{endpoint="/v2/topics/{id}/info",le="+Inf"} 2' in text
+    assert 'zsxq_responses_total{endpoint="/v2/topics/{id}/info",status="503"} 1' in text
+    assert 'zsxq_retries_total{error="http_503",kind="retryable"} 1' in text
+    assert 'zsxq_articles_saved_total 3' in text
+
+def test_client_requests_are_recorded(mock_group, monkeypatch):
+    group, base_url, faults = mock_group
+    monkeypatch.setattr(metrics, '_metrics', Metrics())
+    client = make_client(base_url, group.group_id)
+    assert len(list(iter_topics(client))) == group.size
+    endpoint = metrics.get_metrics().summary()['endpoints']['/v2/groups/{id}/topics']
+    # 每页20篇，翻页游标包含上一页的最后一篇
+    assert endpoint['requests'] == 6
+    assert endpoint['status'] == {'200': 6}
+    assert endpoint['bytes'] > 0
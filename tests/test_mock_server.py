@@ -0,0 +1,56 @@
+import argparse
+import requests
+import zsxq_client
+from conftest import make_client
+from mock_server import MockGroup, FaultConfig, start_server
+from zsxq_client import ZsxqClient, add_client_arguments, setup_client_from_args
+
+def test_topics_are_deterministic():
+    group = MockGroup(size=10, seed=3)
+    assert group.topic(4) == MockGroup(size=10, seed=3).topic(4)
+    assert group.topic(4) != MockGroup(size=10, seed=4).topic(4)
+    assert group.index_of(group.topic_id(7)) == 7
+    assert group.index_of(group.topic_id(7) + 1) is None
+    assert group.index_of(group.topic_id(10)) is None
+
+def test_list_pages_follow_end_time(mock_group):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    first = client.request_json(client.topics_url(count=20))['resp_data']['topics']
+    assert [topic['topic_id'] for topic in first] == [group.topic_id(i) for i in range(20)]
+    # 翻页游标为上一页最后一篇的发布时间，包含该文章本身
+    second = client.request_json(client.topics_url(count=20, end_time=first[-1]['create_time']))['resp_data']['topics']
+    assert second[0]['topic_id'] == group.topic_id(19)
+
+    response = requests.get(client.topic_info_url(group.topic_id(group.size)), timeout=5)
+    assert response.json() == {'succeeded': False, 'code': 1102}
+
+def test_fault_injection_is_counted():
+    group = MockGroup(size=5)
+    faults = FaultConfig(seed=0, rate_5xx=1.0)
+    server, base_url = start_server(group, faults)
+    try:
+        url = f"{base_url}/groups/{group.group_id}/topics"
+        assert requests.get(url, timeout=5).status_code == 503
+        faults.rate_5xx = 0.0
+        faults.rate_malformed = 1.0
+        response = requests.get(url, timeout=5)
+        assert response.status_code == 200
+        assert response.text.endswith('[')
+        faults.rate_malformed = 0.0
+        assert requests.get(url, timeout=5).json()['succeeded']
+        assert server.stats.requests == 3
+        assert server.stats.faults == {'5xx': 1, 'malformed': 1}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_base_url_argument_overrides_config(monkeypatch):
+    monkeypatch.setattr(zsxq_client, '_base_url_override', None)
+    parser = argparse.ArgumentParser()
+    add_client_arguments(parser)
+    setup_client_from_args(parser.parse_args(['--base-url', 'http://127.0.0.1:8765/v2/']))
+    config = {'api': {'groupId': '1', 'baseUrl': 'https://example.com/v2'},
+              'auth': {'zsxq_access_token': 't', 'zsxqsessionid': 's'}}
+    assert ZsxqClient(config).base_url == 'http://127.0.0.1:8765/v2'
+    assert ZsxqClient(config, base_url='http://localhost/v2').base_url == 'http://localhost/v2'
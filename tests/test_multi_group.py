@@ -0,0 +1,117 @@
+import os
+import time
+import threading
+import pytest
+from collections import deque
+from conftest import make_client
+from mock_server import MockGroup, FaultConfig, start_server
+from multi_group import FairScheduler, GroupJob
+from retry_policy import FatalError
+
+class FakeJob:
+    """只记录并发数的星球任务：每个任务耗时duration秒"""
+
+    def __init__(self, name, task_count, duration=0.01, fatal_after=None):
+        self.name = name
+        self.tasks = deque(('info', i) for i in range(task_count))
+        self.in_flight = 0
+        self.aborted = None
+        self.elapsed = None
+        self.download_failed_ids = []
+        self.duration = duration
+        self.fatal_after = fatal_after
+        self.done = 0
+        self.running = 0
+        self.peak = 0
+        self.peak_while_others_busy = 0
+        self.others = []
+        self._lock = threading.Lock()
+
+    def run_task(self, task, progress=None):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+            if any(other.tasks for other in self.others):
+                self.peak_while_others_busy = max(self.peak_while_others_busy, self.running)
+        try:
+            time.sleep(self.duration)
+            with self._lock:
+                self.done += 1
+                if self.fatal_after is not None and self.done >= self.fatal_after:
+                    raise FatalError('凭证失效')
+        finally:
+            with self._lock:
+                self.running -= 1
+        return []
+
+def link(*jobs):
+    for job in jobs:
+        job.others = [other for other in jobs if other is not job]
+
+def test_busy_group_does_not_starve_small_group():
+    heavy = FakeJob('heavy', 60)
+    light = FakeJob('light', 8)
+    link(heavy, light)
+    FairScheduler([heavy, light], workers=4).run()
+    assert heavy.done == 60 and light.done == 8
+    # 两个星球都有任务时各占一半线程
+    assert heavy.peak_while_others_busy <= 2
+    assert light.peak_while_others_busy <= 2
+    # 小星球不用等大星球的任务全部完成
+    assert light.elapsed < heavy.elapsed / 2
+
+def test_single_group_uses_all_workers():
+    heavy = FakeJob('heavy', 40)
+    light = FakeJob('light', 1)
+    link(heavy, light)
+    FairScheduler([heavy, light], workers=4).run()
+    assert heavy.peak == 4
+
+def test_aborted_group_does_not_stop_others():
+    broken = FakeJob('broken', 20, fatal_after=2)
+    healthy = FakeJob('healthy', 20)
+    link(broken, healthy)
+    FairScheduler([broken, healthy], workers=2).run()
+    assert isinstance(broken.aborted, FatalError)
+    assert broken.done < 20
+    assert healthy.done == 20
+
+@pytest.fixture
+def article_group():
+    """每3篇文章中有1篇长文章（列表中只有摘要）的模拟星球"""
+    group = MockGroup(size=45, article_every=3)
+    server, base_url = start_server(group, FaultConfig(seed=1))
+    yield group, base_url
+    server.shutdown()
+    server.server_close()
+
+def test_page_task_queues_saves_without_saving(article_group, tmp_path):
+    group, base_url = article_group
+    job = GroupJob('test', make_client(base_url, group.group_id), output_dir=str(tmp_path / 'articles'))
+    tasks = job.run_task(job.tasks.popleft())
+    assert tasks[0][0] == 'page'
+    assert [task[1] for task in tasks[1:]] == [str(group.topic_id(i)) for i in range(20)]
+    assert [task[0] for task in tasks[1:]] == ['info' if i % 3 == 0 else 'save' for i in range(20)]
+    # 翻页线程不保存文章
+    assert job.saved == 0
+    assert not os.path.exists(tmp_path / 'articles')
+
+def test_group_job_saves_every_topic(article_group, tmp_path):
+    group, base_url = article_group
+    job = GroupJob('test', make_client(base_url, group.group_id), output_dir=str(tmp_path / 'articles'))
+    FairScheduler([job], workers=4).run()
+    assert job.saved == group.size
+    assert job.detail_requests == len(range(0, group.size, 3))
+    assert job.failed == 0
+    assert len(os.listdir(tmp_path / 'articles')) == group.size
+
+def test_failed_save_task_is_recorded():
+    class FailingJob(FakeJob):
+        def run_task(self, task, progress=None):
+            raise OSError('磁盘已满')
+
+    job = FailingJob('full', 0)
+    job.save_failed_ids = []
+    job.tasks.append(('save', '123', {}))
+    FairScheduler([job], workers=2).run()
+    assert job.save_failed_ids == [{'id': '123', 'reason': '磁盘已满'}]
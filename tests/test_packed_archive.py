@@ -0,0 +1,47 @@
+import gzip
+import json
+import os
+from main import extract_and_save_article
+from mock_server import MockGroup
+from packed_archive import PackedArchive
+
+def test_append_get_and_reopen(tmp_path):
+    archive_dir = str(tmp_path / 'archive')
+    archive = PackedArchive(archive_dir, codec='gz')
+    assert archive.append(1, 'a_1.txt', '第一版', create_time='t1') == f"{archive_dir}#1"
+    archive.append('2', 'b_2.txt', '文章二')
+    archive.append('1', 'a_1.txt', '第二版')
+    assert len(archive) == 2
+    assert '1' in archive and 1 in archive
+    assert archive.get(1)['text'] == '第二版'
+    assert archive.get('3') is None
+
+    # 重新打开时从index.jsonl恢复索引，损坏的最后一行被跳过
+    with open(os.path.join(archive_dir, 'index.jsonl'), 'a', encoding='utf-8') as f:
+        f.write('{"topic_id": "4", "segm')
+    reopened = PackedArchive(archive_dir, codec='gz')
+    assert len(reopened) == 2
+    assert reopened.get('2') == {'topic_id': '2', 'filename': 'b_2.txt', 'text': '文章二'}
+    assert [record['topic_id'] for record in reopened.iter_records()] == ['2', '1']
+
+def test_segments_are_plain_jsonl_gz(tmp_path):
+    archive = PackedArchive(str(tmp_path), segment_size=1, codec='gz')
+    archive.append('1', 'a_1.txt', '一')
+    archive.append('2', 'b_2.txt', '二')
+    segments = sorted(name for name in os.listdir(tmp_path) if name.startswith('segment-'))
+    assert segments == ['segment-00001.jsonl.gz', 'segment-00002.jsonl.gz']
+    with gzip.open(tmp_path / segments[1], 'rt', encoding='utf-8') as f:
+        assert json.loads(f.read())['text'] == '二'
+
+def test_expand_matches_txt_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    group = MockGroup(size=5)
+    archive = PackedArchive('archive', codec='gz')
+    for i in range(group.size):
+        extract_and_save_article(group.topic(i))
+        extract_and_save_article(group.topic(i), archive=archive)
+    assert archive.expand('expanded') == group.size
+    names = sorted(os.listdir('articles'))
+    assert sorted(os.listdir('expanded')) == names
+    for name in names:
+        assert (tmp_path / 'expanded' / name).read_bytes() == (tmp_path / 'articles' / name).read_bytes()
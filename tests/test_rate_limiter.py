@@ -0,0 +1,52 @@
+import time
+import pytest
+from rate_limiter import AdaptiveRateLimiter
+
+def test_burst_then_paced_by_rate():
+    limiter = AdaptiveRateLimiter(rate=20, burst=3, max_rate=20, increase=0)
+    waits = [limiter.acquire() for _ in range(3)]
+    assert waits == [0.0, 0.0, 0.0]
+    start = time.monotonic()
+    for _ in range(4):
+        limiter.acquire()
+    # 令牌用完后每个请求间隔约1/rate秒
+    assert time.monotonic() - start == pytest.approx(4 / 20, abs=0.06)
+
+def test_aimd_increase_and_decrease():
+    limiter = AdaptiveRateLimiter(rate=1.0, max_rate=1.2, increase=0.1, decrease_factor=0.5, decrease_interval=0)
+    limiter.observe(200)
+    assert limiter.rate == pytest.approx(1.1)
+    limiter.observe(200)
+    limiter.observe(200)
+    assert limiter.rate == pytest.approx(1.2)
+    limiter.observe(429)
+    assert limiter.rate == pytest.approx(0.6)
+    limiter.observe(503)
+    assert limiter.rate == pytest.approx(0.3)
+    limiter.observe(200, succeeded=False)
+    assert limiter.rate == pytest.approx(0.15)
+    # 404等客户端错误不影响速率
+    limiter.observe(404)
+    assert limiter.rate == pytest.approx(0.15)
+
+def test_concurrent_failures_decrease_once_per_interval():
+    limiter = AdaptiveRateLimiter(rate=4.0, min_rate=0.5, decrease_interval=60)
+    for _ in range(5):
+        limiter.on_throttle()
+    assert limiter.rate == pytest.approx(2.0)
+
+def test_rate_never_below_min_rate():
+    limiter = AdaptiveRateLimiter(rate=1.0, min_rate=0.4, decrease_interval=0)
+    for _ in range(5):
+        limiter.on_throttle()
+    assert limiter.rate == pytest.approx(0.4)
+
+def test_retry_after_pauses_requests():
+    limiter = AdaptiveRateLimiter(rate=100, burst=10, decrease_interval=0)
+    limiter.on_throttle(retry_after=0.2)
+    assert limiter.estimated_wait() == pytest.approx(0.2, abs=0.05)
+    assert limiter.acquire() == pytest.approx(0.2, abs=0.05)
+
+def test_from_config():
+    limiter = AdaptiveRateLimiter.from_config({'rate': 2, 'burst': 7, 'minRate': 0.1, 'maxRate': 3})
+    assert (limiter.rate, limiter.burst, limiter.min_rate, limiter.max_rate) == (2.0, 7, 0.1, 3.0)
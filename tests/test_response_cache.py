@@ -0,0 +1,56 @@
+import os
+import time
+from mock_server import MockGroup
+from response_cache import ResponseCache, rerender
+
+def test_ttl_expiry_uses_fetched_at(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    cache.put('https://api/a', {'succeeded': True})
+    assert cache.get('https://api/a') == {'succeeded': True}
+    assert cache.get('https://api/missing') is None
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 120)
+    assert cache.get('https://api/a') is None
+    assert cache.get('https://api/a', ttl=float('inf')) == {'succeeded': True}
+    assert cache.evict() == 1
+    assert cache.stats() == (0, 0)
+
+def test_size_eviction_removes_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    urls = ['https://api/a', 'https://api/b', 'https://api/c']
+    for url in urls:
+        cache.put(url, {'payload': url * 50})
+    paths = {url: cache._path(url) for url in urls}
+    sizes = {url: os.path.getsize(path) for url, path in paths.items()}
+    # a最近使用，c次之，b最久未使用；读取不改变修改时间（获取时间）
+    fetched_at = os.stat(paths['https://api/a']).st_mtime
+    os.utime(paths['https://api/b'], (1000, os.stat(paths['https://api/b']).st_mtime))
+    os.utime(paths['https://api/c'], (2000, os.stat(paths['https://api/c']).st_mtime))
+    cache.get('https://api/a')
+    assert os.stat(paths['https://api/a']).st_mtime == fetched_at
+
+    total = sum(sizes.values())
+    cache.max_bytes = (total - sizes['https://api/b']) / 0.9 + 1
+    assert cache.evict() == 1
+    assert cache.get('https://api/b', ttl=float('inf')) is None
+    assert cache.get('https://api/a') is not None
+    assert cache.get('https://api/c') is not None
+
+def test_put_evicts_when_over_limit(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=1)
+    cache.put('https://api/a', {'n': 1})
+    assert cache.stats() == (0, 0)
+
+def test_rerender_prefers_detail_response(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    group = MockGroup(size=3)
+    cache = ResponseCache('cache')
+    topic = group.topic(0)
+    stale = dict(topic, title='旧标题\n...')
+    cache.put('https://api/v2/groups/1/topics?count=20', {'resp_data': {'topics': [stale, group.topic(1)]}})
+    cache.put(f"https://api/v2/topics/{topic['topic_id']}/info", {'resp_data': {'topic': group.topic_detail(0)}})
+    assert rerender(cache) == 2
+    names = os.listdir('articles')
+    assert len(names) == 2
+    assert not any('旧标题' in name for name in names)
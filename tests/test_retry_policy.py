@@ -0,0 +1,170 @@
+import json
+import time
+import pytest
+import requests
+from retry_policy import (ApiError, FatalError, ServerUnavailableError, RetryBudget, CircuitBreaker, RetryPolicy,
+                          classify_error, RETRYABLE, FATAL, PERMANENT)
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+@pytest.mark.parametrize('error, kind', [
+    (http_error(401), FATAL),
+    (http_error(403), FATAL),
+    (http_error(404), PERMANENT),
+    (http_error(408), RETRYABLE),
+    (http_error(429), RETRYABLE),
+    (http_error(503), RETRYABLE),
+    (ApiError(401), FATAL),
+    (ApiError(1059), RETRYABLE),
+    (ApiError(14210), PERMANENT),
+    (FatalError('x'), FATAL),
+    (ServerUnavailableError('x'), FATAL),
+    (UnicodeEncodeError('latin-1', '中', 0, 1, 'x'), FATAL),
+    (requests.exceptions.ConnectionError(), RETRYABLE),
+    (requests.exceptions.Timeout(), RETRYABLE),
+    (json.JSONDecodeError('x', '', 0), RETRYABLE),
+    (ValueError('x'), PERMANENT),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0.5, min_retries=2)
+    for _ in range(4):
+        budget.record_request()
+    # 预算为 2 + 0.5 × 4 = 4 次
+    assert [budget.try_spend() for _ in range(5)] == [True, True, True, True, False]
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
+
+def trip(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+def test_breaker_opens_after_threshold_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=0.05, max_cooldown=0.2)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    start = time.monotonic()
+    breaker.before_call()
+    assert time.monotonic() - start >= 0.04
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+def test_breaker_failed_probe_doubles_cooldown():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01, max_cooldown=0.03)
+    trip(breaker)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.cooldown == pytest.approx(0.02)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.cooldown == pytest.approx(0.03)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.cooldown == pytest.approx(0.01)
+
+def test_breaker_aborts_when_trips_in_window_exceed_limit():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0, max_trips=2, trip_window=60)
+    trip(breaker)
+    trip(breaker)
+    trip(breaker)
+    # 致命状态在之后的请求前抛出
+    with pytest.raises(ServerUnavailableError):
+        breaker.before_call()
+
+def test_breaker_forgets_trips_outside_window():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0, max_trips=1, trip_window=0.05)
+    for _ in range(4):
+        trip(breaker)
+        breaker.before_call()
+        breaker.record_success()
+        time.sleep(0.06)
+    assert breaker.trips == 4
+    breaker.before_call()
+
+def test_breaker_reset_clears_only_server_unavailable():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.0, max_trips=0)
+    trip(breaker)
+    with pytest.raises(ServerUnavailableError):
+        breaker.before_call()
+    breaker.reset()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.abort(FatalError('登录失效'))
+    breaker.reset()
+    with pytest.raises(FatalError, match='登录失效'):
+        breaker.before_call()
+
+def make_policy(**kwargs):
+    return RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.002,
+                       breaker=CircuitBreaker(failure_threshold=100), **kwargs)
+
+def test_policy_retries_retryable_errors():
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) < 3:
+            raise http_error(503)
+        return 'ok'
+
+    assert make_policy().call(func) == 'ok'
+    assert len(calls) == 3
+
+def test_policy_gives_up_after_max_attempts():
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise requests.exceptions.ConnectionError()
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        make_policy().call(func)
+    assert len(calls) == 3
+
+def test_policy_does_not_retry_permanent_errors():
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise http_error(404)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        make_policy().call(func)
+    assert len(calls) == 1
+
+def test_policy_fatal_error_aborts_all_later_calls():
+    def func():
+        raise http_error(401)
+
+    policy = make_policy()
+    with pytest.raises(FatalError):
+        policy.call(func)
+    with pytest.raises(FatalError):
+        policy.call(lambda: 'ok')
+
+def test_policy_custom_classify():
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise http_error(403)
+
+    policy = make_policy(classify=lambda e: PERMANENT)
+    with pytest.raises(requests.exceptions.HTTPError):
+        policy.call(func)
+    assert len(calls) == 1
+    assert policy.call(lambda: 'ok') == 'ok'
@@ -0,0 +1,64 @@
+import os
+from main import extract_and_save_article
+from mock_server import MockGroup
+from search_index import SearchIndex, tokenize, build_match_query, parse_article_text, topic_fields
+
+def doc(topic_id, title='', author='作者', body='', comments='', create_time='2025-03-04T08:00:00.000+0800'):
+    return {'topic_id': topic_id, 'title': title, 'author': author, 'body': body,
+            'comments': comments, 'create_time': create_time}
+
+def test_tokenize_and_match_query():
+    assert tokenize('知识星球 Python3') == ['知识', '识星', '星球', 'python3']
+    assert tokenize('书') == ['书']
+    assert build_match_query('星球 书') == '"星球" AND "书"*'
+    assert build_match_query('星球', ['title']) == '{title} : ("星球")'
+    assert build_match_query('，。') is None
+
+def test_ranking_prefers_title_over_body_over_comments(tmp_path):
+    index = SearchIndex(str(tmp_path / 'search.db'))
+    try:
+        index.add(doc('1', title='普通标题', comments='价值投资'))
+        index.add(doc('2', title='普通标题', body='聊聊价值投资的方法'))
+        index.add(doc('3', title='价值投资入门'))
+        index.add(doc('4', title='价值', body='投资'))
+        assert [r['topic_id'] for r in index.search('价值投资')] == ['3', '2', '1']
+        assert [r['topic_id'] for r in index.search('价值 投资')][0] in ('3', '4')
+        assert [r['topic_id'] for r in index.search('价值投资', fields=['comments'])] == ['1']
+    finally:
+        index.close()
+
+def test_filters_and_incremental_update(tmp_path):
+    index = SearchIndex(str(tmp_path / 'search.db'))
+    try:
+        assert index.add(doc('1', title='年度总结', author='甲', create_time='2024-12-31T08:00:00.000+0800'))
+        assert index.add(doc('2', title='年度总结', author='乙', create_time='2025-01-01T08:00:00.000+0800'))
+        assert not index.add(doc('1', title='年度总结', author='甲', create_time='2024-12-31T08:00:00.000+0800'))
+        assert [r['topic_id'] for r in index.search('年度', author='乙')] == ['2']
+        assert [r['topic_id'] for r in index.search('年度', since='2025-01-01')] == ['2']
+        assert [r['topic_id'] for r in index.search('年度', until='2024-12-31')] == ['1']
+        assert index.add(doc('1', title='半年总结', author='甲'))
+        assert [r['topic_id'] for r in index.search('年度')] == ['2']
+        assert len(index) == 2
+    finally:
+        index.close()
+
+def test_index_directory_matches_saved_articles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    group = MockGroup(size=5)
+    for i in range(group.size):
+        path = extract_and_save_article(group.topic(i))
+        with open(path, encoding='utf-8') as f:
+            fields = parse_article_text(f.read())
+        expected = topic_fields(group.topic(i))
+        for name in ('topic_id', 'title', 'author', 'create_time'):
+            assert fields[name] == expected[name]
+        assert fields['body'].rstrip('\n') == expected['body']
+    index = SearchIndex('search.db')
+    try:
+        assert index.index_directory('articles') == group.size
+        assert index.index_directory('articles') == 0
+        result = index.search('模拟文章3', fields=['title'])
+        assert [r['topic_id'] for r in result] == [str(group.topic_id(3))]
+        assert os.path.exists(result[0]['location'])
+    finally:
+        index.close()
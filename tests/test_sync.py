@@ -0,0 +1,70 @@
+import os
+from datetime import datetime
+from conftest import write_config
+from mock_server import TZ
+from state_store import StateStore, STATUS_DONE
+from sync import sync, refresh, topic_fingerprint
+
+def test_sync_downloads_everything_then_only_new_topics(mock_group, tmp_path, monkeypatch):
+    group, base_url, faults = mock_group
+    write_config(tmp_path, base_url, group.group_id)
+    monkeypatch.chdir(tmp_path)
+
+    sync(workers=4)
+    assert len(os.listdir('articles')) == group.size
+    store = StateStore('state.db')
+    try:
+        assert store.pending_topic_ids(str(group.group_id)) == []
+        high_water = store.get_high_water(str(group.group_id), 'all')
+    finally:
+        store.close()
+
+    # 没有新文章时不下载任何文章，高水位不变
+    sync(workers=4)
+    assert len(os.listdir('articles')) == group.size
+
+    topic = group.publish(datetime.now(TZ))
+    sync(workers=4)
+    assert len(os.listdir('articles')) == group.size + 1
+    store = StateStore('state.db')
+    try:
+        assert store.get_topic(topic['topic_id'])['status'] == STATUS_DONE
+        assert store.get_high_water(str(group.group_id), 'all') > high_water
+    finally:
+        store.close()
+
+def test_sync_retries_failed_topics_next_run(mock_group, tmp_path, monkeypatch):
+    group, base_url, faults = mock_group
+    write_config(tmp_path, base_url, group.group_id,
+                 retry={'maxAttempts': 1, 'baseDelay': 0.01, 'maxDelay': 0.02, 'minRetries': 1000})
+    monkeypatch.chdir(tmp_path)
+    faults.rate_5xx = 0.3
+    sync(workers=4)
+    faults.rate_5xx = 0.0
+    sync(workers=4)
+    assert len(os.listdir('articles')) == group.size
+
+def test_refresh_resaves_only_revised_topics(mock_group, tmp_path, monkeypatch):
+    group, base_url, faults = mock_group
+    group.revise_every = 10
+    group.article_every = 15
+    write_config(tmp_path, base_url, group.group_id)
+    monkeypatch.chdir(tmp_path)
+    sync(workers=4)
+    paths = {name.rsplit('_', 1)[1][:-4]: os.path.join('articles', name) for name in os.listdir('articles')}
+    mtimes = {topic_id: os.stat(path).st_mtime_ns for topic_id, path in paths.items()}
+
+    # 没有变化时只翻页，不重新保存任何文章
+    refresh(workers=4)
+    assert {topic_id: os.stat(path).st_mtime_ns for topic_id, path in paths.items()} == mtimes
+
+    before = topic_fingerprint(group.topic(0))
+    group.revision = 1
+    assert topic_fingerprint(group.topic(0)) != before
+    refresh(workers=4)
+    revised = {str(group.topic_id(i)) for i in range(0, group.size, group.revise_every)}
+    for topic_id, path in paths.items():
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        assert ('（第1次修改）' in text) == (topic_id in revised)
+        assert (os.stat(path).st_mtime_ns != mtimes[topic_id]) == (topic_id in revised)
@@ -0,0 +1,78 @@
+import time
+import random
+import pytest
+from watch import PollSchedule
+
+def make_schedule(**kwargs):
+    kwargs.setdefault('min_interval', 30)
+    kwargs.setdefault('max_interval', 600)
+    return PollSchedule(**kwargs)
+
+def test_first_poll_does_not_estimate_gap():
+    schedule = make_schedule()
+    schedule.observe(50, time.time() - 10)
+    assert schedule.mean_gap is None
+    assert schedule.interval == 30
+
+def test_idle_backs_off_up_to_max_interval():
+    schedule = make_schedule(max_interval=100)
+    schedule.observe(0, None)
+    intervals = []
+    for _ in range(10):
+        schedule.observe(0, None)
+        intervals.append(schedule.interval)
+    assert intervals[0] == pytest.approx(45)
+    assert intervals == sorted(intervals)
+    assert intervals[-1] == 100
+
+def test_new_topics_reset_interval_and_update_mean_gap():
+    schedule = make_schedule()
+    now = time.time()
+    schedule.observe(0, now - 3600)
+    schedule.observe(0, now - 3600)
+    assert schedule.interval > 30
+    schedule.started = now - 1000
+    schedule.observe(2, now)
+    assert schedule.interval == 30
+    # 启动以来1000秒内发了2篇
+    assert schedule.mean_gap == pytest.approx(500, rel=0.01)
+
+def test_ceiling_follows_posting_rate():
+    schedule = make_schedule()
+    now = time.time()
+    assert schedule.ceiling(now) == 600
+    schedule.mean_gap = 1200
+    schedule.newest = now - 60
+    # max(平均间隔, 距最新文章时间) × 0.1
+    assert schedule.ceiling(now) == pytest.approx(120)
+    schedule.newest = now - 3000
+    assert schedule.ceiling(now) == pytest.approx(300)
+    schedule.mean_gap = 10
+    schedule.newest = now
+    assert schedule.ceiling(now) == 30
+
+def test_idle_interval_capped_by_ceiling():
+    schedule = make_schedule()
+    now = time.time()
+    schedule.mean_gap = 600
+    schedule.newest = now
+    schedule.started = now - 100
+    for _ in range(10):
+        schedule.observe(0, None)
+    assert schedule.interval == pytest.approx(60, rel=0.01)
+
+def test_next_delay_never_exceeds_max_interval():
+    schedule = make_schedule(max_interval=60)
+    schedule.interval = 60
+    rng = random.Random(0)
+    delays = [schedule.next_delay(rng) for _ in range(200)]
+    assert max(delays) <= 60
+    assert min(delays) >= 54
+
+def test_on_unavailable_jumps_to_max_interval():
+    schedule = make_schedule(max_interval=60)
+    schedule.observe(0, None)
+    schedule.on_unavailable()
+    assert schedule.interval == 60
+    schedule.observe(1, time.time())
+    assert schedule.interval == 30
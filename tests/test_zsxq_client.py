@@ -0,0 +1,50 @@
+import json
+import hashlib
+import threading
+import zsxq_client
+from conftest import make_client
+from zsxq_client import ZsxqClient, get_default_client, DEFAULT_BASE_URL
+
+def test_default_client_is_shared_across_threads(tmp_path, monkeypatch):
+    config = {'api': {'groupId': '1'}, 'auth': {'zsxq_access_token': 't', 'zsxqsessionid': 's'}}
+    (tmp_path / 'config.json').write_text(json.dumps(config), encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(zsxq_client, '_default_client', None)
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(get_default_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(clients) == 8
+    assert all(client is clients[0] for client in clients)
+
+def test_sign_headers_are_generated_per_request():
+    client = ZsxqClient({'api': {'groupId': '1'}, 'auth': {'zsxq_access_token': 'tok', 'zsxqsessionid': 's'}})
+    credential = client.credentials.acquire()[0]
+    headers = client.sign_headers(credential)
+    expected = hashlib.sha1(f"tok_{headers['x-timestamp']}".encode('utf-8')).hexdigest()
+    assert headers['x-signature'] == expected
+    assert 'zsxq_access_token=tok' in headers['Cookie']
+
+def test_rebase_url_points_list_files_at_base_url():
+    client = ZsxqClient({'api': {'groupId': '1', 'baseUrl': 'http://127.0.0.1:9/v2'},
+                         'auth': {'zsxq_access_token': 't', 'zsxqsessionid': 's'}})
+    assert client.rebase_url(DEFAULT_BASE_URL + '/topics/1/info') == 'http://127.0.0.1:9/v2/topics/1/info'
+    assert client.rebase_url('http://other/x') == 'http://other/x'
+
+def test_one_client_serves_concurrent_requests(mock_group):
+    group, base_url, faults = mock_group
+    client = make_client(base_url, group.group_id)
+    results = []
+
+    def fetch(i):
+        topic = client.request_json(client.topic_info_url(group.topic_id(i)))['resp_data']['topic']
+        results.append(str(topic['topic_id']))
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == sorted(str(group.topic_id(i)) for i in range(16))
@@ -0,0 +1,219 @@
+import time
+import heapq
+import random
+import signal
+import threading
+from datetime import datetime
+from zsxq_client import ZsxqClient
+from state_store import StateStore
+from retry_policy import FatalError, ServerUnavailableError
+from sync import collect_new_topics
+from log_utils import get_logger, add_logging_arguments, setup_logging_from_args
+
+logger = get_logger('watch')
+
+DEFAULT_MIN_INTERVAL = 30
+# 空闲时的最长轮询间隔：新文章最迟在这么多秒内被发现，默认保证一分钟内下载
+DEFAULT_MAX_INTERVAL = 60
+# 一篇文章连续下载失败的次数达到该值后，本次运行中不再重试（重启后或sync.py时继续）
+MAX_DOWNLOAD_ATTEMPTS = 3
+
+def _to_epoch(create_time):
+    try:
+        return datetime.fromisoformat(create_time.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+class PollSchedule:
+    """单个星球的自适应轮询间隔
+    发现新文章后间隔降到min_interval（作者常常连续发文）；没有新文章时间隔每次乘以backoff，
+    但不超过上限：上限为平均发文间隔（指数平滑）与距最新文章时间两者中较大值的ceiling_ratio倍，
+    并限制在[min_interval, max_interval]之间。发文越频繁，空闲时的轮询间隔越短；长时间不发文时逐渐放慢到max_interval。
+    加入抖动后的等待时间也不超过max_interval，新文章从发布到被发现最多相隔max_interval秒。
+    """
+
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL, max_interval=DEFAULT_MAX_INTERVAL, backoff=1.5,
+                 ceiling_ratio=0.1, smoothing=0.3, jitter=0.1):
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.backoff = backoff
+        self.ceiling_ratio = ceiling_ratio
+        self.smoothing = smoothing
+        self.jitter = jitter
+        self.interval = self.min_interval
+        self.mean_gap = None
+        self.newest = None
+        self.started = None
+
+    def ceiling(self, now=None):
+        """没有新文章时轮询间隔的上限（秒）"""
+        if self.mean_gap is None or self.newest is None:
+            return self.max_interval
+        idle = (now or time.time()) - self.newest
+        return min(self.max_interval, max(self.min_interval, max(self.mean_gap, idle) * self.ceiling_ratio))
+
+    def observe(self, new_count, newest):
+        """根据一次轮询的结果调整间隔
+        Args:
+            new_count: 新文章数
+            newest: 轮询后最新文章的发布时间（Unix秒），未知时为None
+        """
+        now = time.time()
+        if self.started is None:
+            # 首次轮询获取的是启动前积累的文章，不用于估计发文间隔
+            self.started = now
+        elif new_count and newest is not None:
+            since = max(self.newest or 0, self.started)
+            if newest > since:
+                # 上次发现新文章（或启动）以来的平均发文间隔
+                gap = (newest - since) / new_count
+                self.mean_gap = gap if self.mean_gap is None else \
+                    self.smoothing * gap + (1 - self.smoothing) * self.mean_gap
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.ceiling(now))
+        if newest is not None:
+            self.newest = newest if self.newest is None else max(self.newest, newest)
+
+    def on_error(self):
+        """轮询失败：按空闲处理，避免出错时频繁请求"""
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def on_unavailable(self):
+        """服务器持续不可用：直接退到最长间隔，之后按正常规则恢复"""
+        self.interval = self.max_interval
+
+    def next_delay(self, rng=random):
+        """下次轮询前等待的秒数（加入随机抖动，避免多个星球同时请求），不超过max_interval"""
+        return min(self.interval * rng.uniform(1 - self.jitter, 1 + self.jitter), self.max_interval)
+
+class GroupWatcher:
+    """一个星球的轮询状态：轮询各scope的最新一页，新文章记入状态库并立即下载"""
+
+    def __init__(self, group_id, scopes=('all',), schedule=None):
+        self.group_id = str(group_id)
+        self.scopes = list(scopes)
+        self.schedule = schedule or PollSchedule()
+        self.polls = 0
+        self.new_topics = 0
+        self.failures = {}
+
+    def poll(self, client, store, workers=4):
+        """轮询一次并下载新文章
+        Returns:
+            int: 新文章数
+        """
+        from bulk_download import download_articles
+
+        self.polls += 1
+        new_count = 0
+        for scope in self.scopes:
+            new_count += collect_new_topics(client, store, self.group_id, scope, quiet=True)
+        newest = max((_to_epoch(store.get_high_water(self.group_id, scope) or '') or 0
+                      for scope in self.scopes), default=0) or None
+        if new_count and self.polls > 1 and newest is not None:
+            logger.info("[%s] 发现新文章%s篇，最新一篇发布于%.0f秒前", self.group_id, new_count, time.time() - newest,
+                        extra={'fields': {'event': 'new_topics', 'group_id': self.group_id, 'topics': new_count}})
+        self.new_topics += new_count
+        self.schedule.observe(new_count, newest)
+
+        pending_ids = [topic_id for topic_id in store.pending_topic_ids(self.group_id)
+                       if self.failures.get(topic_id, 0) < MAX_DOWNLOAD_ATTEMPTS]
+        if not pending_ids:
+            return new_count
+        download_failed_ids = []
+        save_failed_ids = []
+        download_articles(pending_ids, workers, download_failed_ids, save_failed_ids,
+                          client=client, on_saved=store.mark_done)
+        for failed_item in download_failed_ids + save_failed_ids:
+            store.mark_failed(failed_item['id'], failed_item['reason'])
+            self.failures[failed_item['id']] = self.failures.get(failed_item['id'], 0) + 1
+        return new_count
+
+def watch(group_ids=None, scopes=('all',), workers=4, state_file='state.db', min_interval=DEFAULT_MIN_INTERVAL,
+          max_interval=DEFAULT_MAX_INTERVAL, stop_event=None, duration=None):
+    """常驻运行，按各星球的发文频率自适应轮询，发现新文章后立即下载
+    客户端（连接池、限流器、凭证）和状态库在整个运行期间保持打开。首次轮询时与sync.py相同，获取全部文章。
+    服务器持续不可用（熔断次数超过上限）时不退出：重置熔断器，该星球退到最长轮询间隔后继续；
+    只有凭证失效、配置错误等致命错误才终止运行。
+    Args:
+        group_ids: 星球ID列表，默认使用config.json中的groupId
+        stop_event: 可选的threading.Event，设置后在当前轮询结束后退出
+        duration: 运行的秒数，默认一直运行
+    """
+    client = ZsxqClient(pool_size=max(10, workers))
+    store = StateStore(state_file)
+    stop_event = stop_event or threading.Event()
+    watchers = [GroupWatcher(group_id, scopes, PollSchedule(min_interval, max_interval))
+                for group_id in (group_ids or [client.group_id])]
+    start_time = time.time()
+    deadline = start_time + duration if duration else None
+    # (下次轮询时间, 序号)，序号用于时间相同时的比较
+    queue = [(start_time, i) for i in range(len(watchers))]
+    logger.info("开始监视%s个星球，轮询间隔%.0f~%.0f秒", len(watchers), min_interval, max_interval)
+    try:
+        while queue and not stop_event.is_set():
+            due, i = heapq.heappop(queue)
+            wait = due - time.time()
+            if deadline is not None and due > deadline:
+                break
+            if wait > 0 and stop_event.wait(wait):
+                break
+            watcher = watchers[i]
+            try:
+                watcher.poll(client, store, workers)
+            except ServerUnavailableError as e:
+                logger.error("[%s] 服务器持续不可用：%s；%.0f秒后再次轮询", watcher.group_id, e,
+                             watcher.schedule.max_interval,
+                             extra={'fields': {'event': 'server_unavailable', 'group_id': watcher.group_id}})
+                client.retry_policy.breaker.reset()
+                watcher.schedule.on_unavailable()
+            except FatalError:
+                raise
+            except Exception as e:
+                logger.error("[%s] 轮询失败：%s", watcher.group_id, e)
+                watcher.schedule.on_error()
+            delay = watcher.schedule.next_delay()
+            logger.debug("[%s] %.0f秒后再次轮询（平均发文间隔%s）", watcher.group_id, delay,
+                         f"{watcher.schedule.mean_gap:.0f}秒" if watcher.schedule.mean_gap else "未知")
+            heapq.heappush(queue, (time.time() + delay, i))
+    except FatalError as e:
+        logger.error("运行已终止：%s；尚未下载的文章会在下次运行时继续", e)
+    finally:
+        store.close()
+        elapsed = time.time() - start_time
+        for watcher in watchers:
+            fixed = int(elapsed / min_interval) + 1
+            logger.info("[%s] 运行%.0f秒：轮询%s次（按%.0f秒固定间隔需要%s次），新文章%s篇", watcher.group_id, elapsed,
+                        watcher.polls, min_interval, fixed, watcher.new_topics)
+
+if __name__ == '__main__':
+    import argparse
+    from outputs import add_output_arguments, setup_outputs_from_args
+    parser = argparse.ArgumentParser(description='常驻监视星球的新文章（自适应轮询间隔）')
+    parser.add_argument('--group', action='append', help='星球ID，可重复指定，默认使用config.json中的groupId')
+    parser.add_argument('--scope', action='append', help='要监视的scope，可重复指定，默认all')
+    parser.add_argument('--workers', type=int, default=4, help='下载文章的并发线程数')
+    parser.add_argument('--state', default='state.db', help='状态库文件路径（与sync.py共用）')
+    parser.add_argument('--min-interval', type=float, default=DEFAULT_MIN_INTERVAL,
+                        help='发现新文章后的轮询间隔（秒），默认30')
+    parser.add_argument('--max-interval', type=float, default=DEFAULT_MAX_INTERVAL,
+                        help='长时间没有新文章时的最长轮询间隔（秒），即新文章的最长发现延迟，默认60')
+    parser.add_argument('--duration', type=float, help='运行的秒数，默认一直运行（Ctrl+C或SIGTERM退出）')
+    add_logging_arguments(parser)
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    outputs = setup_outputs_from_args(args, args.workers)
+
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info("收到退出信号，完成当前轮询后退出")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    watch(args.group, args.scope or ['all'], args.workers, args.state, args.min_interval, args.max_interval,
+          stop_event, args.duration)
+    outputs.close()
@@ -0,0 +1,238 @@
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from rate_limiter import parse_retry_after
+from retry_policy import RetryPolicy, ApiError, FatalError, classify_error, FATAL
+from credentials import CredentialPool, parse_auth_config
+from response_cache import ResponseCache
+from metrics import get_metrics, endpoint_name
+from log_utils import get_logger
+
+logger = get_logger('zsxq_client')
+
+DEFAULT_BASE_URL = 'https://api.zsxq.com/v2'
+
+# 签名方式：
+#   token_ms: 毫秒时间戳，签名为sha1("{access_token}_{timestamp}")
+#   seconds:  秒级时间戳，签名为sha1("{timestamp}")
+SIGN_SCHEME_TOKEN_MS = 'token_ms'
+SIGN_SCHEME_SECONDS = 'seconds'
+
+def load_config(config_file='config.json'):
+    """加载配置文件"""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+class ZsxqClient:
+    """知识星球API客户端
+    配置只加载一次，请求通过带连接池的requests.Session发送（复用keep-alive连接），
+    x-timestamp/x-signature在每次请求时重新生成。
+    auth可以配置多组凭证，请求分散到各凭证上，每组凭证使用单独的自适应限流器；
+    被服务器拒绝的凭证自动停用，其余凭证继续工作。
+    """
+
+    def __init__(self, config=None, config_file='config.json', pool_size=10, base_url=None):
+        # 从配置文件创建时，所有凭证都失效后会重新读取配置文件，使用新填写的凭证继续运行
+        self.config_file = config_file if config is None else None
+        if config is None:
+            config = load_config(config_file)
+        self.config = config
+        api = config.get('api', {})
+        # 接口地址优先级：base_url参数 > --base-url命令行参数 > config.json中的api.baseUrl
+        base_url = base_url or _base_url_override or api.get('baseUrl', DEFAULT_BASE_URL)
+        self.base_url = base_url.rstrip('/')
+        self.group_id = api.get('groupId')
+        self.sign_scheme = api.get('signScheme', SIGN_SCHEME_TOKEN_MS)
+        self.credentials = CredentialPool(parse_auth_config(config.get('auth'), config.get('rateLimit')))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.verify = False
+        self.session.headers.update(self._build_headers())
+        self.retry_policy = RetryPolicy.from_config(config.get('retry'))
+        # 原始响应缓存（config.json中的cache配置，未配置时不缓存）
+        self.cache = ResponseCache.from_config(config.get('cache'))
+        self.reuse_cached_info = bool((config.get('cache') or {}).get('reuseTopicInfo', False))
+
+    def _build_headers(self):
+        """根据配置生成固定的请求头（Referer等），Cookie随每次请求使用的凭证设置"""
+        headers = self.config.get('headers', {}).copy()
+        headers['Referer'] = headers.get('Referer', 'https://wx.zsxq.com/')
+        headers['Referrer-Policy'] = headers.get('Referrer-Policy', 'strict-origin-when-cross-origin')
+        return headers
+
+    def sign_headers(self, credential):
+        """生成本次请求的时间戳、签名头和Cookie"""
+        if self.sign_scheme == SIGN_SCHEME_SECONDS:
+            timestamp = str(int(time.time()))
+            string_to_sign = timestamp
+        else:
+            timestamp = str(int(time.time() * 1000))
+            string_to_sign = f"{credential.access_token}_{timestamp}"
+        signature = hashlib.sha1(string_to_sign.encode('utf-8')).hexdigest()
+        return {'x-timestamp': timestamp, 'x-signature': signature, 'Cookie': credential.cookie}
+
+    def rebase_url(self, url):
+        """将列表文件中写死的api.zsxq.com地址替换为当前的接口地址"""
+        if self.base_url != DEFAULT_BASE_URL and url.startswith(DEFAULT_BASE_URL):
+            return self.base_url + url[len(DEFAULT_BASE_URL):]
+        return url
+
+    def _acquire_credential(self):
+        """选择本次请求使用的凭证并等待它的限流器，所有凭证都已停用时重新读取配置文件"""
+        credential, wait = self.credentials.acquire()
+        if credential is None and self._reload_credentials():
+            credential, wait = self.credentials.acquire()
+        if credential is None:
+            raise FatalError("所有凭证均已被服务器拒绝（登录失效），请在config.json中更新auth")
+        return credential, wait
+
+    def _reload_credentials(self):
+        """重新读取配置文件，加入新填写的凭证，返回新加入的凭证数"""
+        if not self.config_file:
+            return 0
+        try:
+            config = load_config(self.config_file)
+        except (OSError, ValueError) as e:
+            logger.warning("重新读取配置文件失败：%s", e)
+            return 0
+        return self.credentials.merge(parse_auth_config(config.get('auth'), config.get('rateLimit')))
+
+    def get(self, url, **kwargs):
+        """发送GET请求，返回requests.Response（编码固定为utf-8，response.credential为使用的凭证）
+        发送前从所选凭证的限流器获取令牌；429和5xx响应会使该限流器降速。
+        """
+        url = self.rebase_url(url)
+        metrics = get_metrics()
+        credential, wait = self._acquire_credential()
+        metrics.add_time('rate_limit_wait', wait)
+        headers = self.sign_headers(credential)
+        headers.update(kwargs.pop('headers', None) or {})
+        start = time.perf_counter()
+        response = self.session.get(url, headers=headers, **kwargs)
+        metrics.observe_request(endpoint_name(url), time.perf_counter() - start, len(response.content),
+                                response.status_code)
+        if len(self.credentials) > 1:
+            metrics.count('credential_requests', credential=credential.name)
+        response.encoding = 'utf-8'
+        response.credential = credential
+        if response.status_code == 429 or response.status_code >= 500:
+            credential.rate_limiter.on_throttle(parse_retry_after(response))
+        return response
+
+    def parse_json(self, response):
+        """解析响应JSON，并根据succeeded字段调整限流器速率；启用缓存时保存成功的响应"""
+        with get_metrics().timer('json_parse'):
+            resp_data = response.json()
+        succeeded = resp_data.get('succeeded', True) if isinstance(resp_data, dict) else True
+        response.credential.rate_limiter.observe(response.status_code, succeeded=succeeded)
+        if self.cache is not None and succeeded and isinstance(resp_data, dict):
+            self.cache.put(response.url, resp_data)
+        return resp_data
+
+    def get_cached_topic_info(self, topic_id):
+        """从缓存读取未过期的文章详情响应，未启用缓存或没有缓存时返回None"""
+        if self.cache is None or not self.reuse_cached_info:
+            return None
+        return self.cache.get(self.topic_info_url(topic_id))
+
+    def get_json(self, url, **kwargs):
+        """发送GET请求并返回解析后的JSON，HTTP错误时抛出requests异常"""
+        response = self.get(url, **kwargs)
+        response.raise_for_status()
+        return self.parse_json(response)
+
+    def fetch_json(self, url, **kwargs):
+        """发送一次请求并返回解析后的JSON
+        HTTP错误时抛出requests异常，succeeded为false时抛出ApiError，由重试策略分类处理。
+        凭证被拒绝（401/403）时停用该凭证并立即用其他凭证重发，不计入重试次数；没有其他凭证时照常抛出。
+        """
+        while True:
+            response = self.get(url, **kwargs)
+            try:
+                response.raise_for_status()
+                resp_data = self.parse_json(response)
+                if isinstance(resp_data, dict) and resp_data.get('succeeded') is False:
+                    raise ApiError(resp_data.get('code'), resp_data.get('info') or resp_data.get('error', ''), url)
+                return resp_data
+            except (requests.exceptions.HTTPError, ApiError) as e:
+                if classify_error(e) != FATAL or not self._quarantine(response.credential, e):
+                    raise
+
+    def _quarantine(self, credential, error):
+        """停用被拒绝的凭证，返回是否还有可用的凭证（包括重新读取配置文件后新加入的）"""
+        if self.credentials.quarantine(credential, str(error)):
+            return True
+        return self._reload_credentials() > 0
+
+    def request_json(self, url, **kwargs):
+        """按统一的重试策略（指数退避、重试预算、熔断）请求并返回JSON，所有抓取流程都应使用此方法"""
+        return self.retry_policy.call(lambda: self.fetch_json(url, **kwargs), url)
+
+    def topic_info_url(self, topic_id):
+        """单篇文章详情接口URL"""
+        return f"{self.base_url}/topics/{topic_id}/info"
+
+    def group_info_url(self, group_id=None):
+        """星球信息接口URL（/groups/{id}），包含星球的创建时间"""
+        return f"{self.base_url}/groups/{group_id or self.group_id}"
+
+    def topics_url(self, group_id=None, scope='all', count=20, end_time=None):
+        """文章列表接口URL（/groups/{id}/topics），以end_time为翻页游标"""
+        params = {'scope': scope, 'count': count}
+        if end_time:
+            params['end_time'] = end_time
+        return f"{self.base_url}/groups/{group_id or self.group_id}/topics?{urlencode(params)}"
+
+    def digests_url(self, group_id=None, index=0, count=30):
+        """精华列表接口URL（/groups/{id}/topics/digests），以index为翻页游标"""
+        params = {'sort': 'by_create_time', 'direction': 'desc', 'index': index, 'count': count}
+        return f"{self.base_url}/groups/{group_id or self.group_id}/topics/digests?{urlencode(params)}"
+
+    def comments_url(self, topic_id, begin_time=None, count=30):
+        """文章评论接口URL（/topics/{id}/comments），按发布时间从旧到新排列，以begin_time为翻页游标"""
+        params = {'sort': 'asc', 'count': count, 'with_sticky': 'true'}
+        if begin_time:
+            params['begin_time'] = begin_time
+        return f"{self.base_url}/topics/{topic_id}/comments?{urlencode(params)}"
+
+    def file_download_url(self, file_id):
+        """附件下载地址接口URL（/files/{id}/download_url）"""
+        return f"{self.base_url}/files/{file_id}/download_url"
+
+    def close(self):
+        self.session.close()
+
+_base_url_override = None
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def set_base_url_override(base_url):
+    """设置本进程中新建客户端使用的接口地址（如本地模拟服务器），None表示使用配置文件"""
+    global _base_url_override
+    _base_url_override = base_url.rstrip('/') if base_url else None
+
+def add_client_arguments(parser):
+    """为命令行解析器添加接口地址参数"""
+    parser.add_argument('--base-url', metavar='URL',
+                        help='接口地址，默认使用config.json中的api.baseUrl，'
+                             '如本地模拟服务器http://127.0.0.1:8765/v2')
+
+def setup_client_from_args(args):
+    """根据--base-url参数设置接口地址"""
+    if getattr(args, 'base_url', None):
+        set_base_url_override(args.base_url)
+
+def get_default_client(config_file='config.json'):
+    """获取进程内共享的客户端实例（首次调用时创建）"""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = ZsxqClient(config_file=config_file)
+        return _default_client